@@ -0,0 +1,156 @@
+"""
+Per-model admission control with bounded queues
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+from fastapi import HTTPException
+
+
+class AdmissionTicket:
+    """Timing for one admitted request: time spent queued and time holding a slot."""
+
+    def __init__(self, queue_time: float):
+        self.queue_time = queue_time
+        self.service_time: Optional[float] = None
+
+
+class ModelGate:
+    """Concurrency limit plus a bounded FIFO wait queue for one model."""
+
+    def __init__(self, concurrency: int, max_queue: int, default_service_time: float = 10.0, ewma_alpha: float = 0.2):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.service_ewma = default_service_time
+        self.ewma_alpha = ewma_alpha
+        self._observed = False
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self._stats = {"admitted": 0, "rejected": 0, "queue_time_total": 0.0}
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up, from the observed service time."""
+        ahead = len(self._waiters) + 1
+        return max(1, math.ceil(self.service_ewma * ahead / max(self.concurrency, 1)))
+
+    async def acquire(self) -> float:
+        """Wait for a slot and return the time spent queued."""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self._stats["admitted"] += 1
+            return 0.0
+
+        if len(self._waiters) >= self.max_queue:
+            self._stats["rejected"] += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests queued for this model. Please retry later.",
+                headers={"Retry-After": str(self.retry_after())}
+            )
+
+        waiter = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+        queue_time = time.monotonic() - started
+        self._stats["admitted"] += 1
+        self._stats["queue_time_total"] += queue_time
+        return queue_time
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """Free a slot, handing it straight to the next waiter if there is one."""
+        if service_time is not None:
+            if self._observed:
+                self.service_ewma = self.ewma_alpha * service_time + (1 - self.ewma_alpha) * self.service_ewma
+            else:
+                self.service_ewma = service_time
+                self._observed = True
+
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        admitted = self._stats["admitted"]
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "admitted": admitted,
+            "rejected": self._stats["rejected"],
+            "avg_queue_time": round(self._stats["queue_time_total"] / admitted, 4) if admitted else 0.0,
+            "service_time_ewma": round(self.service_ewma, 4),
+            "retry_after": self.retry_after(),
+        }
+
+
+class AdmissionController:
+    """Hands out per-model slots; requests beyond the queue get a fast 429."""
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        max_queue: int = 32,
+        overrides: Optional[Dict[str, Tuple[int, int]]] = None
+    ):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.overrides = overrides or {}
+        self._gates: Dict[str, ModelGate] = {}
+
+    @staticmethod
+    def parse_overrides(spec: str) -> Dict[str, Tuple[int, int]]:
+        """Parse "model=concurrency:queue,..." (e.g. "mistral:7b=2:8,llama2=1:4")."""
+        overrides = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            model, _, limits = item.rpartition("=")
+            concurrency, _, queue = limits.partition(":")
+            overrides[model] = (int(concurrency), int(queue))
+        return overrides
+
+    def gate(self, model: str) -> ModelGate:
+        gate = self._gates.get(model)
+        if gate is None:
+            concurrency, max_queue = self.overrides.get(model, (self.concurrency, self.max_queue))
+            gate = ModelGate(concurrency, max_queue)
+            self._gates[model] = gate
+        return gate
+
+    @asynccontextmanager
+    async def slot(self, model: str) -> AsyncIterator[AdmissionTicket]:
+        """Hold a slot for one generation; raises HTTPException(429) when the queue is full."""
+        gate = self.gate(model)
+        ticket = AdmissionTicket(await gate.acquire())
+        started = time.monotonic()
+        try:
+            yield ticket
+        finally:
+            ticket.service_time = time.monotonic() - started
+            gate.release(ticket.service_time)
+
+    def capacity(self, model: str) -> int:
+        """How many generations of this model may run at once."""
+        return self.gate(model).concurrency
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default_concurrency": self.concurrency,
+            "default_max_queue": self.max_queue,
+            "models": {model: gate.stats() for model, gate in self._gates.items()},
+        }
@@ -0,0 +1,161 @@
+"""
+Multi-backend routing for a pool of Ollama hosts
+"""
+import asyncio
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+import httpx
+
+
+class Backend:
+    """One Ollama host and the routing state kept about it."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.latency_ewma: Optional[float] = None
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.loaded_models: Set[str] = set()
+        self.requests = 0
+        self.failures = 0
+        self.last_probe: Optional[float] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "latency_ewma": round(self.latency_ewma, 4) if self.latency_ewma is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "loaded_models": sorted(self.loaded_models),
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_probe": self.last_probe,
+        }
+
+
+class BackendPool:
+    """
+    Pick a backend per request by least outstanding requests or latency EWMA.
+
+    Backends are ejected passively after consecutive failures and are only
+    brought back by a successful health probe. Backends that already have the
+    requested model loaded are preferred unless they are noticeably busier.
+    """
+
+    STRATEGIES = ("least_outstanding", "ewma")
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        strategy: str = "least_outstanding",
+        failure_threshold: int = 3,
+        probe_interval: float = 10.0,
+        ewma_alpha: float = 0.3,
+        affinity_slack: int = 2
+    ):
+        self.backends: List[Backend] = [Backend(url) for url in urls if url.strip()]
+        if not self.backends:
+            raise ValueError("At least one Ollama backend URL is required")
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown routing strategy '{strategy}'. Use one of: {', '.join(self.STRATEGIES)}")
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.ewma_alpha = ewma_alpha
+        self.affinity_slack = affinity_slack
+        self._probe_task: Optional["asyncio.Task[None]"] = None
+
+    def _score(self, backend: Backend) -> float:
+        if self.strategy == "ewma":
+            # Untried backends score zero so they get sampled
+            return (backend.latency_ewma or 0.0) * (backend.outstanding + 1)
+        return float(backend.outstanding)
+
+    def select(self, model: Optional[str] = None, exclude: Iterable[Backend] = ()) -> Optional[Backend]:
+        """Choose the best backend for a request, or None if every backend is excluded."""
+        excluded = set(id(b) for b in exclude)
+        candidates = [b for b in self.backends if id(b) not in excluded]
+        if not candidates:
+            return None
+
+        # With every backend ejected it is still better to try than to fail outright
+        healthy = [b for b in candidates if b.healthy] or candidates
+        best = min(healthy, key=self._score)
+
+        if model:
+            warm = [b for b in healthy if model in b.loaded_models]
+            if warm:
+                best_warm = min(warm, key=self._score)
+                if best_warm.outstanding <= best.outstanding + self.affinity_slack:
+                    best = best_warm
+        return best
+
+    def begin(self, backend: Backend) -> float:
+        """Mark a request as outstanding on a backend and return its start time."""
+        backend.outstanding += 1
+        backend.requests += 1
+        return time.monotonic()
+
+    def end(self, backend: Backend) -> None:
+        backend.outstanding -= 1
+
+    def record_success(self, backend: Backend, latency: float, model: Optional[str] = None) -> None:
+        backend.consecutive_failures = 0
+        if backend.latency_ewma is None:
+            backend.latency_ewma = latency
+        else:
+            backend.latency_ewma = self.ewma_alpha * latency + (1 - self.ewma_alpha) * backend.latency_ewma
+        if model:
+            backend.loaded_models.add(model)
+
+    def record_failure(self, backend: Backend) -> None:
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= self.failure_threshold:
+            backend.healthy = False
+
+    async def probe(self, client: httpx.AsyncClient, timeout: float = 5.0) -> None:
+        """Check every backend and refresh the set of models each has loaded."""
+        await asyncio.gather(*(self._probe_one(client, b, timeout) for b in self.backends))
+
+    async def _probe_one(self, client: httpx.AsyncClient, backend: Backend, timeout: float) -> None:
+        backend.last_probe = time.time()
+        try:
+            response = await client.get(f"{backend.url}/api/ps", timeout=timeout)
+            response.raise_for_status()
+            running = response.json().get("models", [])
+        except (httpx.HTTPError, ValueError):
+            backend.healthy = False
+            return
+        backend.loaded_models = {m.get("name", "") for m in running if m.get("name")}
+        backend.healthy = True
+        backend.consecutive_failures = 0
+
+    def start_probing(self, client: httpx.AsyncClient) -> None:
+        """Probe backends in the background every probe_interval seconds."""
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.ensure_future(self._probe_loop(client))
+
+    async def _probe_loop(self, client: httpx.AsyncClient) -> None:
+        while True:
+            await self.probe(client)
+            await asyncio.sleep(self.probe_interval)
+
+    async def stop_probing(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "failure_threshold": self.failure_threshold,
+            "probe_interval": self.probe_interval,
+            "backends": [b.stats() for b in self.backends],
+        }
@@ -0,0 +1,139 @@
+"""
+Single-flight coalescing of identical in-flight requests
+"""
+import asyncio
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+class SingleFlight:
+    """Run at most one call per key and share its result with every concurrent waiter."""
+
+    def __init__(self):
+        self._calls: Dict[str, "asyncio.Task[Any]"] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "abandoned": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn() for the first caller with this key; later callers join it.
+
+        The shared call is cancelled only when every waiter has gone away.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(key) == 1:
+                self._stats["abandoned"] += 1
+                task.cancel()
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        # Retrieve the exception so an abandoned failure is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "in_flight": len(self._calls)}
+
+
+class _Broadcast:
+    """One upstream stream whose chunks are replayed to every subscriber."""
+
+    def __init__(self, source: AsyncIterator[str]):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def iterate(self) -> AsyncGenerator[str, None]:
+        cursor = 0
+        while True:
+            while cursor < len(self.chunks):
+                yield self.chunks[cursor]
+                cursor += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class StreamFanout:
+    """Share one upstream stream per key, fanning its chunks out to all subscribers."""
+
+    def __init__(self):
+        self._streams: Dict[str, _Broadcast] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "abandoned": 0}
+
+    async def subscribe(
+        self,
+        key: str,
+        factory: Callable[[], AsyncIterator[str]]
+    ) -> AsyncGenerator[str, None]:
+        """Yield the full chunk sequence of the shared stream for this key."""
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast(factory())
+            self._streams[key] = broadcast
+            broadcast.task.add_done_callback(lambda _: self._forget(key, broadcast))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        broadcast.subscribers += 1
+        try:
+            async for chunk in broadcast.iterate():
+                yield chunk
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                # Nobody is listening any more: stop the upstream generation
+                self._stats["abandoned"] += 1
+                broadcast.task.cancel()
+
+    def _forget(self, key: str, broadcast: _Broadcast) -> None:
+        if self._streams.get(key) is broadcast:
+            del self._streams[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "in_flight": len(self._streams)}
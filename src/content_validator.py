@@ -1,8 +1,54 @@
 """
 Content validation utilities for blog posts
 """
+import os
 import re
-from typing import List, Tuple, Optional
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, List, Tuple, Optional
+
+HEADING_PATTERN = re.compile(r'^#{1,6}\s+.+$', re.MULTILINE)
+# Hashes with nothing but whitespace after them: HEADING_PATTERN's \s+ can run on into the next lines
+OPEN_HEADING_PATTERN = re.compile(r'#{1,6}\s*$')
+LINK_PATTERN = re.compile(r'\[.*?\]\(.*?\)')
+IMAGE_PATTERN = re.compile(r'!\[.*?\]\(.*?\)')
+# A frontmatter delimiter line: "---" plus optional non-newline whitespace
+DELIMITER_PATTERN = re.compile(r'^[^\S\n]*---[^\S\n]*$', re.MULTILINE)
+
+
+@dataclass
+class ContentAnalysis:
+    """Every statistic and issue for one post, computed once."""
+    word_count: int
+    heading_count: int
+    paragraph_count: int
+    code_blocks: int
+    links: int
+    images: int
+    character_count: int
+    issues: List[str] = field(default_factory=list)
+    
+    @property
+    def is_valid(self) -> bool:
+        return not self.issues
+    
+    @property
+    def estimated_reading_time(self) -> int:
+        return self.word_count // 200  # ~200 words per minute
+    
+    @property
+    def stats(self) -> dict:
+        """The get_content_stats() dictionary."""
+        return {
+            'word_count': self.word_count,
+            'heading_count': self.heading_count,
+            'paragraph_count': self.paragraph_count,
+            'code_blocks': self.code_blocks,
+            'links': self.links,
+            'images': self.images,
+            'character_count': self.character_count,
+            'estimated_reading_time': self.estimated_reading_time
+        }
 
 
 class ContentValidator:
@@ -25,64 +71,267 @@ class ContentValidator:
         """Count markdown headings in text."""
         content = ContentValidator._remove_frontmatter(text)
         # Count # symbols at the beginning of lines
-        heading_pattern = r'^#{1,6}\s+.+$'
-        return len(re.findall(heading_pattern, content, re.MULTILINE))
+        return len(HEADING_PATTERN.findall(content))
     
     @staticmethod
     def _remove_frontmatter(text: str) -> str:
         """Remove YAML frontmatter from text."""
-        lines = text.split('\n')
-        if lines[0].strip() == "---":
-            for i, line in enumerate(lines[1:], 1):
-                if line.strip() == "---":
-                    return '\n'.join(lines[i+1:])
-        return text
+        first_newline = text.find('\n')
+        if first_newline == -1 or text[:first_newline].strip() != "---":
+            return text
+        closing = DELIMITER_PATTERN.search(text, first_newline + 1)
+        if closing is None:
+            return text
+        return text[closing.end() + 1:]
     
     @staticmethod
-    def validate_content(text: str) -> Tuple[bool, List[str]]:
+    def analyze(text: str) -> ContentAnalysis:
         """
-        Validate blog post content.
+        Compute all content statistics and validation issues in one analysis.
         
-        Returns:
-            Tuple of (is_valid, list_of_issues)
+        Frontmatter is removed once, then each measurement makes its own pass
+        over the remaining content (split, count, findall); the regex passes
+        are skipped when their marker is absent. That is far fewer passes than
+        the separate helpers made, though not a single scan.
+        get_content_stats() and validate_content() are views of this result.
         """
-        issues = []
+        content = ContentValidator._remove_frontmatter(text)
+        
+        word_count = len(content.split())
+        fences = content.count('```')
+        if '](' in content:
+            links = len(LINK_PATTERN.findall(content))
+            images = len(IMAGE_PATTERN.findall(content)) if '![' in content else 0
+        else:
+            links = images = 0
+        
+        analysis = ContentAnalysis(
+            word_count=word_count,
+            heading_count=len(HEADING_PATTERN.findall(content)) if '#' in content else 0,
+            paragraph_count=len([p for p in content.split('\n\n') if p.strip()]),
+            code_blocks=fences // 2,
+            links=links,
+            images=images,
+            character_count=len(content)
+        )
+        ContentValidator._add_issues(analysis, fences)
+        return analysis
+    
+    @staticmethod
+    def _add_issues(analysis: ContentAnalysis, fences: int) -> None:
+        """Append the validation issues for a finished analysis."""
+        word_count = analysis.word_count
         
         # Check word count
-        word_count = ContentValidator.count_words(text)
         if word_count < ContentValidator.MIN_WORD_COUNT:
-            issues.append(f"Content too short: {word_count} words (minimum: {ContentValidator.MIN_WORD_COUNT})")
+            analysis.issues.append(f"Content too short: {word_count} words (minimum: {ContentValidator.MIN_WORD_COUNT})")
         elif word_count > ContentValidator.MAX_WORD_COUNT:
-            issues.append(f"Content too long: {word_count} words (maximum: {ContentValidator.MAX_WORD_COUNT})")
+            analysis.issues.append(f"Content too long: {word_count} words (maximum: {ContentValidator.MAX_WORD_COUNT})")
         
         # Check heading count
-        heading_count = ContentValidator.count_headings(text)
-        if heading_count < ContentValidator.MIN_HEADING_COUNT:
-            issues.append(f"Not enough headings: {heading_count} (minimum: {ContentValidator.MIN_HEADING_COUNT})")
+        if analysis.heading_count < ContentValidator.MIN_HEADING_COUNT:
+            analysis.issues.append(f"Not enough headings: {analysis.heading_count} (minimum: {ContentValidator.MIN_HEADING_COUNT})")
         
-        # Check for basic structure elements
-        content = ContentValidator._remove_frontmatter(text)
-        if not content.strip():
-            issues.append("No content found after frontmatter")
+        # Check for basic structure elements (no words means only whitespace)
+        if word_count == 0:
+            analysis.issues.append("No content found after frontmatter")
         
         # Check for code blocks (good practice for technical blogs)
-        if '```' not in content:
-            issues.append("Consider adding code examples for better technical content")
+        if fences == 0:
+            analysis.issues.append("Consider adding code examples for better technical content")
+    
+    @staticmethod
+    def validate_content(text: str) -> Tuple[bool, List[str]]:
+        """
+        Validate blog post content.
         
-        return len(issues) == 0, issues
+        Returns:
+            Tuple of (is_valid, list_of_issues)
+        """
+        analysis = ContentValidator.analyze(text)
+        return analysis.is_valid, analysis.issues
     
     @staticmethod
     def get_content_stats(text: str) -> dict:
         """Get statistics about the content."""
-        content = ContentValidator._remove_frontmatter(text)
-        
-        return {
-            'word_count': ContentValidator.count_words(text),
-            'heading_count': ContentValidator.count_headings(text),
-            'paragraph_count': len([p for p in content.split('\n\n') if p.strip()]),
-            'code_blocks': content.count('```') // 2,
-            'links': len(re.findall(r'\[.*?\]\(.*?\)', content)),
-            'images': len(re.findall(r'!\[.*?\]\(.*?\)', content)),
-            'character_count': len(content),
-            'estimated_reading_time': ContentValidator.count_words(text) // 200  # ~200 words per minute
+        return ContentValidator.analyze(text).stats
+
+
+class IncrementalValidator:
+    """
+    Validate a post while it streams in, to stop runaway generations early.
+    
+    Feed the post body chunk by chunk; feed() returns a reason once the
+    output should be abandoned: the word count passed max_words, no heading
+    appeared within the first first_heading_within words, or (with
+    detect_repetition) the tail of the text is a short passage repeated
+    over and over. The last two rules are heuristics and are off unless
+    asked for.
+    
+    It also keeps every count ContentValidator.analyze() reports, so
+    analysis() gives the same result for the text fed so far without the
+    whole text ever being held in memory: only the current line is kept,
+    plus any blank lines after an empty heading ("#"), which the whole-text
+    heading pattern may still join to the next line of text.
+    """
+    
+    MIN_PERIOD = 3
+    MAX_PERIOD = 80
+    MIN_REPEATS = 3
+    MIN_REPEATED_WORDS = 30
+    CHECK_EVERY = 8
+    
+    def __init__(
+        self,
+        max_words: Optional[int] = None,
+        first_heading_within: Optional[int] = None,
+        detect_repetition: bool = False
+    ):
+        self.max_words = max_words if max_words is not None else ContentValidator.MAX_WORD_COUNT
+        self.first_heading_within = first_heading_within
+        self.detect_repetition = detect_repetition
+        self.word_count = 0
+        self.heading_count = 0
+        self.abort_reason: Optional[str] = None
+        self._line = ""
+        self._in_word = False
+        self._recent: Deque[str] = deque(maxlen=self.MAX_PERIOD * self.MIN_REPEATS * 2)
+        self._checked_at = 0
+        self.character_count = 0
+        self.link_count = 0
+        self.image_count = 0
+        self.fence_count = 0
+        self.paragraph_count = 0
+        # Text that may still be part of a "```" or "\n\n" split across chunks
+        self._fence_tail = ""
+        self._paragraph_tail = ""
+        self._paragraph_has_text = False
+        # Lines from an open heading on, until a line with text shows where its match ends
+        self._heading_run: List[str] = []
+    
+    @classmethod
+    def from_env(cls, **overrides: Any) -> "IncrementalValidator":
+        """Build a validator from the DRAFT_* environment variables."""
+        first_heading_within = int(os.getenv("DRAFT_FIRST_HEADING_WITHIN", 0))
+        options = {
+            "first_heading_within": first_heading_within or None,
+            "detect_repetition": os.getenv("DRAFT_DETECT_REPETITION", "false").lower() == "true",
         }
+        options.update(overrides)
+        return cls(**options)
+    
+    def feed(self, text: str) -> Optional[str]:
+        """Account for the next chunk; returns the abort reason, if any."""
+        if self.abort_reason is not None or not text:
+            return self.abort_reason
+        
+        words = text.split()
+        if words:
+            if self._in_word and not text[0].isspace():
+                # The chunk continues the previous chunk's last word
+                self._recent[-1] += words[0]
+                words = words[1:]
+            self.word_count += len(words)
+            self._recent.extend(words)
+        self._in_word = not text[-1].isspace()
+        
+        *complete, self._line = (self._line + text).split('\n')
+        for line in complete:
+            self._count_heading(line)
+            self._count_links(line)
+        self._count_blocks(text)
+        
+        self.abort_reason = self._check()
+        return self.abort_reason
+    
+    def _count_heading(self, line: str) -> None:
+        # Count what HEADING_PATTERN.findall() over the whole text counts: a line
+        # like "#" or "# " only becomes a match together with the lines after it
+        if self._heading_run:
+            self._heading_run.append(line)
+            if line.strip() and not OPEN_HEADING_PATTERN.match(line):
+                self.heading_count += len(HEADING_PATTERN.findall('\n'.join(self._heading_run)))
+                self._heading_run = []
+        elif line.startswith('#'):
+            if OPEN_HEADING_PATTERN.match(line):
+                self._heading_run = [line]
+            elif HEADING_PATTERN.match(line):
+                self.heading_count += 1
+    
+    def _open_headings(self) -> int:
+        if self._heading_run:
+            return len(HEADING_PATTERN.findall('\n'.join(self._heading_run + [self._line])))
+        return 1 if HEADING_PATTERN.match(self._line) else 0
+    
+    def _count_links(self, line: str) -> None:
+        # Neither pattern crosses a newline, so complete lines can be counted on their own
+        if '](' in line:
+            self.link_count += len(LINK_PATTERN.findall(line))
+            if '![' in line:
+                self.image_count += len(IMAGE_PATTERN.findall(line))
+    
+    def _count_blocks(self, text: str) -> None:
+        self.character_count += len(text)
+        
+        # str.count matches fences left to right, so only a trailing run of
+        # backticks not yet used by a match can combine with the next chunk
+        text = self._fence_tail + text
+        self.fence_count += text.count('```')
+        run = len(text) - len(text.rstrip('`'))
+        self._fence_tail = '`' * (run % 3)
+        
+        # Paragraphs as in content.split('\n\n'): the open one is closed by each separator
+        first, *rest = (self._paragraph_tail + text).split('\n\n')
+        self._paragraph_has_text = self._paragraph_has_text or bool(first.strip())
+        for piece in rest:
+            self.paragraph_count += self._paragraph_has_text
+            self._paragraph_has_text = bool(piece.strip())
+        last = rest[-1] if rest else first
+        self._paragraph_tail = '\n' if last.endswith('\n') else ''
+    
+    def analysis(self) -> ContentAnalysis:
+        """ContentValidator.analyze() of everything fed so far (which excludes frontmatter)."""
+        links, images = self.link_count, self.image_count
+        if '](' in self._line:
+            links += len(LINK_PATTERN.findall(self._line))
+            images += len(IMAGE_PATTERN.findall(self._line))
+        analysis = ContentAnalysis(
+            word_count=self.word_count,
+            heading_count=self.heading_count + self._open_headings(),
+            paragraph_count=self.paragraph_count + self._paragraph_has_text,
+            code_blocks=self.fence_count // 2,
+            links=links,
+            images=images,
+            character_count=self.character_count
+        )
+        ContentValidator._add_issues(analysis, self.fence_count)
+        return analysis
+    
+    def _check(self) -> Optional[str]:
+        if self.word_count > self.max_words:
+            return f"Exceeded {self.max_words} words"
+        if (
+            self.first_heading_within is not None
+            and self.heading_count == 0
+            and self.word_count > self.first_heading_within
+            and not self._open_headings()
+        ):
+            return f"No heading in the first {self.first_heading_within} words"
+        if self.detect_repetition and self.word_count - self._checked_at >= self.CHECK_EVERY:
+            self._checked_at = self.word_count
+            period = self._repeating_period()
+            if period:
+                return f"Repetition loop: the last {period} words keep repeating"
+        return None
+    
+    def _repeating_period(self) -> Optional[int]:
+        recent = list(self._recent)
+        for period in range(self.MIN_PERIOD, self.MAX_PERIOD + 1):
+            repeats = max(self.MIN_REPEATS, -(-self.MIN_REPEATED_WORDS // period))
+            span = period * repeats
+            if span > len(recent):
+                break
+            tail = recent[-period:]
+            if all(recent[-(i + 1) * period:len(recent) - i * period] == tail for i in range(1, repeats)):
+                return period
+        return None
@@ -0,0 +1,277 @@
+"""
+Token-budgeted prompt assembly for interactive writing sessions
+"""
+import os
+import sys
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .draft_document import DraftDocument, SectionIndex
+
+# No tokenizer is available for every Ollama model; ~4 characters per token
+# is close enough for English prose and Markdown to size a prompt.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD = 4
+
+Message = Dict[str, str]
+Summarizer = Callable[[str, List[Message], str], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def message_tokens(message: Message) -> int:
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def fit_text(text: str, max_tokens: int) -> Tuple[str, bool]:
+    """Shorten text to about max_tokens, keeping its beginning and end."""
+    if estimate_tokens(text) <= max_tokens:
+        return text, False
+    keep = max(0, max_tokens * CHARS_PER_TOKEN - 80)
+    head = text[:keep * 2 // 3]
+    tail = text[len(text) - (keep - len(head)):] if keep > len(head) else ""
+    # Cut on line boundaries so Markdown structure survives
+    if '\n' in head:
+        head = head[:head.rindex('\n') + 1]
+    if '\n' in tail:
+        tail = tail[tail.index('\n') + 1:]
+    omitted = len(text) - len(head) - len(tail)
+    return f"{head}\n[... {omitted} characters omitted ...]\n\n{tail}", True
+
+
+@dataclass
+class ContextReport:
+    """What went into the last prompt built for a session."""
+    model: str
+    budget: int
+    prompt_tokens: int
+    draft_tokens: int
+    draft_truncated: bool
+    draft_sections: int
+    draft_sections_total: int
+    summary_tokens: int
+    summarized_messages: int
+    verbatim_messages: int
+    dropped_messages: int
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class _SessionContext:
+    def __init__(self) -> None:
+        self.covered = 0
+        self.summary = ""
+        self.report: Optional[ContextReport] = None
+        self.index = SectionIndex()
+
+
+class ContextBuilder:
+    """
+    Fit a chat turn into a per-model token budget.
+
+    The newest messages are sent verbatim. When they no longer fit, the
+    oldest are folded into a rolling summary that is cached per session, so
+    the summarizer runs once every several turns rather than every turn and
+    the prompt size levels off instead of growing with the session.
+    
+    A draft longer than draft_tokens is not sent whole: the prompt gets its
+    table of contents plus the sections that best match the user's message
+    (BM25 over the section text).
+    """
+
+    MIN_RELATIVE_SCORE = 0.25
+
+    def __init__(
+        self,
+        summarize: Summarizer,
+        default_budget: int = 4096,
+        budgets: Optional[Dict[str, int]] = None,
+        keep_recent: int = 4,
+        draft_share: float = 0.5,
+        draft_tokens: int = 1500,
+        summary_tokens: int = 400,
+        cache_size: int = 256
+    ):
+        self.summarize = summarize
+        self.default_budget = default_budget
+        self.budgets = budgets or {}
+        self.keep_recent = keep_recent
+        self.draft_share = draft_share
+        self.draft_tokens = draft_tokens
+        self.summary_tokens = summary_tokens
+        self.cache_size = cache_size
+        self._sessions: "OrderedDict[str, _SessionContext]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls, summarize: Summarizer) -> "ContextBuilder":
+        """Create a builder configured from CONTEXT_* environment variables."""
+        return cls(
+            summarize,
+            default_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", 4096)),
+            budgets=cls.parse_budgets(os.getenv("CONTEXT_MODEL_BUDGETS", "")),
+            keep_recent=int(os.getenv("CONTEXT_RECENT_MESSAGES", 4)),
+            draft_tokens=int(os.getenv("CONTEXT_DRAFT_TOKENS", 1500)),
+            summary_tokens=int(os.getenv("CONTEXT_SUMMARY_TOKENS", 400))
+        )
+
+    @staticmethod
+    def parse_budgets(spec: str) -> Dict[str, int]:
+        """Parse "model=tokens,..." (e.g. "mistral:7b=8192,llama2=4096")."""
+        budgets = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            model, _, tokens = item.rpartition("=")
+            budgets[model] = int(tokens)
+        return budgets
+
+    def budget_for(self, model: str) -> int:
+        return self.budgets.get(model, self.default_budget)
+
+    def report(self, session_id: str) -> Optional[Dict[str, Any]]:
+        state = self._sessions.get(session_id)
+        if state is None or state.report is None:
+            return None
+        return state.report.as_dict()
+
+    def _state(self, session_id: str) -> _SessionContext:
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = self._sessions[session_id] = _SessionContext()
+            while len(self._sessions) > self.cache_size:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return state
+
+    async def build(
+        self,
+        session_id: str,
+        session: Dict[str, Any],
+        user_message: str,
+        model: str,
+        reply_tokens: int,
+        system_prompt: Callable[[str], str]
+    ) -> List[Message]:
+        """
+        Messages for the next turn of a session, within the model's budget.
+
+        system_prompt renders the system message around the (possibly
+        shortened) draft. Callers should hold the session lock.
+        """
+        state = self._state(session_id)
+        history = session['conversation_history']
+        if state.covered > len(history):
+            # The history was replaced under us; start over
+            state.covered, state.summary = 0, ""
+
+        budget = self.budget_for(model)
+        available = max(0, budget - reply_tokens)
+        user = {"role": "user", "content": user_message}
+        fixed = estimate_tokens(system_prompt("")) + MESSAGE_OVERHEAD + message_tokens(user)
+
+        draft_limit = min(int(available * self.draft_share), max(0, available - fixed), self.draft_tokens)
+        sections = session['content_sections']
+        previous = next((m['content'] for m in reversed(history) if m['role'] == 'user'), "")
+        draft, sent = self._select_draft(state, sections, f"{user_message}\n{previous}", draft_limit)
+        history_space = available - fixed - estimate_tokens(draft) - self.summary_tokens
+
+        verbatim_tokens = sum(message_tokens(m) for m in history[state.covered:])
+        if verbatim_tokens > history_space:
+            await self._fold(state, history, history_space, verbatim_tokens, model)
+
+        verbatim = history[state.covered:]
+        dropped = 0
+        tokens = sum(message_tokens(m) for m in verbatim)
+        # Last resort (summarizer failed or recent turns are huge): drop the oldest
+        while verbatim and tokens > history_space + self.summary_tokens - estimate_tokens(state.summary):
+            tokens -= message_tokens(verbatim[0])
+            verbatim = verbatim[1:]
+            dropped += 1
+
+        system = system_prompt(draft)
+        if state.summary:
+            system += f"\n\nSummary of the earlier conversation:\n{state.summary}"
+        messages = [{"role": "system", "content": system}, *verbatim, user]
+
+        state.report = ContextReport(
+            model=model,
+            budget=budget,
+            prompt_tokens=sum(message_tokens(m) for m in messages),
+            draft_tokens=estimate_tokens(draft),
+            draft_truncated=sent < len(sections),
+            draft_sections=sent,
+            draft_sections_total=len(sections),
+            summary_tokens=estimate_tokens(state.summary),
+            summarized_messages=state.covered,
+            verbatim_messages=len(verbatim),
+            dropped_messages=dropped
+        )
+        return messages
+
+    def _select_draft(
+        self,
+        state: _SessionContext,
+        sections: Dict[str, str],
+        query: str,
+        limit: int
+    ) -> Tuple[str, int]:
+        """The draft text to send and how many of its sections it contains whole."""
+        document = DraftDocument(sections)
+        if estimate_tokens(document.text) <= limit:
+            return document.text, len(sections)
+
+        toc = "Table of contents:\n" + "\n".join(
+            f"- {key or '(introduction)'} ({len(body.split())} words)" for key, body in sections.items()
+        )
+        header = "Sections relevant to this message (the others are omitted):"
+        space = limit - estimate_tokens(toc) - estimate_tokens(header) - 2
+
+        state.index.update(sections)
+        ranked = state.index.rank(query)
+        chosen = set()
+        used = 0
+        for key, score in ranked:
+            if score < ranked[0][1] * self.MIN_RELATIVE_SCORE:
+                break  # matches only on common words
+            cost = estimate_tokens(sections[key])
+            if used + cost <= space:
+                chosen.add(key)
+                used += cost
+
+        if chosen:
+            body = "".join(text for key, text in sections.items() if key in chosen)
+        else:
+            # Nothing matched or the best match alone is too long: send the start of it
+            key = ranked[0][0] if ranked else next(iter(sections))
+            body, _ = fit_text(sections[key], max(0, space))
+        return f"{toc}\n\n{header}\n\n{body}", len(chosen)
+
+    async def _fold(
+        self,
+        state: _SessionContext,
+        history: List[Message],
+        history_space: int,
+        verbatim_tokens: int,
+        model: str
+    ) -> None:
+        # Fold until the verbatim part uses half the space, so the next
+        # several turns fit without summarizing again
+        covered = state.covered
+        limit = max(covered, len(history) - self.keep_recent)
+        while covered < limit and verbatim_tokens > history_space // 2:
+            verbatim_tokens -= message_tokens(history[covered])
+            covered += 1
+        if covered % 2 and covered < limit:
+            covered += 1  # keep user/assistant pairs together
+        if covered == state.covered:
+            return
+
+        try:
+            summary = await self.summarize(state.summary, history[state.covered:covered], model)
+        except Exception as e:
+            print(f"Warning: could not summarize the conversation: {e}", file=sys.stderr)
+            return
+        state.summary, _ = fit_text(summary.strip(), self.summary_tokens)
+        state.covered = covered
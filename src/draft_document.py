@@ -0,0 +1,281 @@
+"""
+Section-addressable blog drafts
+"""
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .content_validator import HEADING_PATTERN
+
+FENCE_PATTERN = re.compile(r'^[^\S\n]*(```|~~~)')
+HUNK_PATTERN = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+TERM_PATTERN = re.compile(r'\w{2,}')
+
+# Key of the text before the first heading (frontmatter, intro)
+PREAMBLE = ""
+
+
+def heading_key(line: str) -> str:
+    """The section key for a heading line: its text without the #'s."""
+    return line.strip().lstrip('#').strip().rstrip('#').strip()
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """
+    Split Markdown into (heading, section text) pairs at every heading.
+
+    Section texts include their heading line and trailing newlines, so
+    joining them gives back text exactly. Lines inside fenced code blocks
+    are never headings.
+    """
+    sections: List[Tuple[str, str]] = []
+    heading, start, pos = PREAMBLE, 0, 0
+    fence: Optional[str] = None
+    for line in text.splitlines(keepends=True):
+        fence_match = FENCE_PATTERN.match(line)
+        if fence_match:
+            if fence is None:
+                fence = fence_match.group(1)
+            elif fence_match.group(1) == fence:
+                fence = None
+        elif fence is None and HEADING_PATTERN.match(line.rstrip('\r\n')):
+            if pos > start:
+                sections.append((heading, text[start:pos]))
+            heading, start = heading_key(line), pos
+        pos += len(line)
+    if pos > start or not sections:
+        sections.append((heading, text[start:]))
+    return sections
+
+
+def apply_unified_diff(text: str, patch: str) -> str:
+    """
+    Apply a unified diff (as produced by diff -u or difflib) to text.
+
+    Hunks may have drifted a few lines from their stated position; each is
+    located by its context. Raises ValueError when a hunk does not match.
+    """
+    lines = text.splitlines(keepends=True)
+    patch_lines = patch.splitlines(keepends=True)
+    result: List[str] = []
+    cursor = 0
+    i = 0
+    hunks = 0
+    while i < len(patch_lines):
+        header = HUNK_PATTERN.match(patch_lines[i])
+        i += 1
+        if not header:
+            continue
+        hunks += 1
+        old: List[str] = []
+        new: List[str] = []
+        last: Optional[str] = None
+        while i < len(patch_lines) and not patch_lines[i].startswith('@@'):
+            line = patch_lines[i]
+            i += 1
+            if line.startswith('\\'):
+                # "\ No newline at end of file" applies to the previous line
+                for block in (old, new):
+                    if block and block[-1] is last:
+                        block[-1] = block[-1].rstrip('\r\n')
+                continue
+            if line.startswith(('--- ', '+++ ')) and not old and not new:
+                continue
+            if line in ('\n', '\r\n'):
+                line = ' ' + line  # editors strip the space from empty context lines
+            if not line.endswith('\n'):
+                line += '\n'
+            tag, body = line[0], line[1:]
+            last = body
+            if tag in (' ', '-'):
+                old.append(body)
+            if tag in (' ', '+'):
+                new.append(body)
+            if tag not in (' ', '-', '+'):
+                raise ValueError(f"Malformed patch line in hunk {hunks}: {line.rstrip()!r}")
+
+        stated = max(int(header.group(1)) - 1, 0) if old else int(header.group(1))
+        at = _locate(lines, old, stated, cursor)
+        if at is None:
+            raise ValueError(f"Patch does not apply: hunk {hunks} (line {header.group(1)}) does not match the draft")
+        result.extend(lines[cursor:at])
+        result.extend(new)
+        cursor = at + len(old)
+
+    if not hunks:
+        raise ValueError("Patch contains no hunks")
+    result.extend(lines[cursor:])
+    return "".join(result)
+
+
+def _locate(lines: List[str], old: List[str], stated: int, floor: int) -> Optional[int]:
+    def matches(at: int) -> bool:
+        return lines[at:at + len(old)] == old or [l.rstrip('\r\n') for l in lines[at:at + len(old)]] == [
+            l.rstrip('\r\n') for l in old
+        ]
+
+    limit = len(lines) - len(old)
+    for offset in range(0, len(lines) + 1):
+        for at in (stated - offset, stated + offset):
+            if floor <= at <= limit and matches(at):
+                return at
+        if stated - offset < floor and stated + offset > limit:
+            break
+    return None
+
+
+class DraftDocument:
+    """
+    A draft held as ordered sections keyed by heading.
+
+    The full text is only assembled when something reads it (saving,
+    prompting); section edits touch only the affected sections. Repeated
+    headings get keys like "Example (2)".
+    """
+
+    def __init__(self, sections: Optional[Dict[str, str]] = None):
+        self.sections: Dict[str, str] = dict(sections or {})
+        self._text: Optional[str] = None
+
+    @classmethod
+    def from_text(cls, text: str) -> "DraftDocument":
+        return cls(cls._keyed(split_sections(text)) if text else {})
+
+    @staticmethod
+    def _keyed(pairs: List[Tuple[str, str]]) -> Dict[str, str]:
+        keyed: Dict[str, str] = {}
+        for heading, body in pairs:
+            key, n = heading, 1
+            while key in keyed:
+                n += 1
+                key = f"{heading} ({n})"
+            keyed[key] = body
+        return keyed
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "".join(self.sections.values())
+        return self._text
+
+    def __len__(self) -> int:
+        return sum(len(body) for body in self.sections.values())
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return iter(self.sections.items())
+
+    def keys(self) -> List[str]:
+        return list(self.sections)
+
+    def replace_sections(self, replacements: Dict[str, Optional[str]]) -> None:
+        """
+        Replace, delete or add sections by key.
+
+        A replacement that starts with a heading replaces the whole section
+        (and may rename it or split it into several); otherwise only the body
+        under the existing heading is replaced. An empty value deletes the
+        section. Unknown keys are appended when their text starts with a
+        heading, and raise KeyError otherwise.
+        """
+        pending = dict(replacements)
+        for key, value in pending.items():
+            if key not in self.sections and value and not self._starts_with_heading(value):
+                raise KeyError(key)
+
+        pairs: List[Tuple[str, str]] = []
+        edited = set()
+        for key, body in self.sections.items():
+            if key not in pending:
+                pairs.append((self._heading_of(key), body))
+                continue
+            value = pending.pop(key)
+            if not value:
+                continue
+            if not self._starts_with_heading(value) and key != PREAMBLE:
+                head = body.splitlines(keepends=True)[:2]
+                # Keep the heading line and the blank line under it
+                value = "".join(head if len(head) == 2 and not head[1].strip() else head[:1]) + value
+            new = split_sections(value)
+            edited.update(range(len(pairs), len(pairs) + len(new)))
+            pairs.extend(new)
+        for key, value in pending.items():
+            if value:
+                new = split_sections(value)
+                edited.update(range(len(pairs), len(pairs) + len(new)))
+                pairs.extend(new)
+
+        # Separate sections from the next heading by a blank line, or it would join their last line
+        for index in range(len(pairs) - 1):
+            heading, body = pairs[index]
+            if (index in edited and not body.endswith('\n\n')) or not body.endswith('\n'):
+                pairs[index] = (heading, body.rstrip('\n') + '\n\n')
+        self.sections = self._keyed(pairs)
+        self._text = None
+
+    def apply_patch(self, patch: str) -> None:
+        """Apply a unified diff against the full text; raises ValueError if it does not apply."""
+        self.sections = self.from_text(apply_unified_diff(self.text, patch)).sections
+        self._text = None
+
+    def _heading_of(self, key: str) -> str:
+        match = re.match(r'^(.*) \(\d+\)$', key)
+        return match.group(1) if match and match.group(1) in self.sections else key
+
+    @staticmethod
+    def _starts_with_heading(value: str) -> bool:
+        return bool(HEADING_PATTERN.match(value.lstrip('\n').split('\n', 1)[0]))
+
+
+def terms(text: str) -> List[str]:
+    return TERM_PATTERN.findall(text.lower())
+
+
+class SectionIndex:
+    """
+    BM25 ranking of a draft's sections against a query.
+
+    Term counts are cached per section and only recomputed for sections
+    whose text changed, so re-ranking after a one-section edit is cheap.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Tuple[str, Counter, int]] = {}
+
+    def update(self, sections: Dict[str, str]) -> None:
+        entries = {}
+        for key, text in sections.items():
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != text:
+                counts = Counter(terms(text))
+                entry = (text, counts, sum(counts.values()))
+            entries[key] = entry
+        self._entries = entries
+
+    def rank(self, query: str) -> List[Tuple[str, float]]:
+        """Section keys with a positive score, best first."""
+        query_terms = set(terms(query))
+        if not query_terms or not self._entries:
+            return []
+        n = len(self._entries)
+        average = sum(length for _, _, length in self._entries.values()) / n or 1.0
+        idf = {}
+        for term in query_terms:
+            df = sum(1 for _, counts, _ in self._entries.values() if term in counts)
+            if df:
+                idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+        scores = []
+        for key, (_, counts, length) in self._entries.items():
+            norm = self.K1 * (1 - self.B + self.B * length / average)
+            score = sum(
+                weight * counts[term] * (self.K1 + 1) / (counts[term] + norm)
+                for term, weight in idf.items() if term in counts
+            )
+            if score > 0:
+                scores.append((key, score))
+        scores.sort(key=lambda item: -item[1])
+        return scores
@@ -0,0 +1,510 @@
+"""
+Blog post draft generation: single-shot or outline-then-parallel-sections
+"""
+import asyncio
+import json
+import re
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from .schemas import ChatCompletionRequest, DraftPostRequest, DraftPostResponse
+from .ollama_client import OllamaClient
+from .content_validator import ContentValidator, IncrementalValidator
+from . import post_io
+
+SYSTEM_PROMPT = "You are an expert technical writer who creates engaging blog posts in Quarto format. Start directly with the main content - do NOT include YAML frontmatter as it will be added automatically."
+
+SECTION_MAX_TOKENS = 800
+MIN_SECTIONS = 3
+MAX_SECTIONS = 8
+
+
+def make_slug(topic: str) -> str:
+    """Turn a topic into a filename-safe slug."""
+    slug = re.sub(r'[^a-zA-Z0-9\s-]', '', topic.lower())
+    slug = re.sub(r'\s+', '-', slug.strip())
+    return slug[:50]  # Limit length
+
+
+async def reserve_draft_path(blog_folder: Path, topic: str) -> Tuple[str, Path]:
+    """Claim a dated filename for the draft that no other request can take."""
+    date_str = datetime.now().strftime("%Y-%m-%d")
+    return await post_io.reserve_unique(blog_folder, f"{date_str}-{make_slug(topic)}", ".qmd")
+
+
+def strip_frontmatter(text: str) -> str:
+    """Remove any YAML frontmatter block the model generated anyway."""
+    lines = text.split('\n')
+    content_start = 0
+    if lines[0].strip() == "---":
+        for i, line in enumerate(lines[1:], 1):
+            if line.strip() == "---":
+                content_start = i + 1
+                break
+    return '\n'.join(lines[content_start:]).strip()
+
+
+def build_frontmatter(topic: str) -> str:
+    return f"""---
+title: "{topic}"
+description: "A comprehensive guide to {topic.lower()}"
+author: "AI Assistant"
+date: "{datetime.now().strftime('%Y-%m-%d')}"
+categories: [blog, ai, guide]
+---
+
+"""
+
+
+def make_preview(content: str) -> str:
+    """First 200 characters of the post body, excluding frontmatter."""
+    content_lines = content.split('\n')
+    content_start = 0
+    for i, line in enumerate(content_lines):
+        if line.strip() == "---" and i > 0:
+            content_start = i + 1
+            break
+
+    content_preview = '\n'.join(content_lines[content_start:])
+    preview = content_preview[:200] + "..." if len(content_preview) > 200 else content_preview
+    return preview.strip()
+
+
+def build_prompt(topic: str) -> str:
+    return f"""Create a comprehensive Quarto blog post about "{topic}".
+
+Structure the post with:
+1. YAML frontmatter including title, description, author, date, categories
+2. Introduction paragraph
+3. Main content with headings and subheadings
+4. Code examples if relevant
+5. Conclusion
+
+Make it engaging and informative. Use proper Quarto markdown formatting.
+
+Topic: {topic}"""
+
+
+class FrontmatterStripper:
+    """
+    Incremental strip_frontmatter for streamed text.
+
+    Feed chunks as they arrive and finish with flush(); the concatenated
+    output equals strip_frontmatter() of the whole text. Only a leading
+    frontmatter block and trailing whitespace are ever held back.
+    """
+
+    def __init__(self):
+        self._state = "start"
+        self._buffer = ""
+        self._pending_space = ""
+
+    def feed(self, text: str) -> str:
+        if self._state == "start":
+            self._buffer += text
+            first_line, newline, _ = self._buffer.partition('\n')
+            opening = first_line.strip()
+            if not newline and (not opening or "---".startswith(opening)):
+                return ""
+            if opening == "---":
+                self._state = "frontmatter"
+                return self._scan_frontmatter() or ""
+            text, self._buffer = self._buffer, ""
+            self._state = "leading"
+        elif self._state == "frontmatter":
+            self._buffer += text
+            return self._scan_frontmatter() or ""
+        return self._emit(text)
+
+    def _scan_frontmatter(self, final: bool = False) -> Optional[str]:
+        lines = self._buffer.split('\n')
+        # Skip the opening line; until the stream ends the last piece may be incomplete
+        for i, line in enumerate(lines[1:] if final else lines[1:-1], 1):
+            if line.strip() == "---":
+                rest = '\n'.join(lines[i + 1:])
+                self._buffer = ""
+                self._state = "leading"
+                return self._emit(rest)
+        return None
+
+    def _emit(self, text: str) -> str:
+        if self._state == "leading":
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._state = "body"
+        body = text.rstrip()
+        if not body:
+            self._pending_space += text
+            return ""
+        out = self._pending_space + body
+        self._pending_space = text[len(body):]
+        return out
+
+    def flush(self) -> str:
+        """Return whatever is still held back once the stream has ended."""
+        if self._state == "start":
+            self._state = "leading"
+            text, self._buffer = self._buffer, ""
+            return self._emit(text)
+        if self._state == "frontmatter":
+            text = self._scan_frontmatter(final=True)
+            if text is not None:
+                return text
+            # No closing delimiter: like strip_frontmatter, keep everything
+            self._state = "leading"
+            text, self._buffer = self._buffer, ""
+            return self._emit(text)
+        return ""
+
+
+def single_request(request: DraftPostRequest) -> ChatCompletionRequest:
+    return ChatCompletionRequest(
+        model=request.model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_prompt(request.topic)}
+        ],
+        temperature=0.7,
+        max_tokens=2000
+    )
+
+
+async def stream_body(
+    client: OllamaClient,
+    chat_request: ChatCompletionRequest,
+    validator: IncrementalValidator
+) -> AsyncGenerator[str, None]:
+    """
+    Stream generated text with any model-written frontmatter removed.
+
+    Every piece is fed to the validator; once it reports a reason to abort
+    the stream ends and the upstream generation is cancelled.
+    """
+    stripper = FrontmatterStripper()
+    deltas = client.stream_text(chat_request)
+    try:
+        async for delta in deltas:
+            text = stripper.feed(delta)
+            if text:
+                yield text
+                if validator.feed(text):
+                    # Not a client disconnect; keep it out of the cancellation stats
+                    client.stop_early(chat_request)
+                    return
+        tail = stripper.flush()
+        if tail:
+            validator.feed(tail)
+            yield tail
+    finally:
+        await deltas.aclose()
+
+
+async def generate_single(
+    client: OllamaClient,
+    request: DraftPostRequest,
+    early_stops: Optional[List[str]] = None
+) -> str:
+    """Generate the whole post body in one completion, stopping runaway output early."""
+    validator = IncrementalValidator.from_env()
+    body = ''.join([text async for text in stream_body(client, single_request(request), validator)])
+    if validator.abort_reason and early_stops is not None:
+        early_stops.append(validator.abort_reason)
+    return body
+
+
+def parse_outline(text: str) -> List[str]:
+    """Pull section headings out of an outline reply, one per line."""
+    headings = []
+    for line in text.split('\n'):
+        heading = re.sub(r'^\s*(?:#+|[-*+]|\d+[.)])\s*', '', line).strip().strip('*').strip()
+        if heading and heading not in headings:
+            headings.append(heading)
+    return headings[:MAX_SECTIONS]
+
+
+async def generate_outline(client: OllamaClient, request: DraftPostRequest) -> List[str]:
+    """Ask for a short list of section headings for the post."""
+    chat_request = ChatCompletionRequest(
+        model=request.model,
+        messages=[
+            {"role": "system", "content": "You plan technical blog posts. Reply with section headings only, one per line, with no numbering and no other text."},
+            {"role": "user", "content": f"""Outline a Quarto blog post about "{request.topic}".
+
+List {MIN_SECTIONS + 1} to {MAX_SECTIONS - 1} section headings, starting with an introduction and ending with a conclusion."""}
+        ],
+        temperature=0.3,
+        max_tokens=200
+    )
+    response = await client.chat_completion(chat_request)
+    return parse_outline(response.choices[0].message.content)
+
+
+async def generate_section(
+    client: OllamaClient,
+    request: DraftPostRequest,
+    outline: List[str],
+    index: int,
+    early_stops: Optional[List[str]] = None
+) -> str:
+    """Write one section of the outline as a level-2 heading plus body."""
+    heading = outline[index]
+    plan = '\n'.join(f"{i + 1}. {title}" for i, title in enumerate(outline))
+    chat_request = ChatCompletionRequest(
+        model=request.model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"""You are writing one section of a Quarto blog post about "{request.topic}".
+
+The full outline is:
+{plan}
+
+Write only section {index + 1}, "{heading}". Start with the line "## {heading}", use ### for any subheadings, include code examples if relevant, and do not repeat other sections."""}
+        ],
+        temperature=0.7,
+        max_tokens=SECTION_MAX_TOKENS
+    )
+    # A section starts with its own heading, so only length and repetition apply
+    validator = IncrementalValidator.from_env(first_heading_within=None)
+    body = ''.join([text async for text in stream_body(client, chat_request, validator)])
+    if validator.abort_reason and early_stops is not None:
+        early_stops.append(f"{heading}: {validator.abort_reason}")
+    if not body.lstrip().startswith('#'):
+        body = f"## {heading}\n\n{body}"
+    return body
+
+
+async def iter_sections(
+    client: OllamaClient,
+    request: DraftPostRequest,
+    early_stops: Optional[List[str]] = None
+) -> AsyncGenerator[str, None]:
+    """
+    Outline the post, then write its sections concurrently.
+
+    At most admission.capacity(model) sections are generated at once, so a
+    single draft never queues behind itself. Sections are yielded in outline
+    order as soon as each one and all before it are done. Falls back to
+    single-shot generation if the outline is unusable.
+    """
+    outline = await generate_outline(client, request)
+    if len(outline) < MIN_SECTIONS:
+        yield await generate_single(client, request, early_stops)
+        return
+
+    semaphore = asyncio.Semaphore(max(1, client.admission.capacity(request.model)))
+
+    async def bounded(index: int) -> str:
+        async with semaphore:
+            return await generate_section(client, request, outline, index, early_stops)
+
+    tasks = [asyncio.ensure_future(bounded(i)) for i in range(len(outline))]
+    try:
+        for task in tasks:
+            yield (await task).strip()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def generate_sections(
+    client: OllamaClient,
+    request: DraftPostRequest,
+    early_stops: Optional[List[str]] = None
+) -> str:
+    """Outline the post and write its sections in parallel (see iter_sections)."""
+    return '\n\n'.join([section async for section in iter_sections(client, request, early_stops)])
+
+
+async def check_model(client: OllamaClient, model: str, strict: bool = False) -> None:
+    """
+    Validate that the requested model is available.
+
+    A model missing from Ollama's list is only a warning unless strict:
+    the HTTP API has always let Ollama resolve the name itself. Warnings go
+    to stderr, since stdout is the JSON-RPC channel inside the MCP server.
+    """
+    try:
+        available_models = await client.list_models()
+        model_names = [m.get('name', '') for m in available_models.get('models', [])]
+    except Exception as e:
+        # If we can't validate models, log a warning but continue
+        print(f"Warning: Could not validate model availability: {e}", file=sys.stderr)
+        return
+    if model not in model_names:
+        detail = f"Model '{model}' is not available. Available models: {', '.join(model_names)}"
+        if strict:
+            raise HTTPException(status_code=400, detail=detail)
+        print(f"Warning: {detail}", file=sys.stderr)
+
+
+async def create_draft(
+    client: OllamaClient,
+    request: DraftPostRequest,
+    strict_model: bool = False
+) -> DraftPostResponse:
+    """Generate, validate and write a draft post; strict_model rejects models Ollama doesn't list."""
+    try:
+        await check_model(client, request.model, strict_model)
+
+        # Creates the blog folder if needed and an empty placeholder file
+        filename, full_path = await reserve_draft_path(Path(request.blog_folder), request.topic)
+
+        # Generate content using Ollama
+        early_stops: List[str] = []
+        try:
+            if request.mode == "sections":
+                main_content = await generate_sections(client, request, early_stops)
+            else:
+                main_content = await generate_single(client, request, early_stops)
+
+            content = build_frontmatter(request.topic) + main_content
+
+            # Validate content quality
+            analysis = ContentValidator.analyze(content)
+
+            # Write to file
+            await post_io.write_atomic(full_path, content)
+        except BaseException:
+            # Never leave the empty placeholder behind
+            await post_io.discard(full_path)
+            raise
+
+        return DraftPostResponse(
+            filename=filename,
+            preview=make_preview(content),
+            full_path=str(full_path.absolute()),
+            status="success",
+            word_count=analysis.word_count,
+            content_stats=analysis.stats,
+            content_issues=_with_early_stops(analysis.issues, early_stops),
+            stopped_early="; ".join(early_stops) or None
+        )
+
+    except HTTPException:
+        # Re-raise HTTP exceptions as-is
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create blog post draft: {str(e)}")
+
+
+async def _draft_text(
+    client: OllamaClient,
+    request: DraftPostRequest,
+    early_stops: List[str],
+    validator: IncrementalValidator
+) -> AsyncGenerator[str, None]:
+    """
+    Post body as it is generated, with any model-written frontmatter removed.
+
+    Every piece is fed to validator. In single mode its abort rules stop
+    the generation; sections mode checks each section on its own.
+    """
+    if request.mode == "sections":
+        first = True
+        async for section in iter_sections(client, request, early_stops):
+            text = section if first else '\n\n' + section
+            validator.feed(text)
+            yield text
+            first = False
+        return
+
+    body = stream_body(client, single_request(request), validator)
+    try:
+        async for text in body:
+            yield text
+    finally:
+        await body.aclose()
+    if validator.abort_reason:
+        early_stops.append(validator.abort_reason)
+
+
+def _with_early_stops(analysis_issues: List[str], early_stops: List[str]) -> Optional[List[str]]:
+    issues = [f"Generation stopped early: {reason}" for reason in early_stops] + analysis_issues
+    return issues or None
+
+
+async def stream_draft(
+    client: OllamaClient,
+    request: DraftPostRequest,
+    strict_model: bool = False
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Generate a draft while streaming progress events (strict_model as in create_draft).
+
+    Yields a "start" event with the target filename, "content" events with
+    text as it is generated, and a final "done" event carrying the
+    DraftPostResponse fields, or an "error" event. Text is appended to a
+    hidden temporary file next to the target, which replaces the (empty)
+    reserved file only once generation has finished.
+    """
+    full_path = None
+    writer = None
+    committed = False
+    try:
+        await check_model(client, request.model, strict_model)
+
+        filename, full_path = await reserve_draft_path(Path(request.blog_folder), request.topic)
+        yield {"event": "start", "filename": filename, "full_path": str(full_path.absolute())}
+
+        writer = await post_io.AtomicWriter(full_path).open()
+        frontmatter = build_frontmatter(request.topic)
+        await writer.write(frontmatter)
+        early_stops: List[str] = []
+        if request.mode == "sections":
+            validator = IncrementalValidator(max_words=sys.maxsize, first_heading_within=None, detect_repetition=False)
+        else:
+            validator = IncrementalValidator.from_env()
+        # The final stats come from the validator's running counts, so the
+        # committed file is never read back. ContentValidator.analyze() keeps
+        # the blank line after the frontmatter as part of the body.
+        validator.feed("\n")
+        # make_preview() needs the frontmatter and the body's first 200 characters, plus one
+        # to tell whether the preview is cut short
+        head: List[str] = [frontmatter]
+        head_size = len(frontmatter)
+        async for text in _draft_text(client, request, early_stops, validator):
+            await writer.write(text)
+            if head_size <= len(frontmatter) + 201:
+                head.append(text)
+                head_size += len(text)
+            yield {"event": "content", "text": text}
+        await writer.commit()
+        committed = True
+
+        analysis = validator.analysis()
+
+        response = DraftPostResponse(
+            filename=filename,
+            preview=make_preview(''.join(head)),
+            full_path=str(full_path.absolute()),
+            status="success",
+            word_count=analysis.word_count,
+            content_stats=analysis.stats,
+            content_issues=_with_early_stops(analysis.issues, early_stops),
+            stopped_early="; ".join(early_stops) or None
+        )
+        yield {"event": "done", **response.model_dump()}
+
+    except HTTPException as e:
+        yield {"event": "error", "status_code": e.status_code, "detail": e.detail}
+    except Exception as e:
+        yield {"event": "error", "status_code": 500, "detail": f"Failed to create blog post draft: {str(e)}"}
+    finally:
+        if not committed:
+            if writer is not None:
+                await writer.abort()
+            if full_path is not None:
+                await post_io.discard(full_path)
+
+
+async def stream_draft_ndjson(client: OllamaClient, request: DraftPostRequest) -> AsyncGenerator[str, None]:
+    """stream_draft() encoded as newline-delimited JSON."""
+    events = stream_draft(client, request)
+    try:
+        async for event in events:
+            yield json.dumps(event) + "\n"
+    finally:
+        await events.aclose()
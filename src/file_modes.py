@@ -0,0 +1,32 @@
+"""
+Permission bits for files written through a temp file and os.replace
+"""
+import os
+from pathlib import Path
+
+
+def _read_umask() -> int:
+    # os.umask can only be read by setting it; do it once, before any worker threads exist
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+UMASK = _read_umask()
+
+
+def match_mode(fd: int, path: Path) -> None:
+    """
+    Give a mkstemp file (always 0600) the mode the file it replaces has.
+
+    os.replace keeps the temp file's mode, so without this every atomic
+    write would leave the target private. New files get the mode a plain
+    open() would have given them.
+    """
+    if not hasattr(os, "fchmod"):
+        return  # Windows: no POSIX permission bits to carry over
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666 & ~UMASK
+    os.fchmod(fd, mode)
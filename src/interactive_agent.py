@@ -6,69 +6,87 @@ import asyncio
 import json
 import sys
 import os
+import uuid
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Awaitable, Callable, Dict, Any, List, Optional
 import httpx
 from .schemas import ChatCompletionRequest, ChatCompletionResponse, DraftPostRequest, DraftPostResponse
 from .ollama_client import OllamaClient
+from . import post_io
+from .session_store import SessionLockTimeout, SessionStore, create_session_store
+from .context_builder import ContextBuilder
+from .draft_document import DraftDocument
+
+BUSY_MESSAGE = "The session is busy with another request. Please try again in a moment."
 
-# Interactive writing session state
-writing_sessions = {}
 
 class InteractiveBlogAgent:
-    def __init__(self, base_url: str = "http://localhost:11434"):
-        self.ollama_client = OllamaClient(base_url)
+    def __init__(self, base_url: Optional[str] = None, session_store: Optional[SessionStore] = None):
+        # Configured from OLLAMA_* like the API server; the MCP server's direct mode shares this client
+        self.ollama_client = OllamaClient(base_url) if base_url else OllamaClient.from_env()
+        # Interactive writing session state (bounded; see SESSION_* settings)
+        self.sessions = session_store or create_session_store()
+        self.context = ContextBuilder.from_env(self._summarize)
         self.current_session = None
         
-    def start_session(self, blog_folder: str, topic: str) -> str:
+    async def start_session(self, blog_folder: str, topic: str) -> str:
         """Start a new interactive writing session"""
-        session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        # Random suffix: sessions may be started by several workers in the same second
+        session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
         
-        writing_sessions[session_id] = {
+        await self.sessions.create(session_id, {
             'blog_folder': blog_folder,
             'topic': topic,
             'content_sections': {},
-            'current_draft': '',
             'conversation_history': [],
             'created_at': datetime.now().isoformat()
-        }
+        })
         
         self.current_session = session_id
         return session_id
     
-    async def chat_about_post(self, session_id: str, user_message: str, model: str = "mistral:7b") -> str:
-        """Have a conversation about the blog post"""
-        if session_id not in writing_sessions:
-            return "Session not found. Please start a new session."
-        
-        session = writing_sessions[session_id]
-        
-        # Build context from conversation history
-        context_messages = [
-            {
-                "role": "system", 
-                "content": f"""You are an expert blog writing assistant. You're helping write a blog post about "{session['topic']}". 
-
-Current draft content:
-{session['current_draft'] if session['current_draft'] else 'No content yet'}
-
-You should:
-1. Help refine ideas and structure
-2. Suggest content improvements
-3. Write specific sections when asked
-4. Provide feedback on existing content
-5. Help with formatting and organization
-
-Be conversational and collaborative. Ask clarifying questions when needed."""
-            }
-        ]
-        
-        # Add conversation history
-        context_messages.extend(session['conversation_history'])
-        
-        # Add current user message
-        context_messages.append({"role": "user", "content": user_message})
+    async def chat_about_post(
+        self,
+        session_id: str,
+        user_message: str,
+        model: str = "mistral:7b",
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> str:
+        """
+        Have a conversation about the blog post.
+        
+        With on_delta the reply is streamed and each piece of text is passed
+        to it as it is generated.
+        """
+        # One turn at a time per session so the history stays in order
+        try:
+            async with self.sessions.lock(session_id):
+                session = await self.sessions.get(session_id)
+                if session is None:
+                    return "Session not found. Please start a new session."
+                
+                return await self._chat_turn(session_id, session, user_message, model, on_delta)
+        except SessionLockTimeout:
+            return BUSY_MESSAGE
+    
+    async def _chat_turn(
+        self,
+        session_id: str,
+        session: Dict[str, Any],
+        user_message: str,
+        model: str,
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> str:
+        # Build context from the draft and conversation history, within the model's token budget
+        context_messages = await self.context.build(
+            session_id,
+            session,
+            user_message,
+            model,
+            reply_tokens=1500,
+            system_prompt=lambda draft: self._system_prompt(session['topic'], draft)
+        )
         
         # Get AI response
         chat_request = ChatCompletionRequest(
@@ -78,33 +96,116 @@ Be conversational and collaborative. Ask clarifying questions when needed."""
             max_tokens=1500
         )
         
-        response = await self.ollama_client.chat_completion(chat_request)
-        ai_response = response.choices[0].message.content
+        if on_delta is None:
+            response = await self.ollama_client.chat_completion(chat_request)
+            ai_response = response.choices[0].message.content
+        else:
+            parts = []
+            deltas = self.ollama_client.stream_text(chat_request)
+            try:
+                async for delta in deltas:
+                    parts.append(delta)
+                    await on_delta(delta)
+            finally:
+                await deltas.aclose()
+            ai_response = "".join(parts)
         
         # Update conversation history
-        session['conversation_history'].append({"role": "user", "content": user_message})
-        session['conversation_history'].append({"role": "assistant", "content": ai_response})
+        await self.sessions.append_turns(session_id, [
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": ai_response}
+        ])
         
         return ai_response
     
-    async def update_draft(self, session_id: str, content: str) -> str:
-        """Update the current draft content"""
-        if session_id not in writing_sessions:
-            return "Session not found."
-        
-        session = writing_sessions[session_id]
-        session['current_draft'] = content
+    @staticmethod
+    def _system_prompt(topic: str, draft: str) -> str:
+        return f"""You are an expert blog writing assistant. You're helping write a blog post about "{topic}". 
+
+Current draft content:
+{draft if draft else 'No content yet'}
+
+You should:
+1. Help refine ideas and structure
+2. Suggest content improvements
+3. Write specific sections when asked
+4. Provide feedback on existing content
+5. Help with formatting and organization
+
+Be conversational and collaborative. Ask clarifying questions when needed."""
+    
+    async def _summarize(self, summary: str, turns: List[Dict[str, str]], model: str) -> str:
+        """Fold older turns into the rolling conversation summary."""
+        transcript = "\n\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        request = ChatCompletionRequest(
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "Summarize a conversation between a writer and a blog writing assistant. "
+                        "Keep decisions, the agreed outline, requested changes and open questions. "
+                        f"Reply with the updated summary only, under {self.context.summary_tokens * 3 // 4} words."
+                    )
+                },
+                {"role": "user", "content": f"Summary so far:\n{summary or 'None'}\n\nNew conversation:\n{transcript}"}
+            ],
+            temperature=0.2,
+            max_tokens=self.context.summary_tokens
+        )
+        response = await self.ollama_client.chat_completion(request)
+        return response.choices[0].message.content
+    
+    async def update_draft(
+        self,
+        session_id: str,
+        content: Optional[str] = None,
+        sections: Optional[Dict[str, Optional[str]]] = None,
+        patch: Optional[str] = None
+    ) -> str:
+        """
+        Update the current draft content.
+        
+        Pass exactly one of: content (the whole draft), sections (heading ->
+        new section text; empty deletes) or patch (a unified diff).
+        """
+        if sum(arg is not None for arg in (content, sections, patch)) != 1:
+            return "Provide exactly one of content, sections or patch."
+        
+        try:
+            async with self.sessions.lock(session_id):
+                session = await self.sessions.get(session_id)
+                if session is None:
+                    return "Session not found."
+                
+                if content is not None:
+                    document = DraftDocument.from_text(content)
+                else:
+                    document = DraftDocument(session['content_sections'])
+                    try:
+                        if sections is not None:
+                            document.replace_sections(sections)
+                        else:
+                            document.apply_patch(patch)
+                    except KeyError as e:
+                        return f"Section not found: {e.args[0]}. Sections: {', '.join(document.keys())}"
+                    except ValueError as e:
+                        return str(e)
+                
+                await self.sessions.set_draft(session_id, document.sections)
+        except SessionLockTimeout:
+            return BUSY_MESSAGE
         
         return "Draft updated successfully."
     
     async def save_draft(self, session_id: str, filename: Optional[str] = None) -> str:
         """Save the current draft to a file"""
-        if session_id not in writing_sessions:
+        session = await self.sessions.get(session_id)
+        if session is None:
             return "Session not found."
         
-        session = writing_sessions[session_id]
-        
-        if not session['current_draft']:
+        document = DraftDocument(session['content_sections'])
+        if not len(document):
             return "No draft content to save."
         
         # Create filename if not provided
@@ -117,14 +218,11 @@ Be conversational and collaborative. Ask clarifying questions when needed."""
         if not filename.endswith('.md'):
             filename += '.md'
         
-        # Save to blog folder
-        blog_folder = Path(session['blog_folder'])
-        blog_folder.mkdir(parents=True, exist_ok=True)
-        
-        file_path = blog_folder / filename
+        # Save to blog folder (created on first write)
+        file_path = Path(session['blog_folder']) / filename
         
         # Add frontmatter if not present
-        content = session['current_draft']
+        content = document.text
         if not content.startswith('---'):
             frontmatter = f"""---
 title: "{session['topic']}"
@@ -135,24 +233,27 @@ draft: true
 """
             content = frontmatter + content
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        # Atomic replace off the event loop: re-saving never leaves a half-written file
+        await post_io.write_atomic(file_path, content)
         
         return f"Draft saved to: {file_path}"
     
-    def get_session_status(self, session_id: str) -> Dict[str, Any]:
+    async def get_session_status(self, session_id: str) -> Dict[str, Any]:
         """Get current session status"""
-        if session_id not in writing_sessions:
+        session = await self.sessions.get(session_id)
+        if session is None:
             return {"error": "Session not found"}
         
-        session = writing_sessions[session_id]
         return {
             "session_id": session_id,
             "topic": session['topic'],
             "blog_folder": session['blog_folder'],
-            "draft_length": len(session['current_draft']),
+            "draft_length": len(DraftDocument(session['content_sections'])),
+            "sections": list(session['content_sections']),
             "conversation_turns": len(session['conversation_history']) // 2,
-            "created_at": session['created_at']
+            "created_at": session['created_at'],
+            "context": self.context.report(session_id),
+            "store": await self.sessions.metrics()
         }
 
 # Global agent instance
@@ -164,7 +265,7 @@ async def _call_start_writing_session(args: Dict[str, Any]) -> Dict[str, Any]:
         blog_folder = args.get('blog_folder', '.')
         topic = args.get('topic', 'New Blog Post')
         
-        session_id = interactive_agent.start_session(blog_folder, topic)
+        session_id = await interactive_agent.start_session(blog_folder, topic)
         
         return {
             "session_id": session_id,
@@ -180,7 +281,10 @@ async def _call_start_writing_session(args: Dict[str, Any]) -> Dict[str, Any]:
     except Exception as e:
         return {"error": f"Failed to start session: {str(e)}"}
 
-async def _call_chat_about_post(args: Dict[str, Any]) -> Dict[str, Any]:
+async def _call_chat_about_post(
+    args: Dict[str, Any],
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+) -> Dict[str, Any]:
     """Chat about the blog post"""
     try:
         session_id = args.get('session_id', '')
@@ -190,11 +294,12 @@ async def _call_chat_about_post(args: Dict[str, Any]) -> Dict[str, Any]:
         if not session_id or not message:
             return {"error": "session_id and message are required"}
         
-        response = await interactive_agent.chat_about_post(session_id, message, model)
+        response = await interactive_agent.chat_about_post(session_id, message, model, on_delta)
         
         return {
             "response": response,
-            "session_id": session_id
+            "session_id": session_id,
+            "context": interactive_agent.context.report(session_id)
         }
     except Exception as e:
         return {"error": f"Chat failed: {str(e)}"}
@@ -203,12 +308,16 @@ async def _call_update_draft(args: Dict[str, Any]) -> Dict[str, Any]:
     """Update the current draft"""
     try:
         session_id = args.get('session_id', '')
-        content = args.get('content', '')
         
         if not session_id:
             return {"error": "session_id is required"}
         
-        result = await interactive_agent.update_draft(session_id, content)
+        result = await interactive_agent.update_draft(
+            session_id,
+            content=args.get('content'),
+            sections=args.get('sections'),
+            patch=args.get('patch')
+        )
         
         return {
             "result": result,
@@ -243,7 +352,7 @@ async def _call_get_session_status(args: Dict[str, Any]) -> Dict[str, Any]:
         if not session_id:
             return {"error": "session_id is required"}
         
-        return interactive_agent.get_session_status(session_id)
+        return await interactive_agent.get_session_status(session_id)
     except Exception as e:
         return {"error": f"Status check failed: {str(e)}"}
 
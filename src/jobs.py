@@ -0,0 +1,348 @@
+"""
+Background job queue for long-running tool calls, persisted in SQLite
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from fastapi import HTTPException
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+class JobStore:
+    """
+    SQLite table of jobs shared by every worker process; every call runs in a worker thread.
+
+    A running job carries its owner and a lease expiry. claim() hands out
+    the oldest queued job, or a running one whose owner stopped renewing
+    its lease, in a single write transaction, so two workers never get
+    the same job.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    status_code INTEGER,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            # Databases from before leases: add the columns, and let any running job be taken over
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            for column in ("owner TEXT", "lease_expires REAL", "attempts INTEGER NOT NULL DEFAULT 0"):
+                if column.split()[0] not in columns:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+            self._db.execute("UPDATE jobs SET lease_expires = 0 WHERE status = ? AND lease_expires IS NULL", (RUNNING,))
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        def locked() -> Any:
+            with self._lock, self._db:
+                return fn(*args)
+        return await asyncio.get_event_loop().run_in_executor(None, locked)
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    async def insert(self, job_id: str, kind: str, payload: Dict[str, Any]) -> None:
+        await self._run(
+            self._db.execute,
+            "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(payload), time.time())
+        )
+
+    async def transition(self, job_id: str, expected: str, owner: Optional[str] = None, **fields: Any) -> bool:
+        """
+        Update a job only if its status is still expected (and, if given, it is held by owner).
+
+        Returns False when another worker or a cancellation changed it first.
+        """
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        where = "id = ? AND status = ?" + (" AND owner = ?" if owner is not None else "")
+        params = (*fields.values(), job_id, expected) + ((owner,) if owner is not None else ())
+
+        def update() -> bool:
+            return self._db.execute(f"UPDATE jobs SET {columns} WHERE {where}", params).rowcount == 1
+
+        return await self._run(update)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        def fetch() -> Optional[sqlite3.Row]:
+            return self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        row = await self._run(fetch)
+        return self._decode(row) if row is not None else None
+
+    async def claim(self, owner: str, lease: float, max_attempts: int) -> Optional[Dict[str, Any]]:
+        """
+        Mark the next runnable job as running for owner and return it, or None.
+
+        A job that has already been started max_attempts times (its workers
+        kept dying, e.g. the handler crashes the process) is failed instead.
+        """
+        def claim_next() -> Optional[sqlite3.Row]:
+            now = time.time()
+            # Take the write lock before looking, so no other worker claims the same row
+            self._db.execute("BEGIN IMMEDIATE")
+            while True:
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE status = ? OR (status = ? AND lease_expires < ?)"
+                    " ORDER BY created_at LIMIT 1",
+                    (QUEUED, RUNNING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["attempts"] < max_attempts:
+                    break
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, status_code = 500, finished_at = ?,"
+                    " owner = NULL, lease_expires = NULL WHERE id = ?",
+                    (FAILED, f"Gave up after {row['attempts']} attempts", now, row["id"])
+                )
+            self._db.execute(
+                "UPDATE jobs SET status = ?, owner = ?, started_at = ?, lease_expires = ?, attempts = attempts + 1"
+                " WHERE id = ?",
+                (RUNNING, owner, now, now + lease, row["id"])
+            )
+            return self._db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+
+        row = await self._run(claim_next)
+        return self._decode(row) if row is not None else None
+
+    async def renew(self, job_id: str, owner: str, lease: float) -> bool:
+        """Extend owner's lease on a running job; False if it was cancelled or taken over."""
+        return await self.transition(job_id, RUNNING, owner=owner, lease_expires=time.time() + lease)
+
+    async def release(self, owner: str) -> int:
+        """Put owner's running jobs back in the queue (on shutdown) and return how many."""
+        def requeue() -> int:
+            return self._db.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, started_at = NULL, lease_expires = NULL"
+                " WHERE status = ? AND owner = ?",
+                (QUEUED, RUNNING, owner)
+            ).rowcount
+
+        return await self._run(requeue)
+
+    async def counts(self) -> Dict[str, int]:
+        def count() -> List[sqlite3.Row]:
+            return self._db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+
+        return {row["status"]: row["n"] for row in await self._run(count)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class JobQueue:
+    """
+    Persisted jobs run by a fixed pool of worker tasks.
+
+    Workers claim jobs from the shared store, so a job submitted to one
+    API process may run in another. A running job's lease is renewed every
+    lease / 3 seconds; if its process dies, another worker takes it over
+    once the lease expires.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        handlers: Dict[str, JobHandler],
+        workers: int = 2,
+        lease: float = 60.0,
+        poll: float = 0.5,
+        max_attempts: int = 3
+    ):
+        self.db_path = db_path
+        self.handlers = handlers
+        self.workers = workers
+        self.lease = lease
+        self.poll = poll
+        self.max_attempts = max_attempts
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.store: Optional[JobStore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._running: Dict[str, Tuple["asyncio.Task[Dict[str, Any]]", asyncio.Event]] = {}
+        self._cancel_requested: Set[str] = set()
+
+    @classmethod
+    def from_env(cls, handlers: Dict[str, JobHandler]) -> "JobQueue":
+        """Build a queue from the JOBS_* environment variables."""
+        return cls(
+            os.getenv("JOBS_DB_PATH", ".blog-agent/jobs.sqlite3"),
+            handlers,
+            workers=int(os.getenv("JOBS_WORKERS", 2)),
+            lease=float(os.getenv("JOBS_LEASE", 60)),
+            poll=float(os.getenv("JOBS_POLL", 0.5)),
+            max_attempts=int(os.getenv("JOBS_MAX_ATTEMPTS", 3))
+        )
+
+    async def start(self) -> None:
+        """Open the store and start the workers; they pick up queued and abandoned jobs."""
+        self.store = JobStore(self.db_path)
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop the workers and hand their running jobs back to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.store is not None:
+            await self.store.release(self.owner)
+            self.store.close()
+            self.store = None
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = f"job_{uuid.uuid4().hex}"
+        await self.store.insert(job_id, kind, payload)
+        self._wakeup.set()
+        return await self.store.get(job_id)
+
+    async def get(self, job_id: str) -> Dict[str, Any]:
+        job = await self.store.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+        return job
+
+    async def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Cancel a queued or running job."""
+        while True:
+            job = await self.get(job_id)
+            if job["status"] in FINISHED:
+                raise HTTPException(status_code=409, detail=f"Job '{job_id}' already {job['status']}")
+
+            running = self._running.get(job_id)
+            if running is not None:
+                task, finished = running
+                self._cancel_requested.add(job_id)
+                task.cancel()
+                await finished.wait()
+                return await self.get(job_id)
+
+            # Queued, or running in another process: its worker notices when it next renews the lease
+            if await self.store.transition(job_id, job["status"], status=CANCELLED, finished_at=time.time()):
+                return await self.get(job_id)
+
+    async def _worker(self) -> None:
+        delay = self.poll
+        while True:
+            try:
+                # Cleared before claiming, so a submit() during the claim is not missed
+                self._wakeup.clear()
+                job = await self.store.claim(self.owner, self.lease, self.max_attempts)
+                if job is None:
+                    # Also poll: jobs submitted to other processes don't wake this one
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run_job(job)
+                delay = self.poll
+            except Exception as e:
+                # e.g. "database is locked": keep the worker alive and retry with backoff;
+                # a job it was running is retried by whoever claims it after its lease expires
+                print(f"Warning: job worker error: {e}", file=sys.stderr)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    async def _heartbeat(self, job_id: str, task: "asyncio.Task[Dict[str, Any]]") -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            if not await self.store.renew(job_id, self.owner, self.lease):
+                # Cancelled from another process, or the lease was lost: stop working on it
+                self._cancel_requested.add(job_id)
+                task.cancel()
+                return
+
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        handler = self.handlers.get(job["kind"])
+        if handler is None:
+            # e.g. a kind that was removed while jobs of it were still queued
+            await self.store.transition(
+                job_id, RUNNING, owner=self.owner, status=FAILED,
+                error=f"Unknown job kind: {job['kind']}", status_code=500, finished_at=time.time()
+            )
+            return
+        task = asyncio.ensure_future(handler(job["payload"]))
+        finished = asyncio.Event()
+        self._running[job_id] = (task, finished)
+        heartbeat = asyncio.ensure_future(self._heartbeat(job_id, task))
+
+        # Only record the outcome if the job is still ours and still running
+        def finish(**fields: Any) -> Awaitable[bool]:
+            return self.store.transition(job_id, RUNNING, owner=self.owner, finished_at=time.time(), **fields)
+
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if job_id not in self._cancel_requested:
+                # Shutting down: stop() puts the job back in the queue
+                task.cancel()
+                raise
+            await finish(status=CANCELLED)
+        except HTTPException as e:
+            await finish(status=FAILED, error=str(e.detail), status_code=e.status_code)
+        except Exception as e:
+            await finish(status=FAILED, error=str(e), status_code=500)
+        else:
+            await finish(status=SUCCEEDED, result=result, status_code=200)
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job_id, None)
+            self._cancel_requested.discard(job_id)
+            finished.set()
+
+    async def stats(self) -> Dict[str, Any]:
+        jobs = await self.store.counts()
+        return {
+            "workers": self.workers,
+            "queued": jobs.get(QUEUED, 0),
+            "running": len(self._running),
+            "jobs": jobs,
+        }
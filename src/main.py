@@ -1,24 +1,103 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Awaitable, Optional
+from fastapi import FastAPI, HTTPException, Header, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
-import re
-from datetime import datetime
-from pathlib import Path
 from dotenv import load_dotenv
-from .schemas import ChatCompletionRequest, ChatCompletionResponse, DraftPostRequest, DraftPostResponse
+from .schemas import (
+    ChatCompletionRequest, ChatCompletionResponse, DraftPostRequest, DraftPostResponse,
+    BatchChatCompletionRequest, BatchChatCompletionResponse, BatchItemResult, JobInfo
+)
 from .ollama_client import OllamaClient
-from .content_validator import ContentValidator
+from .drafting import create_draft, stream_draft_ndjson
+from .jobs import JobQueue, SUCCEEDED, FAILED, CANCELLED
 
 # Load environment variables
 load_dotenv()
 
+# Initialize Ollama client (one pooled HTTP client shared by every request)
+ollama_client = OllamaClient.from_env()
+ollama_base_url = ollama_client.base_url
+
+# Server-side limits for /v1/chat/completions/batch
+batch_max_parallel = int(os.getenv("BATCH_MAX_PARALLEL", 8))
+batch_max_requests = int(os.getenv("BATCH_MAX_REQUESTS", 1000))
+
+
+async def _run_draft_job(payload: dict) -> dict:
+    draft = await create_draft(ollama_client, DraftPostRequest(**payload))
+    return draft.model_dump()
+
+
+# Background jobs for draft_post requests with background=true
+job_queue = JobQueue.from_env({"draft_post": _run_draft_job})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the Ollama connection pool and job workers on startup, close them on shutdown."""
+    await ollama_client.start()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await ollama_client.aclose()
+
+
+class DisconnectAwareStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that stops its body iterator as soon as the client disconnects.
+    
+    Cancelling the iterator unwinds the stream back to OllamaClient, which
+    closes the upstream connection so Ollama stops generating.
+    """
+    
+    async def __call__(self, scope, receive, send) -> None:
+        stream_task = asyncio.ensure_future(self.stream_response(send))
+        disconnect_task = asyncio.ensure_future(self.listen_for_disconnect(receive))
+        try:
+            await asyncio.wait({stream_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (stream_task, disconnect_task):
+                task.cancel()
+            await asyncio.gather(stream_task, disconnect_task, return_exceptions=True)
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        
+        # A failed send means the client went away; anything else is a real error
+        if not stream_task.cancelled() and stream_task.exception() is not None:
+            if not isinstance(stream_task.exception(), OSError):
+                raise stream_task.exception()
+        
+        if self.background is not None:
+            await self.background()
+
+
+async def _cancel_on_disconnect(http_request: Request, work: Awaitable[Any], poll_interval: float = 0.5) -> Any:
+    """Await work, cancelling it (and the Ollama generation behind it) if the client disconnects."""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Ollama Chat API",
     description="A FastAPI service that provides OpenAI-compatible chat completions using Ollama",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -30,10 +109,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Ollama client
-ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-ollama_client = OllamaClient(base_url=ollama_base_url)
-
 # Mount static files for web interface
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -46,9 +121,19 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "chat_completions": "/v1/chat/completions",
+            "chat_completions_batch": "/v1/chat/completions/batch",
             "draft_post": "/tool/draft_post",
+            "draft_post_stream": "/tool/draft_post/stream",
             "web_interface": "/static/index.html",
-            "health": "/health"
+            "health": "/health",
+            "pool_stats": "/stats/pool",
+            "cache_stats": "/stats/cache",
+            "coalescing_stats": "/stats/coalescing",
+            "backend_stats": "/stats/backends",
+            "admission_stats": "/stats/admission",
+            "cancellation_stats": "/stats/cancellations",
+            "job_stats": "/stats/jobs",
+            "jobs": "/jobs/{job_id}"
         }
     }
 
@@ -59,19 +144,77 @@ async def health_check():
     return {"status": "healthy", "ollama_url": ollama_base_url}
 
 
+@app.get("/stats/pool")
+async def pool_stats():
+    """Connection pool statistics for the shared Ollama HTTP client."""
+    return ollama_client.pool_stats()
+
+
+@app.get("/stats/cache")
+async def cache_stats():
+    """Hit/miss statistics for the chat completion response cache."""
+    if ollama_client.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **ollama_client.cache.stats()}
+
+
+@app.get("/stats/coalescing")
+async def coalescing_stats():
+    """How many identical in-flight requests shared one upstream generation."""
+    return ollama_client.coalescing_stats()
+
+
+@app.get("/stats/backends")
+async def backend_stats():
+    """Routing state of every configured Ollama backend."""
+    return ollama_client.backends.stats()
+
+
+@app.get("/stats/admission")
+async def admission_stats():
+    """Per-model concurrency, queue depth and rejection counters."""
+    return ollama_client.admission_stats()
+
+
+@app.get("/stats/cancellations")
+async def cancellation_stats():
+    """Generations aborted because the client disconnected, and tokens saved."""
+    return ollama_client.cancellation_stats()
+
+
 @app.post("/v1/chat/completions", response_model=ChatCompletionResponse)
-async def chat_completions(request: ChatCompletionRequest):
+async def chat_completions(
+    request: ChatCompletionRequest,
+    http_request: Request,
+    response: Response,
+    x_response_cache: Optional[str] = Header(None)
+):
     """
     Create a chat completion using Ollama.
     
     This endpoint mimics the OpenAI chat completions API and forwards
     requests to a local Ollama instance.
+    
+    Non-streaming completions with temperature 0 are served from the response
+    cache; send `X-Response-Cache: use` to opt in at any temperature. The
+    `X-Cache` response header reports HIT, MISS or BYPASS.
+    
+    Requests beyond a model's queue depth are rejected with 429 and a
+    Retry-After estimate. Queue wait and generation time are reported
+    separately in `X-Queue-Time-Ms` and `X-Generation-Time-Ms`.
+    
+    If the client disconnects, the upstream Ollama generation is cancelled.
     """
     try:
         if request.stream:
-            # Return streaming response
-            return StreamingResponse(
-                ollama_client.stream_chat_completion(request),
+            # Pull the first chunk before responding so admission (429) and
+            # upstream errors still surface as HTTP status codes
+            stream = await _cancel_on_disconnect(
+                http_request,
+                _prime_stream(ollama_client.stream_chat_completion(request))
+            )
+            return DisconnectAwareStreamingResponse(
+                stream,
                 media_type="text/event-stream",
                 headers={
                     "Cache-Control": "no-cache",
@@ -81,8 +224,19 @@ async def chat_completions(request: ChatCompletionRequest):
             )
         else:
             # Return standard response
-            return await ollama_client.chat_completion(request)
+            cache_opt_in = (x_response_cache or "").lower() == "use"
+            completion, cache_status = await _cancel_on_disconnect(
+                http_request,
+                ollama_client.cached_chat_completion(request, cache_opt_in)
+            )
+            response.headers["X-Cache"] = cache_status
+            if completion.timings is not None:
+                response.headers["X-Queue-Time-Ms"] = str(completion.timings.queue_ms)
+                response.headers["X-Generation-Time-Ms"] = str(completion.timings.generation_ms)
+            return completion
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -90,139 +244,150 @@ async def chat_completions(request: ChatCompletionRequest):
         )
 
 
-@app.post("/tool/draft_post", response_model=DraftPostResponse)
-async def draft_blog_post(request: DraftPostRequest):
+@app.post("/v1/chat/completions/batch", response_model=BatchChatCompletionResponse)
+async def chat_completions_batch(request: BatchChatCompletionRequest, http_request: Request):
     """
-    Generate a Quarto blog post draft using Ollama.
+    Run a batch of chat completions with bounded server-side parallelism.
     
-    Creates a .qmd file with YAML frontmatter and markdown content
-    based on the provided topic.
+    Results are returned in request order. With `stream: true` each result
+    is sent as one NDJSON line as soon as it finishes, tagged with its index.
+    A failed item reports its error and status code without failing the batch.
     """
+    if len(request.requests) > batch_max_requests:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.requests)} requests (maximum: {batch_max_requests})"
+        )
+    
+    max_parallel = min(request.max_parallel or batch_max_parallel, batch_max_parallel)
+    results = ollama_client.batch_chat_completion(request.requests, max_parallel)
+    
+    if request.stream:
+        async def ndjson() -> AsyncGenerator[str, None]:
+            try:
+                async for index, outcome in results:
+                    yield _batch_item(index, outcome).model_dump_json(exclude_none=True) + "\n"
+            finally:
+                await results.aclose()
+        
+        return DisconnectAwareStreamingResponse(ndjson(), media_type="application/x-ndjson")
+    
+    async def collect() -> BatchChatCompletionResponse:
+        items = [_batch_item(index, outcome) async for index, outcome in results]
+        return BatchChatCompletionResponse(results=sorted(items, key=lambda item: item.index))
+    
+    return await _cancel_on_disconnect(http_request, collect())
+
+
+def _batch_item(index: int, outcome: Any) -> BatchItemResult:
+    if isinstance(outcome, HTTPException):
+        return BatchItemResult(index=index, error=str(outcome.detail), status_code=outcome.status_code)
+    return BatchItemResult(index=index, response=outcome)
+
+
+async def _prime_stream(stream: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+    """Start a stream and return a generator that replays its first chunk."""
     try:
-        # Validate that the requested model is available
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def replay() -> AsyncGenerator[str, None]:
         try:
-            available_models = await ollama_client.list_models()
-            model_names = [model.get('name', '') for model in available_models.get('models', [])]
-            if request.model not in model_names:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Model '{request.model}' is not available. Available models: {', '.join(model_names)}"
-                )
-        except Exception as e:
-            # If we can't validate models, log a warning but continue
-            print(f"Warning: Could not validate model availability: {e}")
-        
-        # Create blog folder if it doesn't exist
-        blog_folder = Path(request.blog_folder)
-        blog_folder.mkdir(parents=True, exist_ok=True)
-        
-        # Generate slug from topic
-        slug = re.sub(r'[^a-zA-Z0-9\s-]', '', request.topic.lower())
-        slug = re.sub(r'\s+', '-', slug.strip())
-        slug = slug[:50]  # Limit length
-        
-        # Create filename with date
-        date_str = datetime.now().strftime("%Y-%m-%d")
-        filename = f"{date_str}-{slug}.qmd"
-        full_path = blog_folder / filename
-        
-        # Check if file already exists and create unique name if needed
-        counter = 1
-        original_filename = filename
-        while full_path.exists():
-            name_part = original_filename.replace('.qmd', '')
-            filename = f"{name_part}-{counter}.qmd"
-            full_path = blog_folder / filename
-            counter += 1
-        
-        # Generate content using Ollama
-        prompt = f"""Create a comprehensive Quarto blog post about "{request.topic}". 
+            if first is not None:
+                yield first
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
 
-Structure the post with:
-1. YAML frontmatter including title, description, author, date, categories
-2. Introduction paragraph
-3. Main content with headings and subheadings
-4. Code examples if relevant
-5. Conclusion
+    return replay()
 
-Make it engaging and informative. Use proper Quarto markdown formatting.
 
-Topic: {request.topic}"""
-        
-        # Use ollama_client to generate content
-        chat_request = ChatCompletionRequest(
-            model=request.model,
-            messages=[
-                {"role": "system", "content": "You are an expert technical writer who creates engaging blog posts in Quarto format. Start directly with the main content - do NOT include YAML frontmatter as it will be added automatically."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
-        )
-        
-        # Generate the blog post content
-        response = await ollama_client.chat_completion(chat_request)
-        generated_content = response.choices[0].message.content
-        
-        # Remove any YAML frontmatter if it was generated
-        lines = generated_content.split('\n')
-        content_start = 0
-        if lines[0].strip() == "---":
-            for i, line in enumerate(lines[1:], 1):
-                if line.strip() == "---":
-                    content_start = i + 1
-                    break
-        
-        main_content = '\n'.join(lines[content_start:]).strip()
-        
-        # Add proper Quarto frontmatter
-        frontmatter = f"""---
-title: "{request.topic}"
-description: "A comprehensive guide to {request.topic.lower()}"
-author: "AI Assistant"
-date: "{datetime.now().strftime('%Y-%m-%d')}"
-categories: [blog, ai, guide]
----
-
-"""
-        
-        content = frontmatter + main_content
-        
-        # Validate content quality
-        content_stats = ContentValidator.get_content_stats(content)
-        is_valid, content_issues = ContentValidator.validate_content(content)
-        
-        # Write to file
-        with open(full_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
-        # Create preview (first 200 chars of content, excluding frontmatter)
-        content_lines = content.split('\n')
-        content_start = 0
-        for i, line in enumerate(content_lines):
-            if line.strip() == "---" and i > 0:
-                content_start = i + 1
-                break
-        
-        content_preview = '\n'.join(content_lines[content_start:])
-        preview = content_preview[:200] + "..." if len(content_preview) > 200 else content_preview
-        preview = preview.strip()
-        
-        return DraftPostResponse(
-            filename=filename,
-            preview=preview,
-            full_path=str(full_path.absolute()),
-            status="success",
-            word_count=content_stats['word_count'],
-            content_stats=content_stats,
-            content_issues=content_issues if content_issues else None
-        )
-        
-    except HTTPException:
-        # Re-raise HTTP exceptions as-is
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to create blog post draft: {str(e)}")
+@app.post("/tool/draft_post", response_model=DraftPostResponse, responses={202: {"model": JobInfo}})
+async def draft_blog_post(request: DraftPostRequest, http_request: Request):
+    """
+    Generate a Quarto blog post draft using Ollama.
+    
+    Creates a .qmd file with YAML frontmatter and markdown content
+    based on the provided topic. Generation is cancelled if the client
+    disconnects before the draft is ready.
+    
+    With `background: true` the draft is queued instead and a 202 with the
+    job id is returned at once; poll /jobs/{job_id} for its status.
+    """
+    if request.background:
+        job = await job_queue.submit("draft_post", request.model_dump(exclude={"background"}))
+        info = _job_info(job)
+        return JSONResponse(status_code=202, content=info.model_dump(), headers={"Location": info.status_url})
+    
+    return await _cancel_on_disconnect(http_request, create_draft(ollama_client, request))
+
+
+@app.post("/tool/draft_post/stream")
+async def draft_blog_post_stream(request: DraftPostRequest):
+    """
+    Generate a Quarto blog post draft, streaming it as NDJSON events.
+    
+    Emits a "start" event with the target filename, "content" events as
+    text is generated, then a final "done" event with the same fields as
+    /tool/draft_post (or an "error" event). The file only appears under its
+    final name once the draft is complete.
+    """
+    return DisconnectAwareStreamingResponse(
+        stream_draft_ndjson(ollama_client, request),
+        media_type="application/x-ndjson"
+    )
+
+
+def _job_info(job: dict) -> JobInfo:
+    return JobInfo(
+        job_id=job["id"],
+        kind=job["kind"],
+        status=job["status"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        error=job["error"],
+        status_url=f"/jobs/{job['id']}",
+        result_url=f"/jobs/{job['id']}/result"
+    )
+
+
+@app.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(job_id: str):
+    """Get the status of a background job."""
+    return _job_info(await job_queue.get(job_id))
+
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """
+    Get the result of a finished job.
+    
+    Returns 202 with the job status while it is still queued or running,
+    and the job's original error status if it failed.
+    """
+    job = await job_queue.get(job_id)
+    if job["status"] == SUCCEEDED:
+        return job["result"]
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=job["status_code"] or 500, detail=job["error"])
+    if job["status"] == CANCELLED:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' was cancelled")
+    return JSONResponse(status_code=202, content=_job_info(job).model_dump())
+
+
+@app.delete("/jobs/{job_id}", response_model=JobInfo)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job."""
+    return _job_info(await job_queue.cancel(job_id))
+
+
+@app.get("/stats/jobs")
+async def job_stats():
+    """Background job queue depth and per-status job counts."""
+    return await job_queue.stats()
 
 
 @app.get("/v1/models")
@@ -0,0 +1,89 @@
+"""
+Buffered, ordered output channel for the MCP stdio server
+"""
+import asyncio
+import io
+from typing import IO, Any, Dict, List, Optional
+
+
+class OutputChannel:
+    """
+    Newline-delimited frames written by a single writer coroutine.
+
+    Producers serialize their own frames and put them on a bounded queue;
+    send() waits while the queue is full, so a slow reader on the other end
+    of the pipe slows producers down instead of growing memory. The writer
+    takes every queued frame (up to max_batch_bytes) and writes the batch in
+    a worker thread, so the event loop never blocks on the pipe and frames
+    are never interleaved.
+    """
+
+    def __init__(self, stream: IO[Any], max_queue: int = 256, max_batch_bytes: int = 1024 * 1024):
+        self.stream = stream
+        self.binary = not isinstance(stream, io.TextIOBase)
+        self.max_queue = max_queue
+        self.max_batch_bytes = max_batch_bytes
+        self.error: Optional[BaseException] = None
+        self._queue: Optional["asyncio.Queue[str]"] = None
+        self._writer: Optional["asyncio.Task[None]"] = None
+        self._stats = {"frames": 0, "bytes": 0, "writes": 0, "max_depth": 0}
+
+    def _start(self) -> "asyncio.Queue[str]":
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._writer = asyncio.ensure_future(self._run())
+        return self._queue
+
+    async def send(self, frame: str) -> None:
+        """Queue one serialized frame (without its newline); waits while the queue is full."""
+        queue = self._start()
+        await queue.put(frame)
+        self._stats["max_depth"] = max(self._stats["max_depth"], queue.qsize())
+
+    async def flush(self) -> None:
+        """Wait until every queued frame has been written."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def close(self) -> None:
+        """Write what is queued, then stop the writer."""
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+        self._queue = self._writer = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "queued": self._queue.qsize() if self._queue else 0, "error": repr(self.error) if self.error else None}
+
+    async def _run(self) -> None:
+        queue = self._queue
+        loop = asyncio.get_event_loop()
+        while True:
+            batch: List[str] = [await queue.get()]
+            size = len(batch[0])
+            while not queue.empty() and size < self.max_batch_bytes:
+                frame = queue.get_nowait()
+                batch.append(frame)
+                size += len(frame)
+            try:
+                if self.error is None:
+                    await loop.run_in_executor(None, self._write, batch)
+                    self._stats["frames"] += len(batch)
+                    self._stats["bytes"] += size + len(batch)
+                    self._stats["writes"] += 1
+            except Exception as e:
+                # The reader went away or the stream is unusable (closed, can't encode):
+                # drop output from now on, but keep draining so producers never block
+                self.error = e
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def _write(self, batch: List[str]) -> None:
+        data = "\n".join(batch) + "\n"
+        self.stream.write(data.encode("utf-8") if self.binary else data)
+        self.stream.flush()
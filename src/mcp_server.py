@@ -8,25 +8,104 @@ import asyncio
 import json
 import sys
 import os
-from typing import Any, Dict, List, Optional, Sequence
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
 import httpx
-from pydantic import BaseModel
-from .interactive_agent import INTERACTIVE_TOOLS
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from .interactive_agent import INTERACTIVE_TOOLS, interactive_agent
+from .drafting import create_draft, stream_draft
+from .mcp_output import OutputChannel
+from .mcp_tools import TOOLS, PrecomputedJSON, SchemaError
 
 # Add the project root to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from .schemas import ChatCompletionRequest, ChatMessage
+from .schemas import ChatCompletionRequest, ChatMessage, DraftPostRequest
+
+# Drafts travel inside single JSON-RPC lines
+MAX_LINE_BYTES = 64 * 1024 * 1024
+
+
+class ProgressReporter:
+    """
+    notifications/progress for one tool call that sent a progressToken.
+    
+    Generated text is forwarded as the notification message, batched so at
+    most one notification goes out per interval; progress counts the
+    characters generated so far.
+    """
+    
+    def __init__(self, token: Any, send: Callable[[Dict[str, Any]], Awaitable[None]], interval: float):
+        self.token = token
+        self.send = send
+        self.interval = interval
+        self.progress = 0
+        self._pending: List[str] = []
+        self._last_sent = 0.0
+    
+    async def add(self, text: str) -> None:
+        if not text:
+            return
+        self._pending.append(text)
+        self.progress += len(text)
+        if time.monotonic() - self._last_sent >= self.interval:
+            await self.flush()
+    
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        message = "".join(self._pending)
+        self._pending = []
+        self._last_sent = time.monotonic()
+        await self.send({
+            "jsonrpc": "2.0",
+            "method": "notifications/progress",
+            "params": {"progressToken": self.token, "progress": self.progress, "message": message}
+        })
+
+
+# The reporter of the tool call running in the current task, if the client asked for progress
+current_progress: ContextVar[Optional[ProgressReporter]] = ContextVar("current_progress", default=None)
 
 
 class MCPServer:
     """MCP Server for Ollama Chat API integration"""
     
-    def __init__(self, base_url: str = "http://localhost:4891"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:4891",
+        max_concurrency: Optional[int] = None,
+        mode: Optional[str] = None
+    ):
         self.base_url = base_url
         self.client = httpx.AsyncClient(timeout=120.0)
+        # "http" forwards tool calls to the FastAPI app; "direct" runs them in-process
+        # on the interactive agent's Ollama client, sharing its connection pool
+        self.mode = (mode or os.getenv("MCP_MODE", "http")).lower()
+        if self.mode not in ("http", "direct"):
+            raise ValueError(f"Unknown MCP_MODE: {self.mode}")
+        self.ollama_client = interactive_agent.ollama_client
+        self._handlers = {name: getattr(self, tool.handler) for name, tool in TOOLS.tools.items()}
         # Store the active session ID for simplified chat commands
         self.active_session_id: Optional[str] = None
+        self.max_concurrency = max_concurrency or int(os.getenv("MCP_MAX_CONCURRENCY", 8))
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.write_queue = int(os.getenv("MCP_WRITE_QUEUE", 256))
+        self.stdout = sys.stdout
+        self.progress_interval = float(os.getenv("MCP_PROGRESS_INTERVAL", 0.25))
+    
+    @property
+    def stdout(self) -> Any:
+        return self._stdout
+    
+    @stdout.setter
+    def stdout(self, stream: Any) -> None:
+        """Route output to stream (its binary buffer when it has one) through a fresh channel."""
+        self._stdout = stream
+        self.output = OutputChannel(getattr(stream, "buffer", stream), max_queue=self.write_queue)
     
     async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Handle incoming MCP requests"""
@@ -76,227 +155,102 @@ class MCPServer:
     
     async def _handle_list_tools(self, request_id: str) -> Dict[str, Any]:
         """List available tools"""
-        tools = [
-            {
-                "name": "chat_completion",
-                "description": "Generate chat completion using Ollama models",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "model": {"type": "string", "description": "Model to use"},
-                        "messages": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "role": {"type": "string", "enum": ["system", "user", "assistant"]},
-                                    "content": {"type": "string"}
-                                },
-                                "required": ["role", "content"]
-                            }
-                        },
-                        "temperature": {"type": "number", "minimum": 0, "maximum": 2, "default": 0.7},
-                        "max_tokens": {"type": "integer", "minimum": 1, "default": 150},
-                        "stream": {"type": "boolean", "default": False}
-                    },
-                    "required": ["model", "messages"]
-                }
-            },
-            {
-                "name": "health_check",
-                "description": "Check API health status",
-                "inputSchema": {"type": "object", "properties": {}}
-            },
-            {
-                "name": "list_models",
-                "description": "List available models",
-                "inputSchema": {"type": "object", "properties": {}}
-            },
-            {
-                "name": "draft_post",
-                "description": "Generate a Quarto blog post draft",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "topic": {"type": "string", "description": "The topic for the blog post"},
-                        "model": {"type": "string", "default": "mistral:7b", "description": "Model to use for generation"},
-                        "blog_folder": {"type": "string", "default": "posts", "description": "Target folder for blog posts"}
-                    },
-                    "required": ["topic"]
-                }
-            },
-            {
-                "name": "start_writing_session",
-                "description": "Start an interactive blog writing session",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "blog_folder": {"type": "string", "description": "Path to your blog folder", "default": "."},
-                        "topic": {"type": "string", "description": "Blog post topic"}
-                    },
-                    "required": ["topic"]
-                }
-            },
-            {
-                "name": "chat_about_post",
-                "description": "Chat with AI about your blog post",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "session_id": {"type": "string", "description": "Writing session ID"},
-                        "message": {"type": "string", "description": "Your message to the AI"},
-                        "model": {"type": "string", "default": "mistral:7b"}
-                    },
-                    "required": ["session_id", "message"]
-                }
-            },
-            {
-                "name": "chat",
-                "description": "Chat with AI about your current writing session (uses active session)",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "message": {"type": "string", "description": "Your message to the AI"},
-                        "model": {"type": "string", "default": "mistral:7b"}
-                    },
-                    "required": ["message"]
-                }
-            },
-            {
-                "name": "update_draft",
-                "description": "Update the current blog post draft",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "session_id": {"type": "string", "description": "Writing session ID"},
-                        "content": {"type": "string", "description": "New draft content"}
-                    },
-                    "required": ["session_id", "content"]
-                }
-            },
-            {
-                "name": "save_draft",
-                "description": "Save the current draft to a file",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "session_id": {"type": "string", "description": "Writing session ID"},
-                        "filename": {"type": "string", "description": "Optional filename"}
-                    },
-                    "required": ["session_id"]
-                }
-            },
-            {
-                "name": "get_session_status",
-                "description": "Get current writing session status",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "session_id": {"type": "string", "description": "Writing session ID"}
-                    },
-                    "required": ["session_id"]
-                }
-            },
-            {
-                "name": "update",
-                "description": "Update the current draft (uses active session)",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "content": {"type": "string", "description": "New draft content"}
-                    },
-                    "required": ["content"]
-                }
-            },
-            {
-                "name": "save",
-                "description": "Save the current draft to a file (uses active session)",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "filename": {"type": "string", "description": "Optional filename"}
-                    }
-                }
-            },
-            {
-                "name": "status",
-                "description": "Get current writing session status (uses active session)",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {}
-                }
-            }
-        ]
-        
+        # Built and serialized once for the registry, reused on every call
         return {
             "jsonrpc": "2.0",
             "id": request_id,
-            "result": {"tools": tools}
+            "result": TOOLS.list_result
         }
     
     async def _handle_tool_call(self, request_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """Handle tool call requests"""
         tool_name = params.get("name")
-        arguments = params.get("arguments", {})
+        arguments = params.get("arguments") or {}
         
-        if tool_name == "chat_completion":
-            return await self._call_chat_completion(request_id, arguments)
-        elif tool_name == "health_check":
-            return await self._call_health_check(request_id)
-        elif tool_name == "list_models":
-            return await self._call_list_models(request_id)
-        elif tool_name == "draft_post":
-            return await self._call_draft_post(request_id, arguments)
-        elif tool_name == "start_writing_session":
-            return await self._call_start_writing_session(request_id, arguments)
-        elif tool_name == "chat_about_post":
-            return await self._call_chat_about_post(request_id, arguments)
-        elif tool_name == "chat":
-            return await self._call_chat(request_id, arguments)
-        elif tool_name == "update_draft":
-            return await self._call_update_draft(request_id, arguments)
-        elif tool_name == "save_draft":
-            return await self._call_save_draft(request_id, arguments)
-        elif tool_name == "get_session_status":
-            return await self._call_get_session_status(request_id, arguments)
-        elif tool_name == "update":
-            return await self._call_update(request_id, arguments)
-        elif tool_name == "save":
-            return await self._call_save(request_id, arguments)
-        elif tool_name == "status":
-            return await self._call_status(request_id, arguments)
-        else:
+        tool = TOOLS.get(tool_name)
+        if tool is None:
             return self._error_response(request_id, -32602, f"Unknown tool: {tool_name}")
+        try:
+            tool.validate(arguments)
+        except SchemaError as e:
+            return self._error_response(request_id, -32602, f"Invalid arguments for {tool_name}: {str(e)}")
+        
+        token = (params.get("_meta") or {}).get("progressToken")
+        if token is None:
+            return await self._handlers[tool_name](request_id, arguments)
+        
+        progress = ProgressReporter(token, self._write, self.progress_interval)
+        reset = current_progress.set(progress)
+        try:
+            response = await self._handlers[tool_name](request_id, arguments)
+        finally:
+            current_progress.reset(reset)
+        # Partial output always reaches the client before the final result
+        await progress.flush()
+        return response
     
     async def _call_chat_completion(self, request_id: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Call chat completion endpoint"""
         try:
-            response = await self.client.post(
-                f"{self.base_url}/v1/chat/completions",
-                json=arguments
-            )
-            
-            if response.status_code == 200:
+            progress = current_progress.get()
+            if progress is not None:
+                parts = []
+                async for delta in self._completion_deltas(arguments):
+                    parts.append(delta)
+                    await progress.add(delta)
+                result = {"choices": [{"message": {"content": "".join(parts)}}]}
+            elif self.mode == "direct":
+                request = ChatCompletionRequest(**{**arguments, "stream": False})
+                result = (await self.ollama_client.chat_completion(request)).model_dump()
+            else:
+                response = await self.client.post(
+                    f"{self.base_url}/v1/chat/completions",
+                    json=arguments
+                )
+                if response.status_code != 200:
+                    return self._error_response(request_id, -32603, f"API error: {response.status_code}")
                 result = response.json()
+            
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [{
+                        "type": "text",
+                        "text": result["choices"][0]["message"]["content"]
+                    }]
+                }
+            }
+        
+        except ValidationError as e:
+            return self._error_response(request_id, -32602, f"Invalid arguments: {str(e)}")
+        except HTTPException as e:
+            return self._error_response(request_id, -32603, f"API error: {e.status_code}: {e.detail}")
+        except Exception as e:
+            return self._error_response(request_id, -32603, f"Request failed: {str(e)}")
+    
+    async def _call_health_check(self, request_id: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Call health check endpoint"""
+        try:
+            if self.mode == "direct":
+                # No FastAPI server to ask; healthy means Ollama itself answers
+                try:
+                    await self.ollama_client.list_models()
+                except Exception as e:
+                    return self._error_response(
+                        request_id, -32603, f"Health check failed: Ollama at {self.ollama_client.base_url}: {str(e)}"
+                    )
                 return {
                     "jsonrpc": "2.0",
                     "id": request_id,
                     "result": {
                         "content": [{
                             "type": "text",
-                            "text": result["choices"][0]["message"]["content"]
+                            "text": f"Health Status: healthy (direct mode, Ollama at {self.ollama_client.base_url})"
                         }]
                     }
                 }
-            else:
-                return self._error_response(request_id, -32603, f"API error: {response.status_code}")
-        
-        except Exception as e:
-            return self._error_response(request_id, -32603, f"Request failed: {str(e)}")
-    
-    async def _call_health_check(self, request_id: str) -> Dict[str, Any]:
-        """Call health check endpoint"""
-        try:
+            
             response = await self.client.get(f"{self.base_url}/health")
             
             if response.status_code == 200:
@@ -317,56 +271,151 @@ class MCPServer:
         except Exception as e:
             return self._error_response(request_id, -32603, f"Health check error: {str(e)}")
     
-    async def _call_list_models(self, request_id: str) -> Dict[str, Any]:
+    async def _call_list_models(self, request_id: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Call list models endpoint"""
         try:
-            response = await self.client.get(f"{self.base_url}/v1/models")
+            if self.mode == "direct":
+                result = await self.ollama_client.list_models()
+                models = [model.get("name", "") for model in result.get("models", [])]
+            else:
+                response = await self.client.get(f"{self.base_url}/v1/models")
+                if response.status_code != 200:
+                    return self._error_response(request_id, -32603, f"Models list failed: {response.status_code}")
+                models = [model["id"] for model in response.json().get("data", [])]
             
-            if response.status_code == 200:
-                result = response.json()
-                models = [model["id"] for model in result.get("data", [])]
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": {
-                        "content": [{
-                            "type": "text",
-                            "text": f"Available models: {', '.join(models)}"
-                        }]
-                    }
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [{
+                        "type": "text",
+                        "text": f"Available models: {', '.join(models)}"
+                    }]
                 }
-            else:
-                return self._error_response(request_id, -32603, f"Models list failed: {response.status_code}")
+            }
         
+        except HTTPException as e:
+            return self._error_response(request_id, -32603, f"Models list failed: {e.status_code}: {e.detail}")
         except Exception as e:
             return self._error_response(request_id, -32603, f"Models list error: {str(e)}")
     
     async def _call_draft_post(self, request_id: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
         """Call draft post endpoint"""
         try:
-            response = await self.client.post(
-                f"{self.base_url}/tool/draft_post",
-                json=arguments
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": {
-                        "content": [{
-                            "type": "text",
-                            "text": f"✅ Blog post draft created!\n\nFilename: {result['filename']}\nPath: {result['full_path']}\n\nPreview:\n{result['preview']}"
-                        }]
+            progress = current_progress.get()
+            # A background draft is queued by the API, so there is nothing to stream
+            background = bool(arguments.get("background")) and self.mode != "direct"
+            if progress is not None and not background:
+                result = None
+                async for event in self._draft_events(arguments):
+                    if event["event"] == "content":
+                        await progress.add(event["text"])
+                    elif event["event"] == "done":
+                        result = event
+                    elif event["event"] == "error":
+                        return self._error_response(
+                            request_id, -32603,
+                            f"Draft post creation failed: {event['status_code']}: {event['detail']}"
+                        )
+                if result is None:
+                    return self._error_response(request_id, -32603, "Draft post creation failed: stream ended early")
+            elif self.mode == "direct":
+                draft_request = DraftPostRequest(**{**arguments, "background": False})
+                # No API in between to fall back on, so an unknown model is an error up front
+                result = (await create_draft(self.ollama_client, draft_request, strict_model=True)).model_dump()
+            else:
+                response = await self.client.post(
+                    f"{self.base_url}/tool/draft_post",
+                    json=arguments
+                )
+                if response.status_code == 202:
+                    job = response.json()
+                    return {
+                        "jsonrpc": "2.0",
+                        "id": request_id,
+                        "result": {
+                            "content": [{
+                                "type": "text",
+                                "text": f"⏳ Blog post draft queued.\n\nJob ID: {job['job_id']}\nStatus: {job['status']}\n"
+                                        f"Status URL: {self.base_url}{job['status_url']}\n"
+                                        f"Result URL: {self.base_url}{job['result_url']}"
+                            }]
+                        }
                     }
+                if response.status_code != 200:
+                    return self._error_response(request_id, -32603, f"Draft post creation failed: {response.status_code}")
+                result = response.json()
+            
+            return {
+                "jsonrpc": "2.0",
+                "id": request_id,
+                "result": {
+                    "content": [{
+                        "type": "text",
+                        "text": f"✅ Blog post draft created!\n\nFilename: {result['filename']}\nPath: {result['full_path']}\n\nPreview:\n{result['preview']}"
+                    }]
                 }
-            else:
-                return self._error_response(request_id, -32603, f"Draft post creation failed: {response.status_code}")
+            }
         
+        except ValidationError as e:
+            return self._error_response(request_id, -32602, f"Invalid arguments: {str(e)}")
+        except HTTPException as e:
+            return self._error_response(request_id, -32603, f"Draft post creation failed: {e.status_code}: {e.detail}")
         except Exception as e:
             return self._error_response(request_id, -32603, f"Draft post error: {str(e)}")
     
+    async def _completion_deltas(self, arguments: Dict[str, Any]) -> AsyncIterator[str]:
+        """Stream the text of a chat completion, in-process or over the API's SSE."""
+        if self.mode == "direct":
+            deltas = self.ollama_client.stream_text(ChatCompletionRequest(**arguments))
+            try:
+                async for delta in deltas:
+                    yield delta
+            finally:
+                await deltas.aclose()
+            return
+        
+        async with self.client.stream(
+            "POST", f"{self.base_url}/v1/chat/completions", json={**arguments, "stream": True}
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise HTTPException(status_code=response.status_code, detail=response.text)
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                payload = line[len("data: "):].strip()
+                if payload == "[DONE]":
+                    break
+                content = json.loads(payload)["choices"][0]["delta"].get("content")
+                if content:
+                    yield content
+    
+    async def _draft_events(self, arguments: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Draft generation events (start, content, done, error), in-process or over NDJSON."""
+        if self.mode == "direct":
+            events = stream_draft(
+                self.ollama_client, DraftPostRequest(**{**arguments, "background": False}), strict_model=True
+            )
+            try:
+                async for event in events:
+                    yield event
+            finally:
+                await events.aclose()
+            return
+        
+        async with self.client.stream("POST", f"{self.base_url}/tool/draft_post/stream", json=arguments) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise HTTPException(status_code=response.status_code, detail=response.text)
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+    
+    def _progress_callback(self) -> Optional[Callable[[str], Awaitable[None]]]:
+        progress = current_progress.get()
+        return progress.add if progress is not None else None
+    
     async def _call_start_writing_session(self, request_id: str, args: Dict[str, Any]) -> Dict[str, Any]:
         """Start a new interactive writing session"""
         try:
@@ -392,7 +441,7 @@ class MCPServer:
         """Chat about the blog post"""
         try:
 
-            result = await INTERACTIVE_TOOLS["chat_about_post"](args)
+            result = await INTERACTIVE_TOOLS["chat_about_post"](args, on_delta=self._progress_callback())
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
@@ -426,7 +475,7 @@ class MCPServer:
             }
             
             # Call the existing chat_about_post function
-            result = await INTERACTIVE_TOOLS["chat_about_post"](chat_args)
+            result = await INTERACTIVE_TOOLS["chat_about_post"](chat_args, on_delta=self._progress_callback())
             return {
                 "jsonrpc": "2.0",
                 "id": request_id,
@@ -583,6 +632,14 @@ class MCPServer:
                 "error": {"code": -32603, "message": f"Internal error: {str(e)}"}
             }
 
+    def _encode(self, message: Any) -> str:
+        if isinstance(message, list):
+            return "[" + ", ".join(self._encode(item) for item in message) + "]"
+        result = message.get("result")
+        if isinstance(result, PrecomputedJSON):
+            return f'{{"jsonrpc": "2.0", "id": {json.dumps(message.get("id"))}, "result": {result.json}}}'
+        return json.dumps(message)
+    
     async def _handle_list_resources(self, request_id: str) -> Dict[str, Any]:
         """List available resources"""
         resources = [
@@ -712,31 +769,117 @@ class MCPServer:
     
     async def run(self):
         """Run the MCP server"""
-        while True:
+        if self.mode == "direct":
+            await self.ollama_client.start()
+        try:
+            reader = await self._open_stdin()
+            await self.serve(reader)
+        finally:
+            await self.output.close()
+            await self.aclose()
+    
+    async def aclose(self):
+        """Close the HTTP client and, in direct mode, the shared Ollama connection pool."""
+        await self.client.aclose()
+        if self.mode == "direct":
+            await self.ollama_client.aclose()
+    
+    async def _open_stdin(self) -> asyncio.StreamReader:
+        """stdin as an asyncio stream; a reader thread where pipes can't be watched (Windows, files)."""
+        loop = asyncio.get_event_loop()
+        reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+        if sys.platform != "win32":
             try:
-                line = await asyncio.get_event_loop().run_in_executor(None, sys.stdin.readline)
+                await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+                return reader
+            except (ValueError, OSError, NotImplementedError):
+                pass
+        
+        def pump() -> None:
+            stdin = sys.stdin.buffer
+            while True:
+                line = stdin.readline()
                 if not line:
-                    break
-                
-                request = json.loads(line.strip())
-                response = await self.handle_request(request)
-                
-                print(json.dumps(response))
-                sys.stdout.flush()
-                
-            except json.JSONDecodeError:
+                    loop.call_soon_threadsafe(reader.feed_eof)
+                    return
+                loop.call_soon_threadsafe(reader.feed_data, line)
+        
+        threading.Thread(target=pump, name="mcp-stdin", daemon=True).start()
+        return reader
+    
+    async def serve(self, reader: asyncio.StreamReader):
+        """
+        Read JSON-RPC messages until EOF, handling each as its own task.
+        
+        Responses are written as soon as they are ready, so a long
+        generation never holds up cheap calls; clients match them by id.
+        At most max_concurrency requests run at once.
+        """
+        tasks = set()
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # Longer than the stream limit; the rest of the line is discarded
+                await self._write(self._error_response(None, -32700, "Parse error: message too large"))
                 continue
-            except Exception as e:
-                error_response = {
-                    "jsonrpc": "2.0",
-                    "id": None,
-                    "error": {
-                        "code": -32700,
-                        "message": f"Parse error: {str(e)}"
-                    }
-                }
-                print(json.dumps(error_response))
-                sys.stdout.flush()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            
+            try:
+                message = json.loads(line)
+            except ValueError as e:
+                await self._write(self._error_response(None, -32700, f"Parse error: {str(e)}"))
+                continue
+            
+            task = asyncio.ensure_future(self._dispatch(message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await self.output.flush()
+    
+    async def _dispatch(self, message: Any):
+        """Handle one message or a JSON-RPC batch and write its response, if any."""
+        if isinstance(message, list):
+            if not message:
+                await self._write(self._error_response(None, -32600, "Invalid Request: empty batch"))
+                return
+            responses = await asyncio.gather(*(self._handle_one(item) for item in message))
+            responses = [response for response in responses if response is not None]
+            if responses:
+                await self._write(responses)
+            return
+        
+        response = await self._handle_one(message)
+        if response is not None:
+            await self._write(response)
+    
+    async def _handle_one(self, message: Any) -> Optional[Dict[str, Any]]:
+        if not isinstance(message, dict):
+            return self._error_response(None, -32600, "Invalid Request")
+        async with self._slots:
+            response = await self.handle_request(message)
+        # Notifications (no id) never get a response
+        return response if "id" in message else None
+    
+    async def _write(self, message: Any):
+        """
+        Serialize one JSON-RPC frame and queue it for the writer.
+        
+        Progress notifications are small and encoded inline; responses can
+        carry a whole draft, so they are encoded in a worker thread. Waits
+        while MCP_WRITE_QUEUE frames are already pending, so a client that
+        stops reading slows the server down instead of filling memory.
+        """
+        if isinstance(message, dict) and "method" in message:
+            data = self._encode(message)
+        else:
+            data = await asyncio.get_event_loop().run_in_executor(None, self._encode, message)
+        await self.output.send(data)
 
 
 async def main():
@@ -0,0 +1,319 @@
+"""
+Declarative registry of the MCP server's tools
+
+Each tool is declared once with its input schema and the name of the
+MCPServer method that handles it. From the registry the server gets its
+dispatch table, compiled argument validators and a pre-serialized
+tools/list result; config/mcp-manifest.json is generated from it too:
+
+    python -m src.mcp_tools [--manifest config/mcp-manifest.json]
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+Validator = Callable[[Any, str], None]
+
+
+class PrecomputedJSON(dict):
+    """A result dict that also carries its serialized form, reused on every response."""
+
+    def __init__(self, value: Dict[str, Any]):
+        super().__init__(value)
+        self.json = json.dumps(value)
+
+
+class SchemaError(ValueError):
+    """Tool arguments that do not match the tool's input schema."""
+
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "boolean": lambda v: isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """
+    Compile the JSON Schema subset used by the tool schemas into one function.
+
+    Supports type (or a list of types), properties, required,
+    additionalProperties, items, enum, minimum and maximum. The returned
+    validator raises SchemaError naming the offending path.
+    """
+    checks: List[Validator] = []
+
+    types = schema.get("type")
+    if types is not None:
+        allowed = [_TYPE_CHECKS[t] for t in ([types] if isinstance(types, str) else types)]
+        expected = types if isinstance(types, str) else " or ".join(types)
+
+        def check_type(value: Any, path: str) -> None:
+            if not any(ok(value) for ok in allowed):
+                raise SchemaError(f"{path} must be {expected}")
+        checks.append(check_type)
+
+    if "enum" in schema:
+        options = schema["enum"]
+
+        def check_enum(value: Any, path: str) -> None:
+            if value not in options:
+                raise SchemaError(f"{path} must be one of {', '.join(map(str, options))}")
+        checks.append(check_enum)
+
+    for keyword, fails, word in (
+        ("minimum", lambda v, limit: v < limit, "at least"),
+        ("maximum", lambda v, limit: v > limit, "at most"),
+    ):
+        if keyword in schema:
+            def check_bound(value: Any, path: str, limit=schema[keyword], fails=fails, word=word) -> None:
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and fails(value, limit):
+                    raise SchemaError(f"{path} must be {word} {limit}")
+            checks.append(check_bound)
+
+    properties = {name: compile_schema(sub) for name, sub in schema.get("properties", {}).items()}
+    required = schema.get("required", [])
+    extra = schema.get("additionalProperties")
+    extra_check = compile_schema(extra) if isinstance(extra, dict) else None
+    if properties or required or extra is not None:
+        def check_object(value: Any, path: str) -> None:
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    raise SchemaError(f"{path}.{name} is required")
+            for name, item in value.items():
+                check = properties.get(name)
+                if check is not None:
+                    check(item, f"{path}.{name}")
+                elif extra is False:
+                    raise SchemaError(f"{path}.{name} is not allowed")
+                elif extra_check is not None:
+                    extra_check(item, f"{path}.{name}")
+        checks.append(check_object)
+
+    if "items" in schema:
+        item_check = compile_schema(schema["items"])
+
+        def check_items(value: Any, path: str) -> None:
+            if isinstance(value, list):
+                for index, item in enumerate(value):
+                    item_check(item, f"{path}[{index}]")
+        checks.append(check_items)
+
+    def validate(value: Any, path: str = "arguments") -> None:
+        for check in checks:
+            check(value, path)
+    return validate
+
+
+class Tool:
+    """One MCP tool: what tools/list shows, how arguments are checked, which method runs it."""
+
+    def __init__(self, name: str, description: str, input_schema: Dict[str, Any], handler: str):
+        self.name = name
+        self.description = description
+        self.input_schema = input_schema
+        self.handler = handler
+        self.validate = compile_schema(input_schema)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"name": self.name, "description": self.description, "inputSchema": self.input_schema}
+
+
+class ToolRegistry:
+    def __init__(self) -> None:
+        self.tools: Dict[str, Tool] = {}
+        self._list_result: Optional[PrecomputedJSON] = None
+
+    def add(self, name: str, description: str, input_schema: Dict[str, Any], handler: str) -> Tool:
+        tool = Tool(name, description, input_schema, handler)
+        self.tools[name] = tool
+        self._list_result = None
+        return tool
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self.tools.get(name)
+
+    def describe(self) -> List[Dict[str, Any]]:
+        return [tool.describe() for tool in self.tools.values()]
+
+    @property
+    def list_result(self) -> PrecomputedJSON:
+        """The tools/list result, built and serialized once."""
+        if self._list_result is None:
+            self._list_result = PrecomputedJSON({"tools": self.describe()})
+        return self._list_result
+
+
+MODEL = {"type": "string", "default": "mistral:7b"}
+SESSION_ID = {"type": "string", "description": "Writing session ID"}
+MESSAGE = {"type": "string", "description": "Your message to the AI"}
+SECTIONS = {
+    "type": "object",
+    "additionalProperties": {"type": ["string", "null"]},
+    "description": "Section heading -> new section text (empty deletes; a new heading appends)"
+}
+PATCH = {"type": "string", "description": "Unified diff against the current draft"}
+NO_ARGUMENTS = {"type": "object", "properties": {}}
+
+TOOLS = ToolRegistry()
+
+TOOLS.add("chat_completion", "Generate chat completion using Ollama models", {
+    "type": "object",
+    "properties": {
+        "model": {"type": "string", "description": "Model to use for completion"},
+        "messages": {
+            "type": "array",
+            "description": "Array of chat messages",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "role": {"type": "string", "enum": ["system", "user", "assistant"]},
+                    "content": {"type": "string"}
+                },
+                "required": ["role", "content"]
+            }
+        },
+        "temperature": {
+            "type": "number",
+            "description": "Sampling temperature (0-2)",
+            "minimum": 0,
+            "maximum": 2,
+            "default": 0.7
+        },
+        "max_tokens": {
+            "type": "integer",
+            "description": "Maximum number of tokens to generate",
+            "minimum": 1,
+            "default": 150
+        },
+        "stream": {"type": "boolean", "description": "Whether to stream the response", "default": False}
+    },
+    "required": ["model", "messages"]
+}, "_call_chat_completion")
+
+TOOLS.add("health_check", "Check the health status of the Ollama Chat API", NO_ARGUMENTS, "_call_health_check")
+
+TOOLS.add("list_models", "List available Ollama models", NO_ARGUMENTS, "_call_list_models")
+
+TOOLS.add("draft_post", "Generate a Quarto blog post draft using Ollama", {
+    "type": "object",
+    "properties": {
+        "topic": {"type": "string", "description": "The topic for the blog post draft"},
+        "model": {"type": "string", "description": "The model to use for generation", "default": "mistral:7b"},
+        "blog_folder": {"type": "string", "default": "posts", "description": "Target folder for blog posts"},
+        "mode": {
+            "type": "string",
+            "enum": ["single", "sections"],
+            "default": "single",
+            "description": "'single' writes the post in one completion; 'sections' outlines it first and writes the sections in parallel"
+        },
+        "background": {
+            "type": "boolean",
+            "default": False,
+            "description": "Queue the draft on the API and return a job id right away (ignored in direct mode)"
+        }
+    },
+    "required": ["topic"]
+}, "_call_draft_post")
+
+TOOLS.add("start_writing_session", "Start an interactive blog writing session", {
+    "type": "object",
+    "properties": {
+        "blog_folder": {"type": "string", "description": "Path to your blog folder", "default": "."},
+        "topic": {"type": "string", "description": "Blog post topic"}
+    },
+    "required": ["topic"]
+}, "_call_start_writing_session")
+
+TOOLS.add("chat_about_post", "Chat with AI about your blog post", {
+    "type": "object",
+    "properties": {"session_id": SESSION_ID, "message": MESSAGE, "model": MODEL},
+    "required": ["session_id", "message"]
+}, "_call_chat_about_post")
+
+TOOLS.add("chat", "Chat with AI about your current writing session (uses active session)", {
+    "type": "object",
+    "properties": {"message": MESSAGE, "model": MODEL},
+    "required": ["message"]
+}, "_call_chat")
+
+TOOLS.add(
+    "update_draft",
+    "Update the current blog post draft: the whole text, some sections, or a unified-diff patch",
+    {
+        "type": "object",
+        "properties": {
+            "session_id": SESSION_ID,
+            "content": {"type": "string", "description": "New draft content"},
+            "sections": SECTIONS,
+            "patch": PATCH
+        },
+        "required": ["session_id"]
+    },
+    "_call_update_draft"
+)
+
+TOOLS.add("save_draft", "Save the current draft to a file", {
+    "type": "object",
+    "properties": {"session_id": SESSION_ID, "filename": {"type": "string", "description": "Optional filename"}},
+    "required": ["session_id"]
+}, "_call_save_draft")
+
+TOOLS.add("get_session_status", "Get current writing session status", {
+    "type": "object",
+    "properties": {"session_id": SESSION_ID},
+    "required": ["session_id"]
+}, "_call_get_session_status")
+
+TOOLS.add("update", "Update the current draft (uses active session)", {
+    "type": "object",
+    "properties": {
+        "content": {"type": "string", "description": "New draft content"},
+        "sections": SECTIONS,
+        "patch": PATCH
+    }
+}, "_call_update")
+
+TOOLS.add("save", "Save the current draft to a file (uses active session)", {
+    "type": "object",
+    "properties": {"filename": {"type": "string", "description": "Optional filename"}}
+}, "_call_save")
+
+TOOLS.add("status", "Get current writing session status (uses active session)", NO_ARGUMENTS, "_call_status")
+
+
+def write_manifest(path: str, registry: ToolRegistry = TOOLS) -> None:
+    """Replace the tools of an MCP manifest with the registry's, keeping everything else."""
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest["tools"] = registry.describe()
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.mcp_tools",
+        description="Regenerate the tools section of the MCP manifest from the tool registry."
+    )
+    parser.add_argument("--manifest", default="config/mcp-manifest.json", help="manifest to update")
+    args = parser.parse_args(argv)
+    write_manifest(args.manifest)
+    print(f"Wrote {len(TOOLS.tools)} tools to {args.manifest}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,237 @@
+import asyncio
+import hashlib
 import json
+import os
 import time
 import uuid
-from typing import Dict, Any, AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncGenerator, AsyncIterator, List, Optional, Set, Tuple, Union
 import httpx
 from fastapi import HTTPException
-from .schemas import ChatCompletionRequest, ChatCompletionResponse, ChatCompletionChoice, ChatCompletionUsage, ChatMessage
+from .schemas import ChatCompletionRequest, ChatCompletionResponse, ChatCompletionChoice, ChatCompletionUsage, ChatMessage, CompletionTimings
+from .response_cache import ResponseCache
+from .coalescing import SingleFlight, StreamFanout
+from .backends import Backend, BackendPool
+from .admission import AdmissionController
 
 
 class OllamaClient:
-    def __init__(self, base_url: str = "http://localhost:11434"):
-        self.base_url = base_url
-        self.chat_endpoint = f"{base_url}/api/chat"
-        
-    async def chat_completion(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
-        """Send a chat completion request to Ollama and return the response."""
-        
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 120.0,
+        write_timeout: float = 30.0,
+        pool_timeout: float = 10.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[ResponseCache] = None,
+        coalesce: bool = True,
+        routing_strategy: str = "least_outstanding",
+        failure_threshold: int = 3,
+        probe_interval: float = 10.0,
+        admission: Optional[AdmissionController] = None
+    ):
+        # base_url may list several Ollama hosts separated by commas
+        self.backends = BackendPool(
+            base_url.split(","),
+            strategy=routing_strategy,
+            failure_threshold=failure_threshold,
+            probe_interval=probe_interval
+        )
+        self.base_url = self.backends.backends[0].url
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=write_timeout,
+            pool=pool_timeout
+        )
+        # Model listing is cheap, so it gets a shorter read timeout
+        self.models_timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=30.0,
+            write=write_timeout,
+            pool=pool_timeout
+        )
+        self._transport = transport
+        self.admission = admission or AdmissionController()
+        self.cache = cache
+        # Identical in-flight requests share one upstream generation
+        self.single_flight = SingleFlight() if coalesce else None
+        self.stream_fanout = StreamFanout() if coalesce else None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stats = {
+            "requests": 0,
+            "connections_opened": 0,
+            "in_flight": 0,
+        }
+        # Per-model EWMAs of completion length and speed, used to estimate
+        # how many tokens a cancelled generation would still have produced
+        self._model_profiles: Dict[str, Dict[str, float]] = {}
+        self._cancellations = {
+            "cancelled": 0,
+            "tokens_generated": 0,
+            "tokens_saved_estimate": 0,
+        }
+        # Flight keys of upstream streams in progress, and those of them their
+        # consumer is abandoning on purpose (see stop_early)
+        self._active_streams: Dict[str, int] = {}
+        self._early_stops: Set[str] = set()
+
+    @classmethod
+    def from_env(cls) -> "OllamaClient":
+        """Create a client configured from OLLAMA_* environment variables."""
+        return cls(
+            base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+            max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", 20)),
+            max_keepalive_connections=int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", 10)),
+            keepalive_expiry=float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", 30.0)),
+            connect_timeout=float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 5.0)),
+            read_timeout=float(os.getenv("OLLAMA_READ_TIMEOUT", 120.0)),
+            write_timeout=float(os.getenv("OLLAMA_WRITE_TIMEOUT", 30.0)),
+            pool_timeout=float(os.getenv("OLLAMA_POOL_TIMEOUT", 10.0)),
+            cache=ResponseCache.from_env(),
+            coalesce=os.getenv("OLLAMA_COALESCE_REQUESTS", "true").lower() in ("1", "true", "yes"),
+            routing_strategy=os.getenv("OLLAMA_ROUTING_STRATEGY", "least_outstanding"),
+            failure_threshold=int(os.getenv("OLLAMA_FAILURE_THRESHOLD", 3)),
+            probe_interval=float(os.getenv("OLLAMA_PROBE_INTERVAL", 10.0)),
+            admission=AdmissionController(
+                concurrency=int(os.getenv("OLLAMA_MODEL_CONCURRENCY", 4)),
+                max_queue=int(os.getenv("OLLAMA_MODEL_QUEUE_DEPTH", 32)),
+                overrides=AdmissionController.parse_overrides(os.getenv("OLLAMA_MODEL_LIMITS", ""))
+            )
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared, pooled HTTP client (created on first use)."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=self.limits,
+                timeout=self.timeout,
+                transport=self._transport
+            )
+        return self._client
+
+    async def start(self) -> None:
+        """Open the shared connection pool and start probing backends."""
+        client = self.client
+        if len(self.backends.backends) > 1:
+            self.backends.start_probing(client)
+
+    async def aclose(self) -> None:
+        """Close the shared connection pool and drop idle keep-alive connections."""
+        await self.backends.stop_probing()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace hook used to count newly opened TCP connections."""
+        if event_name == "connection.connect_tcp.complete":
+            self._stats["connections_opened"] += 1
+
+    def _request_extensions(self) -> Dict[str, Any]:
+        self._stats["requests"] += 1
+        return {"trace": self._trace}
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Return connection pool configuration and reuse statistics."""
+        requests = self._stats["requests"]
+        opened = self._stats["connections_opened"]
+        reused = max(requests - opened, 0)
+        return {
+            "requests": requests,
+            "connections_opened": opened,
+            "connections_reused": reused,
+            "reuse_rate": round(reused / requests, 4) if requests else 0.0,
+            "in_flight": self._stats["in_flight"],
+            "pool_open": self._client is not None and not self._client.is_closed,
+            "limits": {
+                "max_connections": self.limits.max_connections,
+                "max_keepalive_connections": self.limits.max_keepalive_connections,
+                "keepalive_expiry": self.limits.keepalive_expiry
+            },
+            "timeouts": {
+                "connect": self.timeout.connect,
+                "read": self.timeout.read,
+                "write": self.timeout.write,
+                "pool": self.timeout.pool
+            }
+        }
+
+    def coalescing_stats(self) -> Dict[str, Any]:
+        """Return single-flight statistics for completions and streams."""
+        if self.single_flight is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "completions": self.single_flight.stats(),
+            "streams": self.stream_fanout.stats()
+        }
+
+    def _record_completion(self, model: str, usage: ChatCompletionUsage, timings: CompletionTimings) -> None:
+        profile = self._model_profiles.setdefault(model, {})
+        samples = {"completion_tokens": float(usage.completion_tokens)}
+        if timings.tokens_per_second:
+            samples["tokens_per_second"] = timings.tokens_per_second
+        for name, value in samples.items():
+            previous = profile.get(name)
+            profile[name] = value if previous is None else 0.2 * value + 0.8 * previous
+
+    def _record_cancellation(
+        self,
+        request: ChatCompletionRequest,
+        tokens_generated: Optional[int] = None,
+        elapsed: float = 0.0
+    ) -> None:
+        """Count an abandoned generation and estimate the tokens it no longer has to produce."""
+        profile = self._model_profiles.get(request.model, {})
+        if tokens_generated is None:
+            # Non-streaming: infer progress from the model's observed generation speed
+            tokens_generated = int(elapsed * profile.get("tokens_per_second", 0.0))
+        expected = [v for v in (request.max_tokens, profile.get("completion_tokens")) if v]
+        remaining = int(min(expected)) - tokens_generated if expected else 0
+
+        self._cancellations["cancelled"] += 1
+        self._cancellations["tokens_generated"] += tokens_generated
+        self._cancellations["tokens_saved_estimate"] += max(remaining, 0)
+
+    def cancellation_stats(self) -> Dict[str, Any]:
+        """Return counters for generations aborted because every client went away."""
+        return dict(self._cancellations)
+
+    def stop_early(self, request: ChatCompletionRequest) -> None:
+        """
+        Declare that the caller is about to close request's stream on purpose.
+
+        Call before closing a stream_text() or stream_chat_completion()
+        stream because of what it produced (e.g. a validator abort), so the
+        abort is not counted as a client disconnect.
+        """
+        key = self._flight_key(request.model_copy(update={"stream": True}))
+        # A stream already finished upstream (still being replayed) has nothing left to stop
+        if key in self._active_streams:
+            self._early_stops.add(key)
+
+    def admission_stats(self) -> Dict[str, Any]:
+        """Return per-model concurrency, queue depth and rejection counters."""
+        return self.admission.stats()
+
+    @staticmethod
+    def _flight_key(request: ChatCompletionRequest) -> str:
+        """Key identifying byte-identical requests."""
+        return hashlib.sha256(request.model_dump_json().encode("utf-8")).hexdigest()
+
+    def _build_ollama_request(self, request: ChatCompletionRequest, stream: bool) -> Dict[str, Any]:
+        """Convert an OpenAI-style request into an Ollama /api/chat payload."""
         # Convert messages to Ollama format
         ollama_messages = []
         for msg in request.messages:
@@ -22,15 +239,15 @@ class OllamaClient:
                 "role": msg.role,
                 "content": msg.content
             })
-        
+
         # Prepare Ollama request
         ollama_request = {
             "model": request.model,
             "messages": ollama_messages,
-            "stream": False,
+            "stream": stream,
             "options": {}
         }
-        
+
         # Add optional parameters
         if request.temperature is not None:
             ollama_request["options"]["temperature"] = request.temperature
@@ -38,53 +255,226 @@ class OllamaClient:
             ollama_request["options"]["num_predict"] = request.max_tokens
         if request.stop is not None:
             ollama_request["options"]["stop"] = request.stop
-        
+
+        return ollama_request
+
+    async def cached_chat_completion(
+        self,
+        request: ChatCompletionRequest,
+        cache_opt_in: bool = False
+    ) -> Tuple[ChatCompletionResponse, str]:
+        """
+        Serve a chat completion through the response cache when it applies.
+
+        Returns:
+            Tuple of (response, cache_status) where cache_status is HIT, MISS or BYPASS
+        """
+        if self.cache is None or not self.cache.applies(request, cache_opt_in):
+            return await self.chat_completion(request), "BYPASS"
+
+        key = self.cache.make_key(request)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached, "HIT"
+
+        response = await self.chat_completion(request)
+        await self.cache.put(key, response)
+        return response, "MISS"
+
+    async def batch_chat_completion(
+        self,
+        requests: List[ChatCompletionRequest],
+        max_parallel: int,
+        max_retries: int = 3
+    ) -> AsyncGenerator[Tuple[int, Union[ChatCompletionResponse, HTTPException]], None]:
+        """
+        Run many completions with at most max_parallel in flight.
+
+        Yields (index, response or HTTPException) as each one finishes. Items
+        rejected by admission control are retried after their Retry-After delay.
+        """
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def run(index: int, request: ChatCompletionRequest):
+            async with semaphore:
+                for attempt in range(max_retries + 1):
+                    try:
+                        response, _ = await self.cached_chat_completion(request)
+                        return index, response
+                    except HTTPException as e:
+                        if e.status_code != 429 or attempt == max_retries:
+                            return index, e
+                        await asyncio.sleep(float((e.headers or {}).get("Retry-After", 1)))
+
+        tasks = [
+            asyncio.ensure_future(run(index, request.model_copy(update={"stream": False})))
+            for index, request in enumerate(requests)
+        ]
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.post(
-                    self.chat_endpoint,
-                    json=ollama_request
-                )
-                
-                if response.status_code != 200:
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Ollama API error: {response.text}"
-                    )
-                
-                ollama_response = response.json()
-                
-                # Convert Ollama response to OpenAI format
-                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
-                created_timestamp = int(time.time())
-                
-                choice = ChatCompletionChoice(
-                    index=0,
-                    message=ChatMessage(
-                        role=ollama_response["message"]["role"],
-                        content=ollama_response["message"]["content"]
-                    ),
-                    finish_reason="stop"
-                )
-                
-                # Calculate token usage (approximate)
-                prompt_tokens = sum(len(msg.content.split()) for msg in request.messages)
-                completion_tokens = len(ollama_response["message"]["content"].split())
-                
-                usage = ChatCompletionUsage(
-                    prompt_tokens=prompt_tokens,
-                    completion_tokens=completion_tokens,
-                    total_tokens=prompt_tokens + completion_tokens
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def chat_completion(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
+        """Send a chat completion request to Ollama and return the response."""
+        if self.single_flight is None:
+            return await self._chat_completion_upstream(request)
+        return await self.single_flight.do(
+            self._flight_key(request),
+            lambda: self._chat_completion_upstream(request)
+        )
+
+    @staticmethod
+    def _usage_from_ollama(
+        request: ChatCompletionRequest,
+        final_chunk: Dict[str, Any],
+        completion_text: str
+    ) -> ChatCompletionUsage:
+        """Token usage from Ollama's own counters, estimated only when a counter is missing."""
+        prompt_tokens = final_chunk.get("prompt_eval_count")
+        if prompt_tokens is None:
+            # Ollama omits the count when the whole prompt came from its KV cache
+            prompt_tokens = sum(len(msg.content.split()) for msg in request.messages)
+        completion_tokens = final_chunk.get("eval_count")
+        if completion_tokens is None:
+            completion_tokens = len(completion_text.split())
+        return ChatCompletionUsage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens
+        )
+
+    @staticmethod
+    def _timings_from_ollama(
+        final_chunk: Dict[str, Any],
+        queue_time: float,
+        generation_time: float
+    ) -> CompletionTimings:
+        """Combine admission timings with Ollama's duration fields (reported in nanoseconds)."""
+        def ms(field: str) -> Optional[float]:
+            value = final_chunk.get(field)
+            return round(value / 1e6, 1) if value is not None else None
+
+        def rate(count_field: str, duration_field: str) -> Optional[float]:
+            count, duration = final_chunk.get(count_field), final_chunk.get(duration_field)
+            if count is None or not duration:
+                return None
+            return round(count / (duration / 1e9), 2)
+
+        return CompletionTimings(
+            queue_ms=round(queue_time * 1000, 1),
+            generation_ms=round(generation_time * 1000, 1),
+            load_ms=ms("load_duration"),
+            prompt_eval_ms=ms("prompt_eval_duration"),
+            eval_ms=ms("eval_duration"),
+            total_ms=ms("total_duration"),
+            prompt_tokens_per_second=rate("prompt_eval_count", "prompt_eval_duration"),
+            tokens_per_second=rate("eval_count", "eval_duration")
+        )
+
+    async def _send_chat(
+        self,
+        request: ChatCompletionRequest,
+        stream: bool
+    ) -> Tuple[Backend, httpx.Response, float]:
+        """Send a chat request to the best backend, failing over on connection errors."""
+        payload = self._build_ollama_request(request, stream=stream)
+        tried: List[Backend] = []
+        last_error: Optional[Exception] = None
+        while True:
+            backend = self.backends.select(request.model, exclude=tried)
+            if backend is None:
+                raise last_error
+            started = self.backends.begin(backend)
+            try:
+                http_request = self.client.build_request(
+                    "POST",
+                    f"{backend.url}/api/chat",
+                    json=payload,
+                    extensions=self._request_extensions()
                 )
-                
-                return ChatCompletionResponse(
-                    id=completion_id,
-                    created=created_timestamp,
-                    model=request.model,
-                    choices=[choice],
-                    usage=usage
+                response = await self.client.send(http_request, stream=True)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # The request never reached this backend, so another one can take it
+                self.backends.end(backend)
+                self.backends.record_failure(backend)
+                tried.append(backend)
+                last_error = e
+                continue
+            except BaseException as e:
+                self.backends.end(backend)
+                if isinstance(e, httpx.RequestError):
+                    self.backends.record_failure(backend)
+                raise
+            return backend, response, time.monotonic() - started
+
+    @asynccontextmanager
+    async def _routed_chat(self, request: ChatCompletionRequest, stream: bool) -> AsyncIterator[httpx.Response]:
+        """Open a chat response on a routed backend and release the backend afterwards."""
+        backend, response, latency = await self._send_chat(request, stream)
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                if response.status_code in (502, 503, 504):
+                    self.backends.record_failure(backend)
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Ollama API error: {response.text}"
                 )
-                
+            yield response
+            self.backends.record_success(backend, latency, request.model)
+        except httpx.RequestError:
+            self.backends.record_failure(backend)
+            raise
+        finally:
+            await response.aclose()
+            self.backends.end(backend)
+
+    async def _chat_completion_upstream(self, request: ChatCompletionRequest) -> ChatCompletionResponse:
+        started: Optional[float] = None
+        self._stats["in_flight"] += 1
+        try:
+            async with self.admission.slot(request.model) as ticket:
+                started = time.monotonic()
+                async with self._routed_chat(request, stream=False) as response:
+                    await response.aread()
+                    ollama_response = response.json()
+
+            # Convert Ollama response to OpenAI format
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+            created_timestamp = int(time.time())
+
+            choice = ChatCompletionChoice(
+                index=0,
+                message=ChatMessage(
+                    role=ollama_response["message"]["role"],
+                    content=ollama_response["message"]["content"]
+                ),
+                finish_reason=ollama_response.get("done_reason") or "stop"
+            )
+
+            usage = self._usage_from_ollama(request, ollama_response, ollama_response["message"]["content"])
+            timings = self._timings_from_ollama(ollama_response, ticket.queue_time, ticket.service_time)
+            self._record_completion(request.model, usage, timings)
+
+            return ChatCompletionResponse(
+                id=completion_id,
+                created=created_timestamp,
+                model=request.model,
+                choices=[choice],
+                usage=usage,
+                timings=timings
+            )
+
+        except asyncio.CancelledError:
+            # Still waiting for an admission slot: Ollama never saw the request
+            if started is not None:
+                self._record_cancellation(request, elapsed=time.monotonic() - started)
+            raise
+        except HTTPException:
+            raise
         except httpx.RequestError as e:
             raise HTTPException(
                 status_code=503,
@@ -95,23 +485,50 @@ class OllamaClient:
                 status_code=500,
                 detail=f"Internal server error: {str(e)}"
             )
-    
+        finally:
+            self._stats["in_flight"] -= 1
+
     async def list_models(self) -> Dict[str, Any]:
-        """List available models from Ollama."""
-        models_endpoint = f"{self.base_url}/api/tags"
-        
+        """List the models available on any backend."""
+        targets = [b for b in self.backends.backends if b.healthy] or self.backends.backends
+        results = await asyncio.gather(
+            *(self._list_backend_models(b) for b in targets),
+            return_exceptions=True
+        )
+
+        models: Dict[str, Dict[str, Any]] = {}
+        errors = []
+        for result in results:
+            if isinstance(result, BaseException):
+                errors.append(result)
+                continue
+            for model in result.get("models", []):
+                models.setdefault(model.get("name", ""), model)
+
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        return {"models": list(models.values())}
+
+    async def _list_backend_models(self, backend: Backend) -> Dict[str, Any]:
+        models_endpoint = f"{backend.url}/api/tags"
+
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(models_endpoint)
-                
-                if response.status_code != 200:
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=f"Ollama API error: {response.text}"
-                    )
-                
-                return response.json()
-                
+            response = await self.client.get(
+                models_endpoint,
+                timeout=self.models_timeout,
+                extensions=self._request_extensions()
+            )
+
+            if response.status_code != 200:
+                raise HTTPException(
+                    status_code=response.status_code,
+                    detail=f"Ollama API error: {response.text}"
+                )
+
+            return response.json()
+
+        except HTTPException:
+            raise
         except httpx.RequestError as e:
             raise HTTPException(
                 status_code=503,
@@ -125,54 +542,56 @@ class OllamaClient:
 
     async def stream_chat_completion(self, request: ChatCompletionRequest) -> AsyncGenerator[str, None]:
         """Stream a chat completion response from Ollama."""
-        
-        # Convert messages to Ollama format
-        ollama_messages = []
-        for msg in request.messages:
-            ollama_messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        
-        # Prepare Ollama request
-        ollama_request = {
-            "model": request.model,
-            "messages": ollama_messages,
-            "stream": True,
-            "options": {}
-        }
-        
-        # Add optional parameters
-        if request.temperature is not None:
-            ollama_request["options"]["temperature"] = request.temperature
-        if request.max_tokens is not None:
-            ollama_request["options"]["num_predict"] = request.max_tokens
-        if request.stop is not None:
-            ollama_request["options"]["stop"] = request.stop
-        
+        if self.stream_fanout is None:
+            source = self._stream_chat_completion_upstream(request)
+        else:
+            source = self.stream_fanout.subscribe(
+                self._flight_key(request),
+                lambda: self._stream_chat_completion_upstream(request)
+            )
+        try:
+            async for chunk in source:
+                yield chunk
+        finally:
+            await source.aclose()
+
+    async def stream_text(self, request: ChatCompletionRequest) -> AsyncGenerator[str, None]:
+        """Stream just the generated text deltas of a completion."""
+        stream = self.stream_chat_completion(request.model_copy(update={"stream": True}))
+        try:
+            async for event in stream:
+                payload = event[len("data: "):].strip()
+                if payload == "[DONE]":
+                    break
+                content = json.loads(payload)["choices"][0]["delta"].get("content")
+                if content:
+                    yield content
+        finally:
+            await stream.aclose()
+
+    async def _stream_chat_completion_upstream(self, request: ChatCompletionRequest) -> AsyncGenerator[str, None]:
         completion_id = f"chatcmpl-{uuid.uuid4().hex}"
         created_timestamp = int(time.time())
-        
+        completion_parts: List[str] = []
+        finished = False
+        sent = False
+        key = self._flight_key(request)
+        self._active_streams[key] = self._active_streams.get(key, 0) + 1
+
+        self._stats["in_flight"] += 1
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                async with client.stream(
-                    "POST",
-                    self.chat_endpoint,
-                    json=ollama_request
-                ) as response:
-                    if response.status_code != 200:
-                        raise HTTPException(
-                            status_code=response.status_code,
-                            detail=f"Ollama API error: {response.text}"
-                        )
-                    
+            async with self.admission.slot(request.model) as ticket:
+                generation_started = time.monotonic()
+                sent = True
+                async with self._routed_chat(request, stream=True) as response:
                     async for line in response.aiter_lines():
                         if line.strip():
                             try:
                                 ollama_chunk = json.loads(line)
-                                
+
                                 # Convert to OpenAI streaming format
                                 if ollama_chunk.get("message", {}).get("content"):
+                                    completion_parts.append(ollama_chunk["message"]["content"])
                                     chunk_data = {
                                         "id": completion_id,
                                         "object": "chat.completion.chunk",
@@ -187,9 +606,15 @@ class OllamaClient:
                                         }]
                                     }
                                     yield f"data: {json.dumps(chunk_data)}\n\n"
-                                
-                                # Send final chunk if done
+
+                                # Send final chunk with usage and timings if done
                                 if ollama_chunk.get("done", False):
+                                    usage = self._usage_from_ollama(request, ollama_chunk, "".join(completion_parts))
+                                    timings = self._timings_from_ollama(
+                                        ollama_chunk,
+                                        ticket.queue_time,
+                                        time.monotonic() - generation_started
+                                    )
                                     final_chunk = {
                                         "id": completion_id,
                                         "object": "chat.completion.chunk",
@@ -198,16 +623,29 @@ class OllamaClient:
                                         "choices": [{
                                             "index": 0,
                                             "delta": {},
-                                            "finish_reason": "stop"
-                                        }]
+                                            "finish_reason": ollama_chunk.get("done_reason") or "stop"
+                                        }],
+                                        "usage": usage.model_dump(),
+                                        "timings": timings.model_dump(exclude_none=True)
                                     }
+                                    finished = True
+                                    self._record_completion(request.model, usage, timings)
                                     yield f"data: {json.dumps(final_chunk)}\n\n"
                                     yield "data: [DONE]\n\n"
                                     break
-                                    
+
                             except json.JSONDecodeError:
                                 continue
-                                
+
+        except (asyncio.CancelledError, GeneratorExit):
+            # Closing the routed response above drops the connection, which stops Ollama.
+            # Only client disconnects count: not aborts before the request was sent, nor
+            # streams the consumer stopped on purpose
+            if sent and not finished and key not in self._early_stops:
+                self._record_cancellation(request, tokens_generated=len(completion_parts))
+            raise
+        except HTTPException:
+            raise
         except httpx.RequestError as e:
             raise HTTPException(
                 status_code=503,
@@ -218,3 +656,9 @@ class OllamaClient:
                 status_code=500,
                 detail=f"Internal server error: {str(e)}"
             )
+        finally:
+            self._active_streams[key] -= 1
+            if not self._active_streams[key]:
+                del self._active_streams[key]
+                self._early_stops.discard(key)
+            self._stats["in_flight"] -= 1
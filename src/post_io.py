@@ -0,0 +1,145 @@
+"""
+Non-blocking post file I/O: exclusive name allocation and atomic writes
+"""
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+from .file_modes import match_mode
+
+# Streamed text is buffered in memory up to this size before each disk write
+WRITE_BUFFER_BYTES = 64 * 1024
+
+
+async def _offload(fn: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.get_event_loop().run_in_executor(None, fn, *args)
+
+
+def _reserve(folder: Path, stem: str, suffix: str) -> Tuple[str, Path]:
+    folder.mkdir(parents=True, exist_ok=True)
+    counter = 0
+    while True:
+        filename = f"{stem}{suffix}" if counter == 0 else f"{stem}-{counter}{suffix}"
+        path = folder / filename
+        try:
+            # O_EXCL makes the check and the create one atomic step
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return filename, path
+        except FileExistsError:
+            counter += 1
+
+
+async def reserve_unique(folder: Path, stem: str, suffix: str) -> Tuple[str, Path]:
+    """
+    Claim a filename that no one else has, creating an empty placeholder.
+
+    Tries stem+suffix, then stem-1+suffix, stem-2+suffix, ... Concurrent
+    callers never get the same name. Fill the placeholder with
+    write_atomic() or an AtomicWriter, or drop it with discard().
+    """
+    return await _offload(_reserve, folder, stem, suffix)
+
+
+def _temp_for(path: Path) -> Tuple[int, str]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        match_mode(fd, path)
+    except BaseException:
+        os.close(fd)
+        os.unlink(tmp)
+        raise
+    return fd, tmp
+
+
+def _write_replace(path: Path, content: str) -> None:
+    fd, tmp = _temp_for(path)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+async def write_atomic(path: Path, content: str) -> None:
+    """Write a file via a temp file and rename, so readers never see a partial file."""
+    await _offload(_write_replace, path, content)
+
+
+async def read_text(path: Path) -> str:
+    def read() -> str:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return await _offload(read)
+
+
+def _unlink(path: Path) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+async def discard(path: Path) -> None:
+    """Remove a file (such as an unused placeholder) if it exists."""
+    await _offload(_unlink, path)
+
+
+class AtomicWriter:
+    """
+    Incrementally write a file that appears at its path only on commit().
+
+    Text is buffered and written to a temp file in the target's folder in
+    WRITE_BUFFER_BYTES batches, off the event loop. commit() renames the
+    temp file over the target; abort() deletes it.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+        self._tmp: Optional[str] = None
+        self._buffer: List[str] = []
+        self._buffered = 0
+
+    async def open(self) -> "AtomicWriter":
+        def create() -> None:
+            fd, self._tmp = _temp_for(self.path)
+            self._file = os.fdopen(fd, 'w', encoding='utf-8')
+        await _offload(create)
+        return self
+
+    async def write(self, text: str) -> None:
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= WRITE_BUFFER_BYTES:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        if not self._buffer:
+            return
+        chunk = ''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        await _offload(self._file.write, chunk)
+
+    async def commit(self) -> None:
+        await self._flush()
+
+        def finish() -> None:
+            self._file.close()
+            os.replace(self._tmp, self.path)
+        await _offload(finish)
+        self._tmp = None
+
+    async def abort(self) -> None:
+        if self._tmp is None:
+            return
+
+        def cleanup() -> None:
+            self._file.close()
+            _unlink(Path(self._tmp))
+        await _offload(cleanup)
+        self._tmp = None
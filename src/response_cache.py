@@ -0,0 +1,173 @@
+"""
+Content-addressed response cache for deterministic chat completions
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+from .file_modes import match_mode
+from .schemas import ChatCompletionRequest, ChatCompletionResponse
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + optional disk) cache keyed by a hash of the request."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = None
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        # key -> serialized ChatCompletionResponse, oldest first
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "disk_errors": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """Create a cache from RESPONSE_CACHE_* environment variables, or None if disabled."""
+        if os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024)),
+            max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+            disk_dir=os.getenv("RESPONSE_CACHE_DIR") or None
+        )
+
+    @staticmethod
+    def make_key(request: ChatCompletionRequest) -> str:
+        """Stable hash of every request field that influences the generated output."""
+        payload = {
+            "model": request.model,
+            "messages": [{"role": m.role, "content": m.content} for m in request.messages],
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens,
+            "stop": request.stop,
+        }
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def applies(request: ChatCompletionRequest, opt_in: bool = False) -> bool:
+        """Only greedy (temperature 0) completions are cached unless the caller opts in."""
+        return opt_in or request.temperature == 0
+
+    async def get(self, key: str) -> Optional[ChatCompletionResponse]:
+        """Look up a cached response, promoting disk hits into the memory tier."""
+        response = None
+        serialized = self._entries.get(key)
+        if serialized is not None:
+            self._entries.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            response = ChatCompletionResponse.model_validate_json(serialized)
+        elif self.disk_dir is not None:
+            loop = asyncio.get_event_loop()
+            try:
+                entry = await loop.run_in_executor(None, self._read_disk, key)
+            except (OSError, ValueError) as e:
+                # Unreadable or corrupt (truncated, old schema): a miss, not a failed request
+                print(f"Warning: dropping bad response cache entry {key}: {e}", file=sys.stderr)
+                self._stats["disk_errors"] += 1
+                entry = None
+            if entry is not None:
+                serialized, response = entry
+                self._stats["disk_hits"] += 1
+                self._remember(key, serialized)
+
+        if response is None:
+            self._stats["misses"] += 1
+            return None
+
+        self._stats["hits"] += 1
+        # Every response handed out still gets its own completion id
+        return response.model_copy(update={
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time())
+        })
+
+    async def put(self, key: str, response: ChatCompletionResponse) -> None:
+        """Store a response in memory and, if configured, on disk."""
+        serialized = response.model_dump_json()
+        self._remember(key, serialized)
+        self._stats["stores"] += 1
+        if self.disk_dir is not None:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._write_disk, key, serialized)
+
+    def _remember(self, key: str, serialized: str) -> None:
+        size = len(serialized)
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = serialized
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._stats["evictions"] += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[Tuple[str, ChatCompletionResponse]]:
+        path = self._disk_path(key)
+        try:
+            serialized = path.read_text(encoding="utf-8")
+            return serialized, ChatCompletionResponse.model_validate_json(serialized)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # ValidationError and UnicodeDecodeError are ValueErrors
+            path.unlink(missing_ok=True)
+            raise
+
+    def _write_disk(self, key: str, serialized: str) -> None:
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                match_mode(f.fileno(), path)
+                f.write(serialized)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def clear(self) -> None:
+        """Drop the memory tier (the disk tier is left in place)."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and memory tier occupancy."""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "disk_dir": str(self.disk_dir) if self.disk_dir else None,
+        }
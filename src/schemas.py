@@ -28,6 +28,17 @@ class ChatCompletionUsage(BaseModel):
     total_tokens: int
 
 
+class CompletionTimings(BaseModel):
+    queue_ms: float = Field(..., description="Time spent waiting for an admission slot")
+    generation_ms: float = Field(..., description="Time spent generating once admitted")
+    load_ms: Optional[float] = Field(None, description="Time Ollama spent loading the model")
+    prompt_eval_ms: Optional[float] = Field(None, description="Time Ollama spent evaluating the prompt")
+    eval_ms: Optional[float] = Field(None, description="Time Ollama spent generating tokens")
+    total_ms: Optional[float] = Field(None, description="Total time reported by Ollama")
+    prompt_tokens_per_second: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+
+
 class ChatCompletionResponse(BaseModel):
     id: str
     object: str = "chat.completion"
@@ -35,6 +46,38 @@ class ChatCompletionResponse(BaseModel):
     model: str
     choices: List[ChatCompletionChoice]
     usage: ChatCompletionUsage
+    timings: Optional[CompletionTimings] = None
+
+
+class JobInfo(BaseModel):
+    """Status of a background job."""
+    job_id: str
+    kind: str
+    status: str = Field(..., description="queued, running, succeeded, failed or cancelled")
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    status_url: str
+    result_url: str
+
+
+class BatchChatCompletionRequest(BaseModel):
+    requests: List[ChatCompletionRequest] = Field(..., min_length=1, description="Chat completion requests to run")
+    max_parallel: Optional[int] = Field(None, ge=1, description="Maximum completions to run at once (capped by the server)")
+    stream: Optional[bool] = Field(False, description="Stream results back as NDJSON as each completion finishes")
+
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the request in the batch")
+    response: Optional[ChatCompletionResponse] = None
+    error: Optional[str] = None
+    status_code: int = 200
+
+
+class BatchChatCompletionResponse(BaseModel):
+    object: str = "chat.completion.batch"
+    results: List[BatchItemResult]
 
 
 class StreamingChatCompletionChunk(BaseModel):
@@ -50,6 +93,12 @@ class DraftPostRequest(BaseModel):
     topic: str = Field(..., description="The topic for the blog post draft")
     model: Optional[str] = Field("mistral:7b", description="The model to use for generation")
     blog_folder: Optional[str] = Field("posts", description="Target folder for blog posts")
+    mode: Optional[str] = Field(
+        "single",
+        pattern="^(single|sections)$",
+        description="'single' writes the post in one completion; 'sections' outlines it first and writes the sections in parallel"
+    )
+    background: Optional[bool] = Field(False, description="Queue the draft and return a job id right away (202)")
 
 
 class DraftPostResponse(BaseModel):
@@ -61,3 +110,4 @@ class DraftPostResponse(BaseModel):
     word_count: Optional[int] = None
     content_stats: Optional[dict] = None
     content_issues: Optional[List[str]] = None
+    stopped_early: Optional[str] = Field(None, description="Why generation was stopped before the model finished, if it was")
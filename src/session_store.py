@@ -0,0 +1,440 @@
+"""
+Storage for interactive writing sessions
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+
+def session_size(session: Dict[str, Any]) -> int:
+    """Approximate memory held by a session: characters of text it stores."""
+    size = len(session.get('topic', '')) + len(session.get('blog_folder', ''))
+    for turn in session.get('conversation_history', []):
+        size += len(turn.get('content', '')) + 16
+    for name, text in session.get('content_sections', {}).items():
+        size += len(name) + len(text)
+    return size
+
+
+class SessionLockTimeout(TimeoutError):
+    """Another holder kept a session's lock longer than the store's lock_timeout."""
+
+
+class SessionStore(ABC):
+    """
+    Interface for session storage.
+
+    A session is a dict with blog_folder, topic, content_sections (the
+    draft as ordered heading -> section text; see DraftDocument),
+    conversation_history and created_at. Callers that read, then modify a
+    session (a chat turn) should hold lock(session_id).
+    """
+
+    @abstractmethod
+    async def create(self, session_id: str, session: Dict[str, Any]) -> None:
+        """Store a new session, replacing any with the same id."""
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return the session and mark it used, or None if it is unknown or expired."""
+
+    @abstractmethod
+    async def append_turns(self, session_id: str, turns: List[Dict[str, str]]) -> None:
+        """Add turns to the end of the conversation history."""
+
+    @abstractmethod
+    async def set_draft(self, session_id: str, sections: Dict[str, str]) -> None:
+        """Replace the draft sections."""
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> bool:
+        """Remove a session; False if there was none."""
+
+    @abstractmethod
+    def lock(self, session_id: str) -> Any:
+        """Async context manager that serializes work on one session."""
+
+    @abstractmethod
+    async def metrics(self) -> Dict[str, Any]:
+        """Counts and limits, reported in the session status."""
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process sessions bounded by idle TTL, count and approximate size.
+
+    Sessions are kept in least-recently-used order; whenever a limit is
+    exceeded the idlest sessions are evicted first.
+    """
+
+    def __init__(self, ttl: float = 86400.0, max_sessions: int = 1000, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._last_access: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._bytes = 0
+        self._stats = {"created": 0, "evicted": 0, "expired": 0}
+
+    async def create(self, session_id: str, session: Dict[str, Any]) -> None:
+        self._expire()
+        if session_id in self._sessions:
+            self._remove(session_id)
+        self._sessions[session_id] = session
+        self._stats["created"] += 1
+        self._touch(session_id)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if time.monotonic() - self._last_access[session_id] > self.ttl:
+            self._remove(session_id)
+            self._stats["expired"] += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        self._last_access[session_id] = time.monotonic()
+        return session
+
+    async def append_turns(self, session_id: str, turns: List[Dict[str, str]]) -> None:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session['conversation_history'].extend(turns)
+            self._touch(session_id)
+
+    async def set_draft(self, session_id: str, sections: Dict[str, str]) -> None:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session['content_sections'] = sections
+            self._touch(session_id)
+
+    async def delete(self, session_id: str) -> bool:
+        if session_id not in self._sessions:
+            return False
+        self._remove(session_id)
+        return True
+
+    @asynccontextmanager
+    async def lock(self, session_id: str) -> AsyncIterator[None]:
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        try:
+            async with lock:
+                yield
+        finally:
+            # Don't keep locks for unknown or removed sessions
+            if session_id not in self._sessions and not lock.locked() and self._locks.get(session_id) is lock:
+                del self._locks[session_id]
+
+    def _touch(self, session_id: str) -> None:
+        """Mark a session as just used, re-measure it and enforce the limits."""
+        self._sessions.move_to_end(session_id)
+        self._last_access[session_id] = time.monotonic()
+        size = session_size(self._sessions[session_id])
+        self._bytes += size - self._sizes.get(session_id, 0)
+        self._sizes[session_id] = size
+        self._evict(keep=session_id)
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions))
+            if self._last_access[oldest] > cutoff:
+                break
+            self._remove(oldest)
+            self._stats["expired"] += 1
+
+    def _evict(self, keep: str) -> None:
+        self._expire()
+        while len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes:
+            oldest = next(iter(self._sessions))
+            if oldest == keep:
+                # Never evict the session being written; it alone may exceed max_bytes
+                break
+            self._remove(oldest)
+            self._stats["evicted"] += 1
+
+    def _remove(self, session_id: str) -> None:
+        del self._sessions[session_id]
+        del self._last_access[session_id]
+        self._bytes -= self._sizes.pop(session_id, 0)
+        lock = self._locks.get(session_id)
+        if lock is not None and not lock.locked():
+            del self._locks[session_id]
+
+    async def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            **self._stats,
+        }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite database (WAL mode) shared by every worker process.
+
+    Conversation turns are append-only rows and the draft sections are a
+    column of their own, so a chat turn never rewrites the history. lock() is a lease
+    row: it serializes a session across processes. The holder renews the
+    lease every lock_lease / 3 seconds, so a lease left behind by a crashed
+    worker expires after lock_lease seconds while a long turn keeps its own.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 86400.0,
+        max_sessions: int = 10000,
+        lock_lease: float = 300.0,
+        lock_poll: float = 0.05,
+        lock_timeout: float = 60.0
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.lock_lease = lock_lease
+        self.lock_poll = lock_poll
+        self.lock_timeout = lock_timeout
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30.0)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._local_locks: Dict[str, asyncio.Lock] = {}
+        self._stats = {"created": 0, "evicted": 0, "expired": 0}
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA foreign_keys=ON")
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    blog_folder TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    content_sections TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+                CREATE TABLE IF NOT EXISTS turns (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, seq);
+                CREATE TABLE IF NOT EXISTS session_locks (
+                    session_id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires REAL NOT NULL
+                );
+            """)
+
+    async def _run(self, fn: Callable[[], Any]) -> Any:
+        def locked() -> Any:
+            with self._lock, self._db:
+                return fn()
+        return await asyncio.get_event_loop().run_in_executor(None, locked)
+
+    def _delete_ids(self, ids: List[str]) -> int:
+        self._db.executemany("DELETE FROM sessions WHERE id = ?", [(i,) for i in ids])
+        return len(ids)
+
+    async def create(self, session_id: str, session: Dict[str, Any]) -> None:
+        def insert() -> None:
+            now = time.time()
+            expired = [row["id"] for row in self._db.execute(
+                "SELECT id FROM sessions WHERE last_access < ?", (now - self.ttl,)
+            )]
+            self._stats["expired"] += self._delete_ids(expired)
+
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.execute(
+                "INSERT INTO sessions (id, blog_folder, topic, content_sections, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    session_id, session['blog_folder'], session['topic'],
+                    json.dumps(session.get('content_sections', {})), session['created_at'], now
+                )
+            )
+            self._insert_turns(session_id, session.get('conversation_history', []))
+
+            overflow = [row["id"] for row in self._db.execute(
+                "SELECT id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?", (self.max_sessions,)
+            )]
+            self._stats["evicted"] += self._delete_ids(overflow)
+            self._stats["created"] += 1
+
+        await self._run(insert)
+
+    def _insert_turns(self, session_id: str, turns: List[Dict[str, str]]) -> None:
+        self._db.executemany(
+            "INSERT INTO turns (session_id, role, content) VALUES (?, ?, ?)",
+            [(session_id, turn["role"], turn["content"]) for turn in turns]
+        )
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        def fetch() -> Optional[Dict[str, Any]]:
+            now = time.time()
+            row = self._db.execute("SELECT * FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            if row["last_access"] < now - self.ttl:
+                self._stats["expired"] += self._delete_ids([session_id])
+                return None
+            self._db.execute("UPDATE sessions SET last_access = ? WHERE id = ?", (now, session_id))
+            history = [
+                {"role": turn["role"], "content": turn["content"]}
+                for turn in self._db.execute(
+                    "SELECT role, content FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)
+                )
+            ]
+            return {
+                'blog_folder': row["blog_folder"],
+                'topic': row["topic"],
+                'content_sections': json.loads(row["content_sections"]),
+                'conversation_history': history,
+                'created_at': row["created_at"]
+            }
+
+        return await self._run(fetch)
+
+    async def append_turns(self, session_id: str, turns: List[Dict[str, str]]) -> None:
+        def append() -> None:
+            touched = self._db.execute(
+                "UPDATE sessions SET last_access = ? WHERE id = ?", (time.time(), session_id)
+            ).rowcount
+            if touched:
+                self._insert_turns(session_id, turns)
+
+        await self._run(append)
+
+    async def set_draft(self, session_id: str, sections: Dict[str, str]) -> None:
+        draft = json.dumps(sections)
+        await self._run(lambda: self._db.execute(
+            "UPDATE sessions SET content_sections = ?, last_access = ? WHERE id = ?", (draft, time.time(), session_id)
+        ))
+
+    async def delete(self, session_id: str) -> bool:
+        deleted = await self._run(lambda: self._db.execute(
+            "DELETE FROM sessions WHERE id = ?", (session_id,)
+        ).rowcount)
+        self._local_locks.pop(session_id, None)
+        return bool(deleted)
+
+    @asynccontextmanager
+    async def lock(self, session_id: str) -> AsyncIterator[None]:
+        """
+        Hold the session's lease, renewing it until released.
+
+        Raises SessionLockTimeout when another holder keeps it for more than
+        lock_timeout seconds.
+        """
+        deadline = time.monotonic() + self.lock_timeout
+        # Queue locally first so only one task per process polls the lease
+        local = self._local_locks.setdefault(session_id, asyncio.Lock())
+        try:
+            await asyncio.wait_for(local.acquire(), timeout=self.lock_timeout)
+        except asyncio.TimeoutError:
+            raise SessionLockTimeout(session_id) from None
+        try:
+            await self._acquire_lease(session_id, deadline)
+            heartbeat = asyncio.ensure_future(self._renew_lease(session_id))
+            try:
+                yield
+            finally:
+                heartbeat.cancel()
+                await self._run(lambda: self._db.execute(
+                    "DELETE FROM session_locks WHERE session_id = ? AND owner = ?", (session_id, self.owner)
+                ))
+        finally:
+            local.release()
+
+    async def _acquire_lease(self, session_id: str, deadline: float) -> None:
+        def try_acquire() -> bool:
+            now = time.time()
+            return self._db.execute(
+                "INSERT INTO session_locks (session_id, owner, expires) VALUES (?, ?, ?)"
+                " ON CONFLICT (session_id) DO UPDATE SET owner = excluded.owner, expires = excluded.expires"
+                " WHERE session_locks.expires < ?",
+                (session_id, self.owner, now + self.lock_lease, now)
+            ).rowcount == 1
+
+        delay = self.lock_poll
+        while not await self._run(try_acquire):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise SessionLockTimeout(session_id)
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
+
+    async def _renew_lease(self, session_id: str) -> None:
+        """Push the lease's expiry forward while it is held, so long turns keep it."""
+        def renew() -> bool:
+            return self._db.execute(
+                "UPDATE session_locks SET expires = ? WHERE session_id = ? AND owner = ?",
+                (time.time() + self.lock_lease, session_id, self.owner)
+            ).rowcount == 1
+
+        while True:
+            await asyncio.sleep(self.lock_lease / 3)
+            if not await self._run(renew):
+                print(f"Warning: lost the lock lease on session {session_id}", file=sys.stderr)
+                return
+
+    async def metrics(self) -> Dict[str, Any]:
+        def measure() -> Dict[str, Any]:
+            sessions, draft_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(content_sections)), 0) FROM sessions"
+            ).fetchone()
+            turns, turn_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM turns"
+            ).fetchone()
+            return {"sessions": sessions, "turns": turns, "bytes": draft_bytes + turn_bytes}
+
+        return {
+            "backend": "sqlite",
+            **await self._run(measure),
+            "max_sessions": self.max_sessions,
+            "ttl": self.ttl,
+            **self._stats,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def create_session_store() -> SessionStore:
+    """Build the session store selected by the SESSION_* environment variables."""
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    ttl = float(os.getenv("SESSION_TTL_SECONDS", 86400))
+    max_sessions = int(os.getenv("SESSION_MAX_COUNT", 1000))
+    max_bytes = int(os.getenv("SESSION_MAX_BYTES", 64 * 1024 * 1024))
+
+    if backend == "memory":
+        return MemorySessionStore(ttl=ttl, max_sessions=max_sessions, max_bytes=max_bytes)
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            os.getenv("SESSION_DB_PATH", ".blog-agent/sessions.sqlite3"),
+            ttl=ttl,
+            max_sessions=max_sessions,
+            lock_lease=float(os.getenv("SESSION_LOCK_LEASE", 300)),
+            lock_timeout=float(os.getenv("SESSION_LOCK_TIMEOUT", 60))
+        )
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
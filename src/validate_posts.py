@@ -0,0 +1,222 @@
+"""
+Bulk validation of a blog archive across a process pool
+
+Usage:
+    python -m src.validate_posts posts/ [--format jsonl|csv] [--output report.jsonl]
+
+Every .qmd/.md file under the given paths is run through
+ContentValidator.analyze(). Results are cached in a manifest keyed by
+path, mtime, size and SHA-256, so later runs only re-check changed files.
+The whole manifest is invalidated when the validator rules change.
+"""
+import argparse
+import csv
+import hashlib
+import inspect
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import content_validator
+from .content_validator import ContentValidator
+
+EXTENSIONS = (".qmd", ".md")
+STAT_FIELDS = [
+    "word_count", "heading_count", "paragraph_count", "code_blocks",
+    "links", "images", "character_count", "estimated_reading_time"
+]
+
+
+def rules_fingerprint() -> str:
+    """Hash of the validator source and thresholds; any rule change alters it."""
+    digest = hashlib.sha256(inspect.getsource(content_validator).encode("utf-8"))
+    for limit in ("MIN_WORD_COUNT", "MAX_WORD_COUNT", "MIN_HEADING_COUNT"):
+        digest.update(f"{limit}={getattr(ContentValidator, limit)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def find_posts(paths: Iterable[str], extensions: Tuple[str, ...] = EXTENSIONS) -> List[str]:
+    """All post files under the given files or directories, sorted, skipping hidden entries."""
+    found = set()
+    for root in paths:
+        if os.path.isfile(root):
+            found.add(os.path.normpath(root))
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for name in filenames:
+                if name.endswith(extensions) and not name.startswith("."):
+                    found.add(os.path.normpath(os.path.join(dirpath, name)))
+    return sorted(found)
+
+
+def validate_file(job: Tuple[str, Optional[str]]) -> Dict[str, Any]:
+    """
+    Validate one post (runs in a worker process).
+
+    job is (path, sha256 from the manifest or None). When the content hash
+    still matches, the post is not re-analyzed and "unchanged" is set.
+    """
+    path, known_sha256 = job
+    record: Dict[str, Any] = {"path": path}
+    try:
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        record.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size, sha256=hashlib.sha256(data).hexdigest())
+        if record["sha256"] == known_sha256:
+            record["unchanged"] = True
+            return record
+
+        analysis = ContentValidator.analyze(data.decode("utf-8"))
+        record.update(is_valid=analysis.is_valid, issues=analysis.issues, stats=analysis.stats)
+    except (OSError, UnicodeDecodeError) as e:
+        record.update(is_valid=False, issues=[], stats=None, error=str(e))
+    return record
+
+
+def load_manifest(path: Optional[str], fingerprint: str) -> Dict[str, Dict[str, Any]]:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("rules") != fingerprint:
+        return {}
+    return manifest.get("files", {})
+
+
+def save_manifest(path: str, fingerprint: str, files: Dict[str, Dict[str, Any]]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"rules": fingerprint, "files": files}, f)
+    os.replace(tmp, path)
+
+
+def run(
+    paths: List[str],
+    manifest_path: Optional[str] = None,
+    workers: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Validate every post under paths, reusing manifest entries for unchanged files.
+
+    Returns:
+        Tuple of (records sorted by path, counts of checked/cached/invalid/errors)
+    """
+    fingerprint = rules_fingerprint()
+    previous = load_manifest(manifest_path, fingerprint)
+
+    records: Dict[str, Dict[str, Any]] = {}
+    jobs: List[Tuple[str, Optional[str]]] = []
+    for path in find_posts(paths):
+        entry = previous.get(path)
+        if entry is not None:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is not None and (stat.st_mtime_ns, stat.st_size) == (entry["mtime_ns"], entry["size"]):
+                records[path] = {**entry, "cached": True}
+                continue
+        jobs.append((path, entry["sha256"] if entry else None))
+
+    if workers == 1 or len(jobs) <= 1:
+        results = [validate_file(job) for job in jobs]
+    else:
+        chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(validate_file, jobs, chunksize=chunksize))
+
+    for record in results:
+        if record.pop("unchanged", False):
+            # Touched but identical: keep the old result with the new mtime
+            record = {**previous[record["path"]], **record, "cached": True}
+        else:
+            record["cached"] = False
+        records[record["path"]] = record
+
+    ordered = [records[path] for path in sorted(records)]
+    if manifest_path:
+        save_manifest(manifest_path, fingerprint, {
+            r["path"]: {k: v for k, v in r.items() if k != "cached"}
+            for r in ordered if "error" not in r
+        })
+
+    summary = {
+        "files": len(ordered),
+        "checked": sum(1 for r in ordered if not r["cached"]),
+        "cached": sum(1 for r in ordered if r["cached"]),
+        "invalid": sum(1 for r in ordered if not r["is_valid"]),
+        "errors": sum(1 for r in ordered if "error" in r),
+    }
+    return ordered, summary
+
+
+def write_report(records: List[Dict[str, Any]], out, fmt: str) -> None:
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["path", "is_valid", "cached", *STAT_FIELDS, "issues", "error"])
+        for r in records:
+            stats = r.get("stats") or {}
+            writer.writerow([
+                r["path"], r["is_valid"], r["cached"],
+                *(stats.get(name, "") for name in STAT_FIELDS),
+                "; ".join(r.get("issues") or []), r.get("error", "")
+            ])
+        return
+
+    for r in records:
+        out.write(json.dumps({
+            "path": r["path"],
+            "is_valid": r["is_valid"],
+            "cached": r["cached"],
+            "issues": r.get("issues"),
+            "stats": r.get("stats"),
+            **({"error": r["error"]} if "error" in r else {})
+        }) + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.validate_posts",
+        description="Validate every .qmd/.md post in a blog archive in parallel."
+    )
+    parser.add_argument("paths", nargs="*", default=["posts"], help="post files or folders (default: posts)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl", help="report format")
+    parser.add_argument("--output", "-o", help="write the report here instead of stdout")
+    parser.add_argument("--workers", "-j", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument(
+        "--manifest",
+        default=os.getenv("VALIDATE_MANIFEST_PATH", ".blog-agent/validate-manifest.json"),
+        help="manifest used to skip unchanged files"
+    )
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not write the manifest")
+    parser.add_argument("--fail-on-invalid", action="store_true", help="exit with status 1 if any post has issues")
+    args = parser.parse_args(argv)
+
+    records, summary = run(args.paths, None if args.no_cache else args.manifest, args.workers)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            write_report(records, out, args.format)
+    else:
+        write_report(records, sys.stdout, args.format)
+
+    print(
+        f"{summary['files']} posts: {summary['checked']} checked, {summary['cached']} unchanged, "
+        f"{summary['invalid']} with issues, {summary['errors']} unreadable",
+        file=sys.stderr
+    )
+    if args.fail_on_invalid and (summary["invalid"] or summary["errors"]):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Benchmark: ContentValidator.analyze() against the legacy multi-pass validator
+
+The legacy path is what draft_post used to run: get_content_stats() followed
+by validate_content(), which together stripped the frontmatter six times and
+ran the word count three times.
+
+Usage:
+    python tests/bench_content_validator.py [--words 50000] [--posts 20] [--rounds 5]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.content_validator import ContentValidator  # noqa: E402
+
+
+class LegacyContentValidator:
+    """The validator as it was before analyze(), kept as a reference."""
+
+    MIN_WORD_COUNT = 200
+    MAX_WORD_COUNT = 5000
+    MIN_HEADING_COUNT = 2
+
+    @staticmethod
+    def count_words(text: str) -> int:
+        content = LegacyContentValidator._remove_frontmatter(text)
+        return len(content.split())
+
+    @staticmethod
+    def count_headings(text: str) -> int:
+        content = LegacyContentValidator._remove_frontmatter(text)
+        heading_pattern = r'^#{1,6}\s+.+$'
+        return len(re.findall(heading_pattern, content, re.MULTILINE))
+
+    @staticmethod
+    def _remove_frontmatter(text: str) -> str:
+        lines = text.split('\n')
+        if lines[0].strip() == "---":
+            for i, line in enumerate(lines[1:], 1):
+                if line.strip() == "---":
+                    return '\n'.join(lines[i+1:])
+        return text
+
+    @staticmethod
+    def validate_content(text: str) -> Tuple[bool, List[str]]:
+        issues = []
+        word_count = LegacyContentValidator.count_words(text)
+        if word_count < LegacyContentValidator.MIN_WORD_COUNT:
+            issues.append(f"Content too short: {word_count} words (minimum: {LegacyContentValidator.MIN_WORD_COUNT})")
+        elif word_count > LegacyContentValidator.MAX_WORD_COUNT:
+            issues.append(f"Content too long: {word_count} words (maximum: {LegacyContentValidator.MAX_WORD_COUNT})")
+        heading_count = LegacyContentValidator.count_headings(text)
+        if heading_count < LegacyContentValidator.MIN_HEADING_COUNT:
+            issues.append(f"Not enough headings: {heading_count} (minimum: {LegacyContentValidator.MIN_HEADING_COUNT})")
+        content = LegacyContentValidator._remove_frontmatter(text)
+        if not content.strip():
+            issues.append("No content found after frontmatter")
+        if '```' not in content:
+            issues.append("Consider adding code examples for better technical content")
+        return len(issues) == 0, issues
+
+    @staticmethod
+    def get_content_stats(text: str) -> dict:
+        content = LegacyContentValidator._remove_frontmatter(text)
+        return {
+            'word_count': LegacyContentValidator.count_words(text),
+            'heading_count': LegacyContentValidator.count_headings(text),
+            'paragraph_count': len([p for p in content.split('\n\n') if p.strip()]),
+            'code_blocks': content.count('```') // 2,
+            'links': len(re.findall(r'\[.*?\]\(.*?\)', content)),
+            'images': len(re.findall(r'!\[.*?\]\(.*?\)', content)),
+            'character_count': len(content),
+            'estimated_reading_time': LegacyContentValidator.count_words(text) // 200
+        }
+
+
+WORDS = "async python token stream latency cache model draft section outline pool queue".split()
+
+
+def synthetic_post(words: int, seed: int = 0) -> str:
+    """A Quarto post with frontmatter, headings, code, links and images."""
+    rng = random.Random(seed)
+    parts = ['---\ntitle: "Synthetic"\ndate: "2025-01-01"\ncategories: [bench]\n---\n']
+    written = 0
+    section = 0
+    while written < words:
+        section += 1
+        parts.append(f"\n## Section {section}\n")
+        for _ in range(rng.randint(2, 5)):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 90)))
+            if rng.random() < 0.2:
+                sentence += f" See [the docs](https://example.com/{section}) for details."
+            if rng.random() < 0.05:
+                sentence += f"\n\n![diagram {section}](img/{section}.png)"
+            parts.append("\n" + sentence + "\n")
+            written += len(sentence.split())
+        if rng.random() < 0.3:
+            parts.append("\n```python\nprint('hello')\n```\n")
+    return "".join(parts)
+
+
+def legacy(text: str):
+    return LegacyContentValidator.get_content_stats(text), LegacyContentValidator.validate_content(text)
+
+
+def combined(text: str):
+    analysis = ContentValidator.analyze(text)
+    return analysis.stats, (analysis.is_valid, analysis.issues)
+
+
+def time_it(fn, posts: List[str], rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for post in posts:
+            fn(post)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=50000, help="words per synthetic post")
+    parser.add_argument("--posts", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    posts = [synthetic_post(args.words, seed) for seed in range(args.posts)]
+    for post in posts:
+        assert legacy(post) == combined(post), "analyze() disagrees with the legacy validator"
+
+    size_mb = sum(len(p) for p in posts) / 1e6
+    old = time_it(legacy, posts, args.rounds)
+    new = time_it(combined, posts, args.rounds)
+    print(f"{args.posts} posts x {args.words} words ({size_mb:.1f} MB), best of {args.rounds}")
+    print(f"legacy stats + validate : {old * 1000:8.1f} ms")
+    print(f"analyze()               : {new * 1000:8.1f} ms")
+    print(f"speedup                 : {old / new:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: MCP stdout throughput and event-loop stall
+
+Writes many small frames (progress notifications) and a few huge ones
+(whole drafts) into a pipe drained by a reader thread, comparing the old
+path (write + flush on the event loop behind a lock) with
+src.mcp_output.OutputChannel. A ticker coroutine measures how late the
+loop wakes it up while the frames are going out.
+
+Usage:
+    python tests/bench_mcp_output.py [--small 20000] [--huge 8] [--huge-kb 4096] [--read-delay-ms 0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.mcp_output import OutputChannel  # noqa: E402
+
+TICK = 0.001
+PRODUCERS = 16
+
+
+def start_reader(fd: int, read_delay: float) -> threading.Thread:
+    def drain() -> None:
+        with os.fdopen(fd, "rb") as pipe:
+            while pipe.read1(65536) if hasattr(pipe, "read1") else pipe.read(65536):
+                if read_delay:
+                    time.sleep(read_delay)
+
+    thread = threading.Thread(target=drain, daemon=True)
+    thread.start()
+    return thread
+
+
+async def legacy_send(stream, lock: asyncio.Lock, message: dict) -> None:
+    data = json.dumps(message)
+    async with lock:
+        stream.write(data + "\n")
+        stream.flush()
+
+
+async def channel_send(channel: OutputChannel, message: dict) -> None:
+    # Same split as MCPServer._write: notifications inline, responses in a worker thread
+    if "method" in message:
+        data = json.dumps(message)
+    else:
+        data = await asyncio.get_event_loop().run_in_executor(None, json.dumps, message)
+    await channel.send(data)
+
+
+async def produce(messages: list, send) -> None:
+    """PRODUCERS concurrent tasks, each sending its share of the frames in order (like streaming tools)."""
+    async def producer(share: list) -> None:
+        for message in share:
+            await send(message)
+
+    await asyncio.gather(*(producer(messages[i::PRODUCERS]) for i in range(PRODUCERS)))
+
+
+async def measure(kind: str, messages: list, read_delay: float) -> dict:
+    read_fd, write_fd = os.pipe()
+    reader = start_reader(read_fd, read_delay)
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + TICK
+            await asyncio.sleep(TICK)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    tick = asyncio.ensure_future(ticker())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    if kind == "legacy":
+        stream = os.fdopen(write_fd, "w", encoding="utf-8")
+        lock = asyncio.Lock()
+        await produce(messages, lambda m: legacy_send(stream, lock, m))
+    else:
+        stream = os.fdopen(write_fd, "wb")
+        channel = OutputChannel(stream)
+        await produce(messages, lambda m: channel_send(channel, m))
+        await channel.close()
+    elapsed = time.perf_counter() - started
+    stream.close()
+    done.set()
+    await tick
+    reader.join()
+
+    lags.sort()
+    return {
+        "elapsed_s": elapsed,
+        "max_lag_ms": lags[-1] * 1000 if lags else 0.0,
+        "p99_lag_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else 0.0,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--small", type=int, default=20000)
+    parser.add_argument("--huge", type=int, default=8)
+    parser.add_argument("--huge-kb", type=int, default=4096)
+    parser.add_argument("--read-delay-ms", type=float, default=0.0, help="pause after each 64 KB read (slow client)")
+    args = parser.parse_args()
+
+    small = [
+        {"jsonrpc": "2.0", "method": "notifications/progress", "params": {"progressToken": i, "progress": i, "message": "token "}}
+        for i in range(args.small)
+    ]
+    text = "Lorem ipsum dolor sit amet.\n" * (args.huge_kb * 1024 // 28)
+    huge = [{"jsonrpc": "2.0", "id": i, "result": {"content": [{"type": "text", "text": text}]}} for i in range(args.huge)]
+
+    delay = args.read_delay_ms / 1000
+    for label, messages in ((f"{args.small} small", small), (f"{args.huge} x {args.huge_kb} KB", huge)):
+        print(label)
+        for kind in ("legacy", "channel"):
+            result = await measure(kind, messages, delay)
+            size = sum(len(json.dumps(m)) + 1 for m in messages) / (1024 * 1024)
+            print(
+                f"  {kind:8s} {size / result['elapsed_s']:8.1f} MB/s  "
+                f"{len(messages) / result['elapsed_s']:10.0f} frames/s  "
+                f"max lag {result['max_lag_ms']:7.1f} ms  p99 lag {result['p99_lag_ms']:6.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
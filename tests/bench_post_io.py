@@ -0,0 +1,98 @@
+"""
+Benchmark: event-loop stall while many drafts are written concurrently
+
+Compares the old synchronous write path (mkdir, exists() loop, open().write()
+on the event loop) with src.post_io. A ticker coroutine measures how late
+the loop wakes it up while the drafts are being saved.
+
+Usage:
+    python tests/bench_post_io.py [--drafts 32] [--size-kb 2048] [--rounds 3]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import post_io  # noqa: E402
+
+TICK = 0.001
+
+
+async def legacy_save(folder: Path, content: str) -> None:
+    folder.mkdir(parents=True, exist_ok=True)
+    filename = "2025-01-01-benchmark.qmd"
+    full_path = folder / filename
+    counter = 1
+    while full_path.exists():
+        full_path = folder / f"2025-01-01-benchmark-{counter}.qmd"
+        counter += 1
+    with open(full_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    await asyncio.sleep(0)
+
+
+async def post_io_save(folder: Path, content: str) -> None:
+    filename, full_path = await post_io.reserve_unique(folder, "2025-01-01-benchmark", ".qmd")
+    await post_io.write_atomic(full_path, content)
+
+
+async def measure(save, drafts: int, content: str) -> dict:
+    lags = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            expected = time.perf_counter() + TICK
+            await asyncio.sleep(TICK)
+            lags.append(max(0.0, time.perf_counter() - expected))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / "posts"
+        tick = asyncio.ensure_future(ticker())
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await asyncio.gather(*(save(folder, content) for _ in range(drafts)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await tick
+        files = len(list(folder.iterdir()))
+
+    lags.sort()
+    return {
+        "elapsed_s": elapsed,
+        "max_lag_ms": lags[-1] * 1000 if lags else 0.0,
+        "p99_lag_ms": lags[int(len(lags) * 0.99)] * 1000 if lags else 0.0,
+        "files": files,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drafts", type=int, default=32)
+    parser.add_argument("--size-kb", type=int, default=2048)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    line = "Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n"
+    content = (line * (args.size_kb * 1024 // len(line) + 1))[:args.size_kb * 1024]
+    print(f"{args.drafts} concurrent drafts of {args.size_kb} KB, {args.rounds} rounds")
+    for name, save in (("legacy sync", legacy_save), ("post_io", post_io_save)):
+        runs = [await measure(save, args.drafts, content) for _ in range(args.rounds)]
+        best = min(runs, key=lambda r: r["max_lag_ms"])
+        worst = max(runs, key=lambda r: r["max_lag_ms"])
+        print(
+            f"{name:12s} files={best['files']:3d} "
+            f"max lag {best['max_lag_ms']:7.1f}-{worst['max_lag_ms']:7.1f} ms  "
+            f"p99 lag {best['p99_lag_ms']:6.1f} ms  "
+            f"wall {best['elapsed_s'] * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
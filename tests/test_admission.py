@@ -0,0 +1,83 @@
+"""
+Unit tests for per-model admission control
+"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.admission import AdmissionController
+
+
+async def test_requests_beyond_queue_get_429_with_retry_after():
+    admission = AdmissionController(concurrency=1, max_queue=1)
+    release = asyncio.Event()
+
+    async def hold():
+        async with admission.slot("mistral:7b"):
+            await release.wait()
+
+    holder = asyncio.ensure_future(hold())
+    queued = asyncio.ensure_future(hold())
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as excinfo:
+        async with admission.slot("mistral:7b"):
+            pass
+
+    assert excinfo.value.status_code == 429
+    assert int(excinfo.value.headers["Retry-After"]) >= 1
+
+    release.set()
+    await asyncio.gather(holder, queued)
+    stats = admission.stats()["models"]["mistral:7b"]
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 1
+    assert stats["active"] == 0
+
+
+async def test_queue_time_is_reported_separately():
+    admission = AdmissionController(concurrency=1, max_queue=4)
+    tickets = []
+
+    async def run():
+        async with admission.slot("llama2") as ticket:
+            await asyncio.sleep(0.02)
+        tickets.append(ticket)
+
+    await asyncio.gather(run(), run())
+
+    first, second = tickets
+    assert first.queue_time == 0.0
+    assert second.queue_time >= 0.015
+    assert second.service_time >= 0.015
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    admission = AdmissionController(concurrency=1, max_queue=4)
+    release = asyncio.Event()
+
+    async def hold():
+        async with admission.slot("m"):
+            await release.wait()
+
+    holder = asyncio.ensure_future(hold())
+    waiter = asyncio.ensure_future(hold())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+
+    assert admission.gate("m").stats()["queued"] == 0
+    release.set()
+    await holder
+    assert admission.gate("m").active == 0
+
+
+def test_per_model_overrides():
+    overrides = AdmissionController.parse_overrides("mistral:7b=2:8, llama2=1:4")
+    admission = AdmissionController(concurrency=4, max_queue=32, overrides=overrides)
+
+    assert overrides == {"mistral:7b": (2, 8), "llama2": (1, 4)}
+    assert admission.capacity("mistral:7b") == 2
+    assert admission.capacity("codellama") == 4
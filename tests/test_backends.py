@@ -0,0 +1,83 @@
+"""
+Unit tests for multi-backend Ollama routing
+"""
+
+import asyncio
+
+import httpx
+
+from src.backends import BackendPool
+from src.ollama_client import OllamaClient
+from src.schemas import ChatCompletionRequest
+
+
+def test_least_outstanding_selection():
+    pool = BackendPool(["http://a:11434", "http://b:11434"])
+    a, b = pool.backends
+
+    pool.begin(a)
+    assert pool.select() is b
+    pool.begin(b)
+    pool.begin(b)
+    assert pool.select() is a
+
+
+def test_prefers_backend_with_model_loaded():
+    pool = BackendPool(["http://a:11434", "http://b:11434"], affinity_slack=1)
+    a, b = pool.backends
+    b.loaded_models.add("mistral:7b")
+    pool.begin(b)
+
+    assert pool.select("mistral:7b") is b
+    assert pool.select("llama2") is a
+
+    # Too busy compared with a cold backend: affinity gives way to load
+    pool.begin(b)
+    assert pool.select("mistral:7b") is a
+
+
+def test_passive_ejection_and_probe_recovery():
+    pool = BackendPool(["http://a:11434", "http://b:11434"], failure_threshold=2)
+    a, b = pool.backends
+
+    pool.record_failure(a)
+    assert a.healthy
+    pool.record_failure(a)
+    assert not a.healthy
+    assert pool.select() is b
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"models": [{"name": "mistral:7b"}]})
+
+    async def probe():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await pool.probe(client)
+
+    asyncio.run(probe())
+    assert a.healthy
+    assert a.loaded_models == {"mistral:7b"}
+
+
+async def test_client_fails_over_to_next_backend():
+    hits = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        hits.append(request.url.host)
+        if request.url.host == "down":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": "ok"}, "done": True})
+
+    client = OllamaClient(
+        base_url="http://down:11434,http://up:11434",
+        transport=httpx.MockTransport(handler)
+    )
+    request = ChatCompletionRequest(model="mistral:7b", messages=[{"role": "user", "content": "hi"}])
+
+    response = await client.chat_completion(request)
+
+    assert response.choices[0].message.content == "ok"
+    assert hits == ["down", "up"]
+    down, up = client.backends.backends
+    assert down.consecutive_failures == 1
+    assert up.outstanding == 0
+    assert "mistral:7b" in up.loaded_models
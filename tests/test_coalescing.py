@@ -0,0 +1,105 @@
+"""
+Unit tests for single-flight coalescing of identical requests
+"""
+
+import asyncio
+import json
+
+import httpx
+
+from src.coalescing import SingleFlight, StreamFanout
+from src.ollama_client import OllamaClient
+from src.schemas import ChatCompletionRequest
+
+
+async def test_single_flight_shares_one_call():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    flight = SingleFlight()
+    results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+
+    assert results == ["result"] * 5
+    assert calls == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "abandoned": 0, "in_flight": 0}
+
+
+async def test_single_flight_keeps_running_while_a_waiter_remains():
+    started = asyncio.Event()
+
+    async def work():
+        started.set()
+        await asyncio.sleep(0.02)
+        return 42
+
+    flight = SingleFlight()
+    first = asyncio.ensure_future(flight.do("k", work))
+    second = asyncio.ensure_future(flight.do("k", work))
+    await started.wait()
+    first.cancel()
+
+    assert await second == 42
+
+
+async def test_single_flight_cancels_when_all_waiters_leave():
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    flight = SingleFlight()
+    waiter = asyncio.ensure_future(flight.do("k", work))
+    await asyncio.sleep(0)
+    waiter.cancel()
+
+    await asyncio.wait_for(cancelled.wait(), 1)
+    assert flight.stats()["abandoned"] == 1
+
+
+async def test_stream_fanout_replays_same_chunks_to_every_subscriber():
+    produced = 0
+
+    async def source():
+        nonlocal produced
+        for i in range(3):
+            produced += 1
+            await asyncio.sleep(0.005)
+            yield f"chunk-{i}"
+
+    fanout = StreamFanout()
+
+    async def collect():
+        return [chunk async for chunk in fanout.subscribe("k", source)]
+
+    first, second = await asyncio.gather(collect(), collect())
+
+    assert first == second == ["chunk-0", "chunk-1", "chunk-2"]
+    assert produced == 3
+
+
+async def test_client_coalesces_identical_requests():
+    upstream_calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(0.01)
+        body = json.loads(request.content)
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": body["model"]}, "done": True})
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+    request = ChatCompletionRequest(model="mistral:7b", messages=[{"role": "user", "content": "hi"}])
+
+    responses = await asyncio.gather(*(client.chat_completion(request) for _ in range(4)))
+
+    assert upstream_calls == 1
+    assert {r.choices[0].message.content for r in responses} == {"mistral:7b"}
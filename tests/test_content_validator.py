@@ -0,0 +1,77 @@
+"""
+Unit tests for ContentValidator.analyze() and its legacy-compatible views
+"""
+
+import random
+
+from bench_content_validator import LegacyContentValidator, synthetic_post
+from src.content_validator import ContentValidator, IncrementalValidator
+
+FRAGMENTS = [
+    "---", " --- ", "\n", "\n\n", "\r\n", "# ", "#", "####### ", "## Title", "   ", "\t",
+    "word ", "```", "[link](url)", "![img](a.png)", "[a ![b](c)", "](", "![", "text",
+]
+
+
+def fuzz_texts(count: int):
+    rng = random.Random(1234)
+    for _ in range(count):
+        yield "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 40)))
+
+
+def test_analyze_matches_legacy_validator():
+    samples = list(fuzz_texts(3000)) + [synthetic_post(300, seed) for seed in range(5)] + ["", "---", "---\n---"]
+    for text in samples:
+        analysis = ContentValidator.analyze(text)
+        assert analysis.stats == LegacyContentValidator.get_content_stats(text), repr(text)
+        assert (analysis.is_valid, analysis.issues) == LegacyContentValidator.validate_content(text), repr(text)
+        assert ContentValidator._remove_frontmatter(text) == LegacyContentValidator._remove_frontmatter(text)
+
+
+def test_views_share_the_analysis():
+    post = "---\ntitle: x\n---\n# One\n\nSome text.\n\n## Two\n\n```python\nprint(1)\n```\n"
+
+    assert ContentValidator.get_content_stats(post) == ContentValidator.analyze(post).stats
+    assert ContentValidator.validate_content(post) == (False, ["Content too short: 9 words (minimum: 200)"])
+    assert ContentValidator.analyze(post).heading_count == 2
+
+
+def test_incremental_validator_tracks_counts_across_chunks():
+    post = "# Title\n\nSome words here.\n\n## Second heading\n\nMore text follows."
+    validator = IncrementalValidator()
+    for i in range(0, len(post), 3):
+        assert validator.feed(post[i:i + 3]) is None
+    validator.feed("\n")
+
+    assert validator.word_count == ContentValidator.count_words(post)
+    assert validator.heading_count == ContentValidator.count_headings(post)
+
+
+def test_incremental_analysis_matches_analyze_for_any_chunking():
+    post = "# T\n\n[a](b) and ![i](c.png)\n\n\n```py\nx = 1\n````\n\n## Two\nend ``"
+    for size in range(1, 9):
+        validator = IncrementalValidator()
+        for i in range(0, len(post), size):
+            validator.feed(post[i:i + size])
+        assert validator.analysis() == ContentValidator.analyze(post)
+
+
+def test_incremental_headings_match_analyze_across_empty_heading_lines():
+    posts = ("#\nfoo", "# \nfoo", "#\n", "#  \n# x\n", "#\n  \n# x", "#\n#\nfoo\n# y", "##\t\n\n\n", "#\r\n")
+    for post in posts:
+        for size in (1, 2, len(post)):
+            validator = IncrementalValidator()
+            for i in range(0, len(post), size):
+                validator.feed(post[i:i + size])
+            assert validator.analysis() == ContentValidator.analyze(post), repr(post)
+
+
+def test_incremental_validator_abort_rules():
+    assert IncrementalValidator(max_words=5).feed("# H\none two three four") == "Exceeded 5 words"
+    assert IncrementalValidator(first_heading_within=10).feed("word " * 11) == "No heading in the first 10 words"
+    assert IncrementalValidator(first_heading_within=None).feed("word " * 11) is None
+
+    assert IncrementalValidator().feed("I will not repeat myself. " * 10) is None
+    looping = IncrementalValidator(detect_repetition=True)
+    reasons = [looping.feed("I will not repeat myself. ") for _ in range(10)]
+    assert reasons[-1] == "Repetition loop: the last 5 words keep repeating"
@@ -0,0 +1,108 @@
+"""
+Unit tests for the token-budgeted context builder
+"""
+
+from src.context_builder import ContextBuilder, estimate_tokens, fit_text
+from src.draft_document import DraftDocument
+
+
+def system_prompt(draft: str) -> str:
+    return f"You help write a post.\n\nCurrent draft:\n{draft}"
+
+
+def session(turns: int, draft: str = "") -> dict:
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"question {i} " + "detail " * 40})
+        history.append({"role": "assistant", "content": f"answer {i} " + "reply " * 60})
+    return {
+        'topic': 'Topic',
+        'content_sections': DraftDocument.from_text(draft).sections,
+        'conversation_history': history
+    }
+
+
+async def test_long_sessions_stay_within_budget_with_few_summaries():
+    calls = []
+
+    async def summarize(summary, turns, model):
+        calls.append(len(turns))
+        return f"{summary} covered {len(turns)} more messages".strip()
+
+    builder = ContextBuilder(summarize, default_budget=3000, summary_tokens=100)
+    state = session(0)
+    sizes = []
+    for turn in range(60):
+        messages = await builder.build("s", state, f"turn {turn}", "mistral:7b", 500, system_prompt)
+        report = builder.report("s")
+        assert report["prompt_tokens"] <= 2500
+        assert messages[-1] == {"role": "user", "content": f"turn {turn}"}
+        sizes.append(report["prompt_tokens"])
+        state['conversation_history'] += session(1)['conversation_history']
+
+    # Summaries are folded in batches, not once per turn
+    assert 0 < len(calls) <= 15
+    assert "Summary of the earlier conversation" in messages[0]["content"]
+    assert report["summarized_messages"] + report["verbatim_messages"] == len(state['conversation_history']) - 2
+    assert report["dropped_messages"] == 0
+    assert max(sizes[30:]) <= 2500
+
+
+async def test_short_sessions_are_sent_verbatim():
+    async def summarize(summary, turns, model):
+        raise AssertionError("should not summarize")
+
+    builder = ContextBuilder(summarize, budgets={"big": 100000})
+    state = session(3, draft="# Draft\n\nBody\n")
+    messages = await builder.build("s", state, "next", "big", 1500, system_prompt)
+
+    assert messages[1:-1] == state['conversation_history']
+    assert "# Draft" in messages[0]["content"]
+    assert builder.report("s")["budget"] == 100000
+
+
+async def test_summarizer_failure_drops_old_turns():
+    async def summarize(summary, turns, model):
+        raise RuntimeError("model offline")
+
+    builder = ContextBuilder(summarize, default_budget=1500, summary_tokens=100)
+    await builder.build("s", session(20), "next", "m", 500, system_prompt)
+
+    report = builder.report("s")
+    assert report["dropped_messages"] > 0
+    assert report["prompt_tokens"] <= 1000
+
+
+def test_fit_text_keeps_head_and_tail():
+    text = "".join(f"line {i}\n" for i in range(1000))
+    fitted, truncated = fit_text(text, 200)
+
+    assert truncated
+    assert fitted.startswith("line 0\n")
+    assert fitted.endswith("line 999\n")
+    assert estimate_tokens(fitted) <= 200
+    assert fit_text("short", 200) == ("short", False)
+    assert ContextBuilder.parse_budgets("mistral:7b=8192, llama2=2048") == {"mistral:7b": 8192, "llama2": 2048}
+
+
+async def test_long_drafts_send_toc_and_relevant_sections():
+    async def summarize(summary, turns, model):
+        return summary
+
+    topics = ["installation", "routing", "caching with redis", "testing", "deployment", "monitoring"]
+    draft = "".join(
+        f"## {topic.title()}\n\n" + f"This section covers {topic}. " + "Filler prose about the framework. " * 60 + "\n\n"
+        for topic in topics
+    )
+    builder = ContextBuilder(summarize, default_budget=8000, draft_tokens=1000)
+    state = session(0, draft=draft)
+    messages = await builder.build("s", state, "Can you tighten the redis caching part?", "m", 500, system_prompt)
+
+    system = messages[0]["content"]
+    report = builder.report("s")
+    assert "- Deployment (" in system
+    assert "This section covers caching with redis." in system
+    assert "This section covers deployment." not in system
+    assert report["draft_sections"] == 1
+    assert report["draft_sections_total"] == 6
+    assert report["draft_tokens"] < estimate_tokens(draft) / 4
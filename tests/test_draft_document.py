@@ -0,0 +1,109 @@
+"""
+Unit tests for section-addressable drafts
+"""
+
+import difflib
+import random
+
+import httpx
+
+from src.draft_document import DraftDocument, SectionIndex, apply_unified_diff
+from src.interactive_agent import InteractiveBlogAgent
+from src.ollama_client import OllamaClient
+from src.session_store import MemorySessionStore
+
+DRAFT = """---
+title: "Caching"
+---
+
+Intro.
+
+## Setup
+
+Install it.
+
+```bash
+# a comment, not a heading
+pip install cache
+```
+
+## Usage
+
+Use it.
+
+## Usage
+
+Use it again.
+"""
+
+
+def test_sections_round_trip_and_keys():
+    document = DraftDocument.from_text(DRAFT)
+
+    assert document.keys() == ["", "Setup", "Usage", "Usage (2)"]
+    assert document.text == DRAFT
+    assert len(document) == len(DRAFT)
+
+
+def test_replace_add_and_delete_sections():
+    document = DraftDocument.from_text(DRAFT)
+    document.replace_sections({
+        "Setup": "Install it with uv.",
+        "Usage (2)": None,
+        "FAQ": "## FAQ\n\nNone yet.\n"
+    })
+
+    assert document.keys() == ["", "Setup", "Usage", "FAQ"]
+    assert "## Setup\n\nInstall it with uv.\n\n## Usage\n" in document.text
+    assert "Use it again." not in document.text
+    assert document.text.endswith("## FAQ\n\nNone yet.\n")
+
+
+def test_unified_diff_patches_match_difflib():
+    rng = random.Random(7)
+    for _ in range(300):
+        old = [f"line {rng.randint(0, 20)}\n" for _ in range(rng.randint(0, 30))]
+        new = list(old)
+        for _ in range(rng.randint(1, 4)):
+            at = rng.randint(0, len(new))
+            if rng.random() < 0.5 or at == len(new):
+                new.insert(at, f"added {rng.random()}\n")
+            else:
+                del new[at]
+        patch = "".join(difflib.unified_diff(old, new, "a", "b", n=rng.randint(0, 3)))
+        if patch:
+            assert apply_unified_diff("".join(old), patch) == "".join(new)
+
+
+async def test_agent_updates_sections_and_patches():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": "ok"}, "done": True})
+
+    agent = InteractiveBlogAgent(session_store=MemorySessionStore())
+    agent.ollama_client = OllamaClient(transport=httpx.MockTransport(handler))
+    session_id = await agent.start_session("posts", "Caching")
+
+    assert await agent.update_draft(session_id, content=DRAFT) == "Draft updated successfully."
+    assert await agent.update_draft(session_id, sections={"Usage": "Use it well.\n"}) == "Draft updated successfully."
+    assert (await agent.update_draft(session_id, sections={"Nope": "text"})).startswith("Section not found: Nope")
+
+    session = await agent.sessions.get(session_id)
+    text = DraftDocument(session['content_sections']).text
+    fixed = text.replace("Install it.", "Install it first.")
+    patch = "".join(difflib.unified_diff(text.splitlines(True), fixed.splitlines(True)))
+    assert await agent.update_draft(session_id, patch=patch) == "Draft updated successfully."
+    assert (await agent.update_draft(session_id, patch=patch)).startswith("Patch does not apply")
+
+    status = await agent.get_session_status(session_id)
+    assert status["sections"] == ["", "Setup", "Usage", "Usage (2)"]
+    assert status["draft_length"] == len(fixed.replace("Use it.", "Use it well."))
+
+
+def test_section_index_ranks_matching_sections():
+    index = SectionIndex()
+    index.update(DraftDocument.from_text(DRAFT).sections)
+    assert [key for key, _ in index.rank("pip install")][0] == "Setup"
+    assert index.rank("kubernetes") == []
+
+    index.update({"Setup": "## Setup\n\nUse kubernetes.\n"})
+    assert [key for key, _ in index.rank("kubernetes")] == ["Setup"]
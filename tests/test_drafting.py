@@ -0,0 +1,182 @@
+"""
+Unit tests for draft generation against a mocked Ollama transport
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from src import post_io
+from src.admission import AdmissionController
+from src.content_validator import ContentValidator
+from src.drafting import create_draft, make_preview, parse_outline, stream_draft
+from src.ollama_client import OllamaClient
+from src.schemas import DraftPostRequest
+
+OUTLINE = "1. Introduction\n2. Getting Started\n3. Advanced Usage\n4. Conclusion"
+
+
+def test_parse_outline_strips_list_markers():
+    text = "## Introduction\n- Setup\n* **Usage**\n3) Conclusion\n\nSetup"
+    assert parse_outline(text) == ["Introduction", "Setup", "Usage", "Conclusion"]
+
+
+async def test_sections_mode_writes_sections_in_parallel_and_in_order(tmp_path):
+    active = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "mistral:7b"}]})
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        if prompt.startswith("Outline"):
+            reply = OUTLINE
+        else:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            heading = prompt.split('Start with the line "## ')[1].split('"')[0]
+            reply = f"## {heading}\n\nSome words about {heading.lower()}."
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": reply}, "done": True})
+
+    client = OllamaClient(
+        transport=httpx.MockTransport(handler),
+        admission=AdmissionController(concurrency=2, max_queue=8)
+    )
+    request = DraftPostRequest(topic="Async Python", blog_folder=str(tmp_path), mode="sections")
+
+    response = await create_draft(client, request)
+
+    assert peak == 2
+    content = (tmp_path / response.filename).read_text(encoding="utf-8")
+    headings = [line for line in content.split("\n") if line.startswith("## ")]
+    assert headings == ["## Introduction", "## Getting Started", "## Advanced Usage", "## Conclusion"]
+    assert response.content_stats["heading_count"] == 4
+
+
+async def test_stream_draft_strips_frontmatter_and_renames_file(tmp_path):
+    pieces = ["--", "-\ntitle: x\n", "---\n\n# Intro", "\n\nHello ", "world.\n\n"]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "mistral:7b"}]})
+        lines = [{"message": {"role": "assistant", "content": p}, "done": False} for p in pieces]
+        lines.append({"message": {"role": "assistant", "content": ""}, "done": True})
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines).encode())
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+    request = DraftPostRequest(topic="Streaming", blog_folder=str(tmp_path))
+
+    events = [event async for event in stream_draft(client, request)]
+
+    assert events[0]["event"] == "start"
+    streamed = "".join(e["text"] for e in events if e["event"] == "content")
+    assert streamed == "# Intro\n\nHello world."
+    done = events[-1]
+    assert done["event"] == "done"
+    assert done["content_stats"]["heading_count"] == 1
+    assert [p.name for p in tmp_path.iterdir()] == [done["filename"]]
+    assert (tmp_path / done["filename"]).read_text(encoding="utf-8").endswith("# Intro\n\nHello world.")
+
+
+async def test_stream_draft_stats_match_a_full_analysis_without_reading_back(tmp_path, monkeypatch):
+    body = "# Intro\n\nSee [docs](https://x.y) and ![img](a.png).\n\n" + " ".join(f"word{i}" for i in range(250))
+    body += "\n\n## Code\n\n```python\nprint(1)\n```\n\nThe end."
+    pieces = [body[i:i + 7] for i in range(0, len(body), 7)]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "mistral:7b"}]})
+        lines = [{"message": {"role": "assistant", "content": p}, "done": False} for p in pieces]
+        lines.append({"message": {"role": "assistant", "content": ""}, "done": True})
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines).encode())
+
+    async def no_read_back(path):
+        raise AssertionError("stream_draft read the committed file")
+
+    monkeypatch.setattr(post_io, "read_text", no_read_back)
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+    events = [event async for event in stream_draft(client, DraftPostRequest(topic="Stats", blog_folder=str(tmp_path)))]
+
+    done = events[-1]
+    content = (tmp_path / done["filename"]).read_text(encoding="utf-8")
+    analysis = ContentValidator.analyze(content)
+    assert done["content_stats"] == analysis.stats
+    assert done["content_issues"] == (analysis.issues or None)
+    assert done["word_count"] == analysis.word_count
+    assert done["preview"] == make_preview(content) and done["preview"].endswith("...")
+
+
+async def test_repetition_loop_stops_generation_early(tmp_path, monkeypatch):
+    monkeypatch.setenv("DRAFT_DETECT_REPETITION", "true")
+    sent = []
+
+    async def looping_tokens():
+        yield (json.dumps({"message": {"role": "assistant", "content": "# Loop\n\n"}, "done": False}) + "\n").encode()
+        for i in range(500):
+            sent.append(i)
+            await asyncio.sleep(0)
+            chunk = {"message": {"role": "assistant", "content": "the same sentence over and over again. "}, "done": False}
+            yield (json.dumps(chunk) + "\n").encode()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "mistral:7b"}]})
+        return httpx.Response(200, content=looping_tokens())
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+    request = DraftPostRequest(topic="Loops", blog_folder=str(tmp_path))
+
+    response = await create_draft(client, request)
+    await asyncio.sleep(0.01)
+
+    assert response.stopped_early.startswith("Repetition loop")
+    assert response.content_issues[0].startswith("Generation stopped early: Repetition loop")
+    assert len(sent) < 50
+    # A validator abort is not a client disconnect
+    assert client.cancellation_stats()["cancelled"] == 0
+
+
+async def test_unlisted_model_warns_unless_strict(tmp_path, capsys):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "mistral:7b-instruct"}]})
+        reply = "## One\n\nText.\n\n## Two\n\nMore."
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": reply}, "done": True})
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+    request = DraftPostRequest(topic="Tags", model="mistral:7b", blog_folder=str(tmp_path))
+
+    # The API path lets Ollama resolve the name, as it always has
+    draft = await create_draft(client, request)
+    assert (tmp_path / draft.filename).exists()
+    captured = capsys.readouterr()
+    assert captured.out == "" and "Model 'mistral:7b' is not available" in captured.err
+
+    with pytest.raises(HTTPException) as excinfo:
+        await create_draft(client, request, strict_model=True)
+    assert excinfo.value.status_code == 400
+
+
+async def test_failed_write_removes_the_placeholder(tmp_path, monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "mistral:7b"}]})
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": "## One\n\nText."}, "done": True})
+
+    async def disk_full(path, content):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(post_io, "write_atomic", disk_full)
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+
+    with pytest.raises(HTTPException) as excinfo:
+        await create_draft(client, DraftPostRequest(topic="Full Disk", blog_folder=str(tmp_path)))
+
+    assert excinfo.value.status_code == 500
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,180 @@
+"""
+Unit tests for the background job queue
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+
+from src.jobs import JobQueue, JobStore
+
+
+async def wait_for_status(queue: JobQueue, job_id: str, status: str) -> dict:
+    for _ in range(200):
+        job = await queue.get(job_id)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.005)
+    raise AssertionError(f"job never reached {status}: {job['status']}")
+
+
+async def test_jobs_run_and_report_results(tmp_path):
+    async def echo(payload):
+        if payload.get("fail"):
+            raise HTTPException(status_code=400, detail="bad topic")
+        return {"topic": payload["topic"]}
+
+    queue = JobQueue(str(tmp_path / "jobs.db"), {"draft_post": echo}, workers=2)
+    await queue.start()
+
+    ok = await queue.submit("draft_post", {"topic": "a"})
+    bad = await queue.submit("draft_post", {"topic": "b", "fail": True})
+
+    assert (await wait_for_status(queue, ok["id"], "succeeded"))["result"] == {"topic": "a"}
+    failed = await wait_for_status(queue, bad["id"], "failed")
+    assert (failed["status_code"], failed["error"]) == (400, "bad topic")
+    await queue.stop()
+
+
+async def test_cancel_running_and_queued_jobs(tmp_path):
+    started = asyncio.Event()
+
+    async def slow(payload):
+        started.set()
+        await asyncio.sleep(10)
+
+    queue = JobQueue(str(tmp_path / "jobs.db"), {"draft_post": slow}, workers=1)
+    await queue.start()
+    running = await queue.submit("draft_post", {})
+    queued = await queue.submit("draft_post", {})
+    await started.wait()
+
+    assert (await queue.cancel(queued["id"]))["status"] == "cancelled"
+    assert (await queue.cancel(running["id"]))["status"] == "cancelled"
+    with pytest.raises(HTTPException) as excinfo:
+        await queue.cancel(running["id"])
+    assert excinfo.value.status_code == 409
+    await queue.stop()
+
+
+async def test_unfinished_jobs_survive_restart(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    release = asyncio.Event()
+
+    async def blocked(payload):
+        await release.wait()
+        return {"done": True}
+
+    first = JobQueue(db_path, {"draft_post": blocked}, workers=1)
+    await first.start()
+    interrupted = await first.submit("draft_post", {})
+    waiting = await first.submit("draft_post", {})
+    await wait_for_status(first, interrupted["id"], "running")
+    await first.stop()
+
+    release.set()
+    second = JobQueue(db_path, {"draft_post": blocked}, workers=1)
+    await second.start()
+    await wait_for_status(second, interrupted["id"], "succeeded")
+    await wait_for_status(second, waiting["id"], "succeeded")
+    await second.stop()
+
+
+async def test_workers_sharing_a_store_run_each_job_once(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    release = asyncio.Event()
+    runs = []
+
+    async def blocked(payload):
+        runs.append(payload["n"])
+        await release.wait()
+        return {"n": payload["n"]}
+
+    first = JobQueue(db_path, {"draft_post": blocked}, workers=1, poll=0.01)
+    await first.start()
+    busy = await first.submit("draft_post", {"n": 0})
+    await wait_for_status(first, busy["id"], "running")
+
+    # A second API process starting up must leave the first one's running job alone
+    second = JobQueue(db_path, {"draft_post": blocked}, workers=1, poll=0.01)
+    await second.start()
+    handed_over = await first.submit("draft_post", {"n": 1})
+    assert (await wait_for_status(second, handed_over["id"], "running"))["owner"] == second.owner
+    assert (await first.get(busy["id"]))["owner"] == first.owner
+
+    release.set()
+    await wait_for_status(first, busy["id"], "succeeded")
+    await wait_for_status(first, handed_over["id"], "succeeded")
+    assert sorted(runs) == [0, 1]
+    await first.stop()
+    await second.stop()
+
+
+async def test_abandoned_jobs_are_taken_over_and_remote_cancels_stop_work(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    stopped = asyncio.Event()
+
+    async def slow(payload):
+        if payload.get("forever"):
+            try:
+                await asyncio.sleep(10)
+            finally:
+                stopped.set()
+        return {"ok": True}
+
+    # A worker that claimed a job and then died without renewing its lease
+    store = JobStore(db_path)
+    await store.insert("job_abandoned", "draft_post", {})
+    assert (await store.claim("dead-worker", lease=0.01, max_attempts=3))["id"] == "job_abandoned"
+    store.close()
+
+    worker = JobQueue(db_path, {"draft_post": slow}, workers=1, lease=0.06, poll=0.01)
+    other = JobQueue(db_path, {"draft_post": slow}, workers=0)
+    await worker.start()
+    await other.start()
+    assert (await wait_for_status(worker, "job_abandoned", "succeeded"))["owner"] == worker.owner
+
+    running = await worker.submit("draft_post", {"forever": True})
+    await wait_for_status(worker, running["id"], "running")
+    assert (await other.cancel(running["id"]))["status"] == "cancelled"
+    await asyncio.wait_for(stopped.wait(), timeout=1)
+    assert (await worker.get(running["id"]))["status"] == "cancelled"
+    await worker.stop()
+    await other.stop()
+
+
+async def test_workers_survive_store_errors_unknown_kinds_and_crash_loops(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "jobs.db")
+    # A job whose handler took its worker process down twice already
+    store = JobStore(db_path)
+    await store.insert("job_crashy", "draft_post", {})
+    for _ in range(2):
+        assert await store.claim("dead-worker", lease=0, max_attempts=2)
+    await store.insert("job_legacy", "old_kind", {})
+    store.close()
+
+    async def echo(payload):
+        return {"ok": True}
+
+    queue = JobQueue(db_path, {"draft_post": echo}, workers=1, poll=0.01)
+    await queue.start()
+    queue.max_attempts = 2
+    claim = queue.store.claim
+    failures = [sqlite3.OperationalError("database is locked")]
+
+    async def flaky_claim(*args):
+        if failures:
+            raise failures.pop()
+        return await claim(*args)
+
+    monkeypatch.setattr(queue.store, "claim", flaky_claim)
+
+    crashy = await wait_for_status(queue, "job_crashy", "failed")
+    assert crashy["error"] == "Gave up after 2 attempts"
+    legacy = await wait_for_status(queue, "job_legacy", "failed")
+    assert legacy["error"] == "Unknown job kind: old_kind"
+    ok = await queue.submit("draft_post", {})
+    assert (await wait_for_status(queue, ok["id"], "succeeded"))["attempts"] == 1
+    await queue.stop()
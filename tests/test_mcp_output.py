@@ -0,0 +1,86 @@
+"""
+Unit tests for the MCP output channel
+"""
+
+import asyncio
+import io
+import threading
+
+from src.mcp_output import OutputChannel
+
+
+class SlowStream(io.BytesIO):
+    """A binary sink whose writes block until released, like a pipe nobody reads."""
+
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+
+    def write(self, data):
+        self.released.wait()
+        return super().write(data)
+
+
+class BrokenStream(io.BytesIO):
+    def write(self, data):
+        raise BrokenPipeError("reader went away")
+
+
+class ClosedStream(io.BytesIO):
+    def write(self, data):
+        raise ValueError("I/O operation on closed file")
+
+
+async def test_frames_stay_whole_and_in_order_per_producer():
+    stream = io.StringIO()
+    channel = OutputChannel(stream, max_queue=4, max_batch_bytes=64)
+
+    async def producer(name):
+        for i in range(50):
+            await channel.send(f"{name}-{i}-" + "x" * (i * 37 % 500))
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(producer(name) for name in "abc"))
+    await channel.close()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 150
+    for name in "abc":
+        frames = [line for line in lines if line.startswith(f"{name}-")]
+        assert [int(frame.split("-")[1]) for frame in frames] == list(range(50))
+        assert all(frame.endswith("x" * (int(frame.split("-")[1]) * 37 % 500)) for frame in frames)
+    stats = channel.stats()
+    assert stats["frames"] == 150 and stats["writes"] < 150 and stats["max_depth"] <= 4
+
+
+async def test_full_queue_holds_producers_back():
+    stream = SlowStream()
+    channel = OutputChannel(stream, max_queue=2)
+    sent = []
+
+    async def producer():
+        for i in range(10):
+            await channel.send(str(i))
+            sent.append(i)
+
+    task = asyncio.ensure_future(producer())
+    try:
+        await asyncio.sleep(0.05)
+        # One batch is stuck in the write and the queue is full: the producer must be waiting
+        assert not task.done()
+        assert len(sent) < 10
+    finally:
+        stream.released.set()
+    await asyncio.wait_for(task, timeout=5)
+    await asyncio.wait_for(channel.close(), timeout=5)
+    assert stream.getvalue() == b"".join(f"{i}\n".encode() for i in range(10))
+
+
+async def test_failing_streams_do_not_hang_producers():
+    for stream, error in ((BrokenStream(), "BrokenPipeError"), (ClosedStream(), "ValueError")):
+        channel = OutputChannel(stream, max_queue=1)
+        for i in range(5):
+            await asyncio.wait_for(channel.send(str(i)), timeout=1)
+        await asyncio.wait_for(channel.flush(), timeout=1)
+        await asyncio.wait_for(channel.close(), timeout=1)
+        assert error in channel.stats()["error"]
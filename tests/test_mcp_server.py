@@ -0,0 +1,293 @@
+"""
+Unit tests for the MCP stdio server loop
+"""
+
+import asyncio
+import io
+import json
+import os
+import re
+
+import httpx
+import pytest
+
+from src.interactive_agent import interactive_agent
+from src.mcp_server import MCPServer
+from src.mcp_tools import TOOLS, SchemaError, compile_schema
+from src.ollama_client import OllamaClient
+
+
+def feed(*messages) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    for message in messages:
+        reader.feed_data((message if isinstance(message, str) else json.dumps(message)).encode() + b"\n")
+    reader.feed_eof()
+    return reader
+
+
+def written(server: MCPServer) -> list:
+    return [json.loads(line) for line in server.stdout.getvalue().splitlines()]
+
+
+def slow_server(**kwargs) -> MCPServer:
+    server = MCPServer(**kwargs)
+    server.stdout = io.StringIO()
+
+    async def handle_request(request):
+        await asyncio.sleep(request.get("params", {}).get("delay", 0))
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": request["method"]}
+
+    server.handle_request = handle_request
+    return server
+
+
+async def test_fast_requests_are_not_blocked_by_slow_ones():
+    server = slow_server()
+    await server.serve(feed(
+        {"jsonrpc": "2.0", "id": 1, "method": "draft", "params": {"delay": 0.2}},
+        {"jsonrpc": "2.0", "id": 2, "method": "status"},
+    ))
+
+    assert [response["id"] for response in written(server)] == [2, 1]
+
+
+async def test_batches_notifications_and_parse_errors():
+    server = slow_server()
+    await server.serve(feed(
+        [
+            {"jsonrpc": "2.0", "id": "a", "method": "one"},
+            {"jsonrpc": "2.0", "method": "notifications/initialized"},
+            {"jsonrpc": "2.0", "id": "b", "method": "two"},
+        ],
+        {"jsonrpc": "2.0", "method": "notifications/cancelled"},
+        "{not json",
+        [],
+    ))
+
+    responses = written(server)
+    batch = next(response for response in responses if isinstance(response, list))
+    assert [item["id"] for item in batch] == ["a", "b"]
+    errors = sorted(response["error"]["code"] for response in responses if isinstance(response, dict))
+    assert errors == [-32700, -32600]
+
+
+async def test_concurrency_cap():
+    server = slow_server(max_concurrency=2)
+    running = []
+    peak = []
+    handle = server.handle_request
+
+    async def tracked(request):
+        running.append(request["id"])
+        peak.append(len(running))
+        try:
+            return await handle(request)
+        finally:
+            running.remove(request["id"])
+
+    server.handle_request = tracked
+    await server.serve(feed(*(
+        {"jsonrpc": "2.0", "id": i, "method": "m", "params": {"delay": 0.02}} for i in range(6)
+    )))
+
+    assert max(peak) == 2
+    assert sorted(response["id"] for response in written(server)) == list(range(6))
+
+
+async def test_unknown_method_over_the_real_handler():
+    server = MCPServer()
+    server.stdout = io.StringIO()
+    await server.serve(feed({"jsonrpc": "2.0", "id": 7, "method": "nope"}))
+
+    assert written(server) == [{"jsonrpc": "2.0", "id": 7, "error": {"code": -32601, "message": "Method not found: nope"}}]
+
+
+async def test_direct_mode_calls_ollama_in_process(tmp_path):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "mistral:7b"}, {"name": "llama2"}]})
+        content = "## One\n\nText.\n\n## Two\n\nMore text."
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": content}, "done": True})
+
+    server = MCPServer(base_url="http://unused.invalid", mode="direct")
+    server.ollama_client = OllamaClient(transport=httpx.MockTransport(handler))
+
+    async def call(name, arguments):
+        return await server.handle_request({
+            "jsonrpc": "2.0", "id": name, "method": "tools/call", "params": {"name": name, "arguments": arguments}
+        })
+
+    models = await call("list_models", {})
+    assert models["result"]["content"][0]["text"] == "Available models: mistral:7b, llama2"
+
+    chat = await call("chat_completion", {"model": "mistral:7b", "messages": [{"role": "user", "content": "hi"}]})
+    assert chat["result"]["content"][0]["text"].startswith("## One")
+
+    draft = await call("draft_post", {"topic": "Direct Mode", "blog_folder": str(tmp_path)})
+    assert "Blog post draft created" in draft["result"]["content"][0]["text"]
+    assert len(list(tmp_path.iterdir())) == 1
+
+    invalid = await call("chat_completion", {"messages": []})
+    assert invalid["error"]["code"] == -32602
+    await server.aclose()
+
+
+async def test_tools_list_is_precomputed_and_arguments_are_validated():
+    server = MCPServer()
+    server.stdout = io.StringIO()
+    await server.serve(feed(
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "chat_about_post", "arguments": {"message": 3}}},
+        {"jsonrpc": "2.0", "id": 3, "method": "tools/call", "params": {"name": "nope", "arguments": {}}},
+    ))
+
+    responses = {response["id"]: response for response in written(server)}
+    assert responses[1]["result"] == {"tools": TOOLS.describe()}
+    assert len(responses[1]["result"]["tools"]) == len(TOOLS.tools)
+    assert responses[2]["error"]["code"] == -32602
+    assert "arguments.session_id is required" in responses[2]["error"]["message"]
+    assert responses[3]["error"]["message"] == "Unknown tool: nope"
+
+
+def test_compiled_schema_checks():
+    validate = compile_schema(TOOLS.get("chat_completion").input_schema)
+    validate({"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 1})
+
+    for arguments, error in (
+        ({"model": "m", "messages": [{"role": "bot", "content": "hi"}]}, "arguments.messages[0].role must be one of"),
+        ({"model": "m", "messages": [], "temperature": 3}, "arguments.temperature must be at most 2"),
+        ({"model": "m", "messages": [], "max_tokens": True}, "arguments.max_tokens must be integer"),
+    ):
+        with pytest.raises(SchemaError, match=re.escape(error)):
+            validate(arguments)
+
+    compile_schema(TOOLS.get("update").input_schema)({"sections": {"Intro": None, "Setup": "text"}})
+    with pytest.raises(SchemaError):
+        compile_schema(TOOLS.get("update").input_schema)({"sections": {"Intro": 1}})
+
+    draft = compile_schema(TOOLS.get("draft_post").input_schema)
+    draft({"topic": "t", "mode": "sections", "background": True})
+    with pytest.raises(SchemaError, match=re.escape("arguments.mode must be one of")):
+        draft({"topic": "t", "mode": "outline"})
+
+
+def test_manifest_matches_the_registry():
+    manifest = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "mcp-manifest.json")
+    with open(manifest, encoding="utf-8") as f:
+        assert json.load(f)["tools"] == TOOLS.describe()
+
+
+async def test_progress_notifications_stream_partial_output(tmp_path):
+    pieces = ["## Intro\n\n", "Streaming ", "works ", "nicely.\n\n", "## Next\n\n", "More."]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "mistral:7b"}]})
+        lines = [{"message": {"role": "assistant", "content": p}, "done": False} for p in pieces]
+        lines.append({"message": {"role": "assistant", "content": ""}, "done": True})
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines).encode())
+
+    server = MCPServer(mode="direct")
+    server.ollama_client = OllamaClient(transport=httpx.MockTransport(handler))
+    server.progress_interval = 0
+    server.stdout = io.StringIO()
+
+    def call(request_id, name, arguments, token=None):
+        params = {"name": name, "arguments": arguments}
+        if token is not None:
+            params["_meta"] = {"progressToken": token}
+        return {"jsonrpc": "2.0", "id": request_id, "method": "tools/call", "params": params}
+
+    await server.serve(feed(
+        call(1, "chat_completion", {"model": "mistral:7b", "messages": [{"role": "user", "content": "hi"}]}, "chat"),
+        call(2, "draft_post", {"topic": "Progress", "blog_folder": str(tmp_path)}, "draft"),
+        call(3, "list_models", {}),
+    ))
+
+    frames = written(server)
+    for token, request_id in (("chat", 1), ("draft", 2)):
+        notes = [f["params"] for f in frames if f.get("method") == "notifications/progress" and f["params"]["progressToken"] == token]
+        assert "".join(note["message"] for note in notes) == "".join(pieces)
+        progress = [note["progress"] for note in notes]
+        assert progress == sorted(progress) and len(set(progress)) == len(progress)
+        final = next(i for i, f in enumerate(frames) if f.get("id") == request_id)
+        assert all(frames.index({"jsonrpc": "2.0", "method": "notifications/progress", "params": note}) < final for note in notes)
+
+    assert not any(f.get("params", {}).get("progressToken") is None for f in frames if f.get("method"))
+    chat = next(f for f in frames if f.get("id") == 1)
+    assert chat["result"]["content"][0]["text"] == "".join(pieces)
+
+
+async def test_chat_streams_progress_through_the_active_session(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        lines = [{"message": {"role": "assistant", "content": p}, "done": False} for p in ("Let's ", "plan it.")]
+        lines.append({"message": {"role": "assistant", "content": ""}, "done": True})
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines).encode())
+
+    monkeypatch.setattr(interactive_agent, "ollama_client", OllamaClient(transport=httpx.MockTransport(handler)))
+    server = MCPServer()
+    server.progress_interval = 0
+    server.stdout = io.StringIO()
+    await server.handle_request({
+        "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+        "params": {"name": "start_writing_session", "arguments": {"topic": "Plans"}}
+    })
+    response = await server.handle_request({
+        "jsonrpc": "2.0", "id": 2, "method": "tools/call",
+        "params": {"name": "chat", "arguments": {"message": "Help"}, "_meta": {"progressToken": 9}}
+    })
+
+    await server.output.flush()
+    assert response["result"]["response"] == "Let's plan it."
+    assert "".join(f["params"]["message"] for f in written(server)) == "Let's plan it."
+
+
+async def test_direct_mode_reports_ollama_down_and_missing_models(tmp_path):
+    up = True
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if not up:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json={"models": [{"name": "llama2"}]})
+
+    server = MCPServer(mode="direct")
+    server.ollama_client = OllamaClient(transport=httpx.MockTransport(handler))
+
+    async def call(name, arguments):
+        return await server.handle_request({
+            "jsonrpc": "2.0", "id": 1, "method": "tools/call", "params": {"name": name, "arguments": arguments}
+        })
+
+    assert (await call("health_check", {}))["result"]["content"][0]["text"].startswith("Health Status: healthy")
+    missing = await call("draft_post", {"topic": "Nope", "model": "mistral:7b", "blog_folder": str(tmp_path)})
+    assert "Model 'mistral:7b' is not available" in missing["error"]["message"]
+    assert list(tmp_path.iterdir()) == []
+
+    up = False
+    down = await call("health_check", {})
+    assert down["error"]["message"].startswith("Health check failed")
+    await server.aclose()
+
+
+async def test_background_draft_returns_the_queued_job():
+    posted = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        posted.append((request.url.path, json.loads(request.content)))
+        return httpx.Response(202, json={
+            "job_id": "abc", "kind": "draft_post", "status": "queued", "created_at": 1.0,
+            "status_url": "/jobs/abc", "result_url": "/jobs/abc/result"
+        })
+
+    server = MCPServer(base_url="http://api.test")
+    server.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    # Even with a progress token the job is queued rather than streamed
+    response = await server.handle_request({
+        "jsonrpc": "2.0", "id": 1, "method": "tools/call",
+        "params": {"name": "draft_post", "arguments": {"topic": "Later", "background": True}, "_meta": {"progressToken": "p"}}
+    })
+
+    assert posted == [("/tool/draft_post", {"topic": "Later", "background": True})]
+    text = response["result"]["content"][0]["text"]
+    assert "Job ID: abc" in text and "http://api.test/jobs/abc" in text
+    await server.aclose()
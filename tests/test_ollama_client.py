@@ -0,0 +1,197 @@
+"""
+Unit tests for OllamaClient against a mocked Ollama transport
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.admission import AdmissionController
+from src.ollama_client import OllamaClient
+from src.schemas import ChatCompletionRequest
+
+
+def ollama_handler(request: httpx.Request) -> httpx.Response:
+    """Minimal stand-in for the Ollama HTTP API."""
+    if request.url.path == "/api/tags":
+        return httpx.Response(200, json={"models": [{"name": "mistral:7b"}]})
+    body = json.loads(request.content)
+    reply = f"echo: {body['messages'][-1]['content']}"
+    return httpx.Response(200, json={
+        "model": body["model"],
+        "message": {"role": "assistant", "content": reply},
+        "done": True
+    })
+
+
+def make_request(content: str = "hello") -> ChatCompletionRequest:
+    return ChatCompletionRequest(
+        model="mistral:7b",
+        messages=[{"role": "user", "content": content}]
+    )
+
+
+async def test_client_is_shared_across_calls():
+    client = OllamaClient(transport=httpx.MockTransport(ollama_handler))
+    await client.start()
+    pooled = client.client
+
+    response = await client.chat_completion(make_request())
+    await client.list_models()
+
+    assert response.choices[0].message.content == "echo: hello"
+    assert client.client is pooled
+    assert client.pool_stats()["requests"] == 2
+    assert client.pool_stats()["in_flight"] == 0
+
+    await client.aclose()
+    assert client.pool_stats()["pool_open"] is False
+
+
+async def test_pool_limits_are_reported():
+    client = OllamaClient(
+        max_connections=4,
+        max_keepalive_connections=2,
+        keepalive_expiry=5.0,
+        read_timeout=60.0,
+        transport=httpx.MockTransport(ollama_handler)
+    )
+    stats = client.pool_stats()
+
+    assert stats["limits"] == {
+        "max_connections": 4,
+        "max_keepalive_connections": 2,
+        "keepalive_expiry": 5.0
+    }
+    assert stats["timeouts"]["read"] == 60.0
+    assert stats["reuse_rate"] == 0.0
+
+
+FINAL_COUNTERS = {
+    "done": True,
+    "done_reason": "length",
+    "prompt_eval_count": 26,
+    "eval_count": 298,
+    "load_duration": 5_000_000,
+    "prompt_eval_duration": 130_000_000,
+    "eval_duration": 4_000_000_000,
+    "total_duration": 4_200_000_000,
+}
+
+
+async def test_usage_and_timings_come_from_ollama_counters():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={
+            "message": {"role": "assistant", "content": "three short words"},
+            **FINAL_COUNTERS
+        })
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+    response = await client.chat_completion(make_request())
+
+    assert response.usage.prompt_tokens == 26
+    assert response.usage.completion_tokens == 298
+    assert response.usage.total_tokens == 324
+    assert response.choices[0].finish_reason == "length"
+    assert response.timings.eval_ms == 4000.0
+    assert response.timings.load_ms == 5.0
+    assert response.timings.tokens_per_second == 74.5
+    assert response.timings.prompt_tokens_per_second == 200.0
+
+
+async def test_stream_ends_with_usage_chunk():
+    def handler(request: httpx.Request) -> httpx.Response:
+        lines = [
+            {"message": {"role": "assistant", "content": "Hello"}, "done": False},
+            {"message": {"role": "assistant", "content": ""}, **FINAL_COUNTERS},
+        ]
+        return httpx.Response(200, content="\n".join(json.dumps(line) for line in lines).encode())
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+    request = make_request().model_copy(update={"stream": True})
+    events = [chunk async for chunk in client.stream_chat_completion(request)]
+
+    assert events[-1] == "data: [DONE]\n\n"
+    final = json.loads(events[-2][len("data: "):])
+    assert final["usage"] == {"prompt_tokens": 26, "completion_tokens": 298, "total_tokens": 324}
+    assert final["timings"]["tokens_per_second"] == 74.5
+    assert final["choices"][0]["finish_reason"] == "length"
+
+
+async def test_abandoned_stream_records_cancellation():
+    async def slow_tokens():
+        for i in range(10):
+            await asyncio.sleep(0.01)
+            yield (json.dumps({"message": {"role": "assistant", "content": f"t{i} "}, "done": False}) + "\n").encode()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=slow_tokens())
+
+    client = OllamaClient(transport=httpx.MockTransport(handler))
+    request = ChatCompletionRequest(
+        model="mistral:7b",
+        messages=[{"role": "user", "content": "hello"}],
+        max_tokens=50,
+        stream=True
+    )
+
+    stream = client.stream_chat_completion(request)
+    await stream.__anext__()
+    await stream.__anext__()
+    await stream.aclose()
+    # The shared upstream stream is cancelled once its last subscriber leaves
+    await asyncio.sleep(0.01)
+
+    assert client.cancellation_stats() == {
+        "cancelled": 1,
+        "tokens_generated": 2,
+        "tokens_saved_estimate": 48
+    }
+    assert client.pool_stats()["in_flight"] == 0
+
+
+async def test_request_cancelled_while_queued_is_not_counted():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": "hi"}, "done": True})
+
+    admission = AdmissionController(concurrency=1, max_queue=4)
+    client = OllamaClient(transport=httpx.MockTransport(handler), admission=admission)
+    request = ChatCompletionRequest(model="mistral:7b", messages=[{"role": "user", "content": "hello"}])
+
+    async with admission.slot("mistral:7b"):
+        task = asyncio.ensure_future(client.chat_completion(request))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    # Nothing was ever sent to Ollama, so no generation was cut short
+    assert client.cancellation_stats()["cancelled"] == 0
+
+
+async def test_batch_runs_bounded_and_reports_per_item_errors():
+    active = 0
+    peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal active, peak
+        body = json.loads(request.content)
+        if body["model"] == "missing":
+            return httpx.Response(404, text="model not found")
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return ollama_handler(request)
+
+    client = OllamaClient(transport=httpx.MockTransport(handler), coalesce=False)
+    requests = [make_request(f"q{i}") for i in range(6)]
+    requests.append(ChatCompletionRequest(model="missing", messages=[{"role": "user", "content": "x"}]))
+
+    results = dict([item async for item in client.batch_chat_completion(requests, max_parallel=2)])
+
+    assert peak == 2
+    assert results[3].choices[0].message.content == "echo: q3"
+    assert results[6].status_code == 404
@@ -0,0 +1,62 @@
+"""
+Unit tests for non-blocking post file I/O
+"""
+
+import asyncio
+
+from src import post_io
+from src.file_modes import UMASK
+
+
+async def test_concurrent_reservations_get_distinct_names(tmp_path):
+    results = await asyncio.gather(*(post_io.reserve_unique(tmp_path, "2025-01-01-post", ".qmd") for _ in range(20)))
+
+    names = sorted(name for name, _ in results)
+    assert len(set(names)) == 20
+    assert "2025-01-01-post.qmd" in names
+    assert "2025-01-01-post-19.qmd" in names
+
+
+async def test_write_atomic_replaces_without_leftovers(tmp_path):
+    path = tmp_path / "posts" / "draft.md"
+    await post_io.write_atomic(path, "first")
+    await post_io.write_atomic(path, "second")
+
+    assert path.read_text(encoding="utf-8") == "second"
+    assert [p.name for p in path.parent.iterdir()] == ["draft.md"]
+
+
+async def test_atomic_writes_keep_normal_file_modes(tmp_path):
+    fresh = tmp_path / "fresh.qmd"
+    await post_io.write_atomic(fresh, "text")
+    assert fresh.stat().st_mode & 0o777 == 0o666 & ~UMASK
+
+    shared = tmp_path / "shared.qmd"
+    shared.write_text("old", encoding="utf-8")
+    shared.chmod(0o640)
+    await post_io.write_atomic(shared, "new")
+    assert shared.stat().st_mode & 0o777 == 0o640
+
+    _, reserved = await post_io.reserve_unique(tmp_path, "post", ".qmd")
+    writer = await post_io.AtomicWriter(reserved).open()
+    await writer.write("streamed")
+    await writer.commit()
+    assert reserved.stat().st_mode & 0o777 == 0o644 & ~UMASK
+
+
+async def test_atomic_writer_commit_and_abort(tmp_path, monkeypatch):
+    monkeypatch.setattr(post_io, "WRITE_BUFFER_BYTES", 4)
+    target = tmp_path / "post.qmd"
+    target.write_text("", encoding="utf-8")
+
+    writer = await post_io.AtomicWriter(target).open()
+    for piece in ["Hello", ", ", "world"]:
+        await writer.write(piece)
+    assert target.read_text(encoding="utf-8") == ""
+    await writer.commit()
+    assert target.read_text(encoding="utf-8") == "Hello, world"
+
+    aborted = await post_io.AtomicWriter(tmp_path / "other.qmd").open()
+    await aborted.write("partial")
+    await aborted.abort()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["post.qmd"]
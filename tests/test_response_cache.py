@@ -0,0 +1,103 @@
+"""
+Unit tests for the chat completion response cache
+"""
+
+import json
+
+import httpx
+
+from src.ollama_client import OllamaClient
+from src.file_modes import UMASK
+from src.response_cache import ResponseCache
+from src.schemas import ChatCompletionRequest, ChatCompletionResponse
+
+
+def make_request(content: str = "hello", temperature: float = 0) -> ChatCompletionRequest:
+    return ChatCompletionRequest(
+        model="mistral:7b",
+        messages=[{"role": "user", "content": content}],
+        temperature=temperature
+    )
+
+
+def make_response(content: str) -> ChatCompletionResponse:
+    return ChatCompletionResponse(
+        id="chatcmpl-test",
+        created=0,
+        model="mistral:7b",
+        choices=[{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        usage={"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+    )
+
+
+def test_key_ignores_stream_flag_but_not_sampling():
+    base = make_request()
+    streamed = base.model_copy(update={"stream": True})
+    warmer = make_request(temperature=0.5)
+
+    assert ResponseCache.make_key(base) == ResponseCache.make_key(streamed)
+    assert ResponseCache.make_key(base) != ResponseCache.make_key(warmer)
+
+
+def test_applies_only_to_greedy_requests_unless_opted_in():
+    assert ResponseCache.applies(make_request(temperature=0))
+    assert not ResponseCache.applies(make_request(temperature=0.7))
+    assert ResponseCache.applies(make_request(temperature=0.7), opt_in=True)
+
+
+async def test_lru_evicts_by_size():
+    entry_size = len(make_response("x" * 100).model_dump_json())
+    cache = ResponseCache(max_entries=10, max_bytes=entry_size * 2)
+
+    await cache.put("a", make_response("x" * 100))
+    await cache.put("b", make_response("y" * 100))
+    assert await cache.get("a") is not None  # "a" becomes most recently used
+    await cache.put("c", make_response("z" * 100))
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+async def test_disk_tier_survives_new_instance(tmp_path):
+    first = ResponseCache(disk_dir=str(tmp_path))
+    await first.put("abc123", make_response("persisted"))
+
+    second = ResponseCache(disk_dir=str(tmp_path))
+    cached = await second.get("abc123")
+
+    assert cached.choices[0].message.content == "persisted"
+    assert cached.id != "chatcmpl-test"
+    assert second.stats()["disk_hits"] == 1
+    files = [p for p in tmp_path.rglob("*") if p.is_file()]
+    assert files and all(p.stat().st_mode & 0o777 == 0o666 & ~UMASK for p in files)
+
+
+async def test_corrupt_disk_entry_is_a_miss_and_removed(tmp_path):
+    cache = ResponseCache(disk_dir=str(tmp_path))
+    await cache.put("abc123", make_response("persisted"))
+    cache.clear()
+    path = tmp_path / "ab" / "abc123.json"
+    path.write_text(path.read_text(encoding="utf-8")[:20], encoding="utf-8")
+
+    assert await cache.get("abc123") is None
+    assert not path.exists()
+    stats = cache.stats()
+    assert stats["disk_errors"] == 1 and stats["misses"] == 1
+
+
+async def test_client_serves_repeat_requests_from_cache():
+    upstream_calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        upstream_calls.append(json.loads(request.content))
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": "hi"}, "done": True})
+
+    client = OllamaClient(transport=httpx.MockTransport(handler), cache=ResponseCache())
+
+    _, first = await client.cached_chat_completion(make_request())
+    _, second = await client.cached_chat_completion(make_request())
+    _, warm = await client.cached_chat_completion(make_request(temperature=0.7))
+
+    assert (first, second, warm) == ("MISS", "HIT", "BYPASS")
+    assert len(upstream_calls) == 2
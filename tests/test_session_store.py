@@ -0,0 +1,146 @@
+"""
+Unit tests for writing-session storage
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from src.interactive_agent import InteractiveBlogAgent
+from src.ollama_client import OllamaClient
+from src.session_store import MemorySessionStore, SessionLockTimeout, SessionStore, SQLiteSessionStore
+
+
+def new_session() -> dict:
+    return {
+        'blog_folder': 'posts',
+        'topic': 'Topic',
+        'content_sections': {},
+        'conversation_history': [],
+        'created_at': '2025-01-01T00:00:00'
+    }
+
+
+async def test_lru_eviction_by_count_and_bytes():
+    store = MemorySessionStore(max_sessions=2, max_bytes=1000)
+    await store.create("a", new_session())
+    await store.create("b", new_session())
+    await store.get("a")
+    await store.create("c", new_session())
+
+    assert await store.get("b") is None
+    assert await store.get("a") is not None
+
+    await store.set_draft("c", {"": "x" * 990})
+    assert await store.get("a") is None
+    assert (await store.metrics())["sessions"] == 1
+    assert (await store.metrics())["evicted"] == 2
+    assert (await store.metrics())["bytes"] < 1100
+
+
+async def test_idle_sessions_expire(monkeypatch):
+    store = MemorySessionStore(ttl=60)
+    await store.create("old", new_session())
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+
+    assert await store.get("old") is None
+    assert (await store.metrics())["expired"] == 1
+    assert (await store.metrics())["bytes"] == 0
+
+
+async def test_sqlite_sessions_survive_a_new_store(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    first = SQLiteSessionStore(path)
+    await first.create("s", new_session())
+    await first.append_turns("s", [{"role": "user", "content": "one"}, {"role": "assistant", "content": "two"}])
+    await first.append_turns("s", [{"role": "user", "content": "three"}])
+    await first.set_draft("s", {"Draft": "# Draft\n", "Usage": "## Usage\n"})
+    first.close()
+
+    second = SQLiteSessionStore(path)
+    session = await second.get("s")
+    assert [turn["content"] for turn in session["conversation_history"]] == ["one", "two", "three"]
+    assert list(session["content_sections"]) == ["Draft", "Usage"]
+    assert (await second.metrics())["turns"] == 3
+    assert await second.delete("s")
+    assert (await second.metrics())["turns"] == 0
+    second.close()
+
+
+async def test_sqlite_lock_excludes_other_workers(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    workers = [SQLiteSessionStore(path, lock_poll=0.01) for _ in range(2)]
+    await workers[0].create("s", new_session())
+    inside = []
+
+    async def turn(store, name):
+        async with store.lock("s"):
+            inside.append(name)
+            assert len(inside) == 1
+            await asyncio.sleep(0.05)
+            inside.remove(name)
+
+    await asyncio.gather(turn(workers[0], "a"), turn(workers[1], "b"), turn(workers[0], "c"))
+    for store in workers:
+        store.close()
+
+
+async def test_sqlite_stale_lease_is_taken_over(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    crashed = SQLiteSessionStore(path, lock_lease=0.05)
+    await crashed.create("s", new_session())
+    await crashed._acquire_lease("s", time.monotonic() + 1)
+
+    survivor = SQLiteSessionStore(path, lock_poll=0.01)
+    async with survivor.lock("s"):
+        pass
+    crashed.close()
+    survivor.close()
+
+
+async def test_sqlite_lock_times_out_and_long_holders_keep_their_lease(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    holder = SQLiteSessionStore(path, lock_lease=0.06)
+    waiter = SQLiteSessionStore(path, lock_lease=0.06, lock_poll=0.01, lock_timeout=0.2)
+    await holder.create("s", new_session())
+
+    async with holder.lock("s"):
+        # Held for several lease periods: renewal keeps the waiter out until it gives up
+        with pytest.raises(SessionLockTimeout):
+            async with waiter.lock("s"):
+                pass
+
+    async with waiter.lock("s"):
+        pass
+    holder.close()
+    waiter.close()
+
+
+async def test_agent_keeps_history_in_the_store():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"message": {"role": "assistant", "content": "Sounds good"}, "done": True})
+
+    store = MemorySessionStore()
+    agent = InteractiveBlogAgent(session_store=store)
+    agent.ollama_client = OllamaClient(transport=httpx.MockTransport(handler))
+
+    session_id = await agent.start_session("posts", "Caching")
+    assert await agent.chat_about_post(session_id, "Let's outline it") == "Sounds good"
+    await agent.update_draft(session_id, "# Caching\n")
+
+    status = await agent.get_session_status(session_id)
+    assert status["conversation_turns"] == 1
+    assert status["draft_length"] == len("# Caching\n")
+    assert status["store"]["sessions"] == 1
+    assert await agent.chat_about_post("missing", "hi") == "Session not found. Please start a new session."
+
+
+def test_incomplete_store_fails_at_construction():
+    class NoLocks(SessionStore):
+        async def create(self, session_id, session): ...
+
+    with pytest.raises(TypeError):
+        NoLocks()
@@ -0,0 +1,70 @@
+"""
+Unit tests for the bulk post validation CLI
+"""
+
+import csv
+import json
+import os
+
+from src import validate_posts
+
+GOOD_POST = "---\ntitle: ok\n---\n# One\n\n" + "word " * 250 + "\n\n## Two\n\n```python\nprint(1)\n```\n"
+
+
+def write_posts(root):
+    (root / "2025").mkdir()
+    (root / "good.qmd").write_text(GOOD_POST, encoding="utf-8")
+    (root / "2025" / "short.md").write_text("# Only heading\n\nToo short.", encoding="utf-8")
+    (root / "notes.txt").write_text("not a post", encoding="utf-8")
+    (root / ".hidden.qmd").write_text("ignored", encoding="utf-8")
+
+
+def test_parallel_run_and_manifest_reuse(tmp_path):
+    posts = tmp_path / "posts"
+    posts.mkdir()
+    write_posts(posts)
+    manifest = str(tmp_path / "manifest.json")
+
+    records, summary = validate_posts.run([str(posts)], manifest, workers=2)
+    assert [os.path.basename(r["path"]) for r in records] == ["short.md", "good.qmd"]
+    assert [r["is_valid"] for r in records] == [False, True]
+    assert summary == {"files": 2, "checked": 2, "cached": 0, "invalid": 1, "errors": 0}
+
+    # Touch one file without changing it and edit the other
+    good = posts / "good.qmd"
+    os.utime(good, ns=(0, good.stat().st_mtime_ns + 10**9))
+    (posts / "2025" / "short.md").write_text(GOOD_POST, encoding="utf-8")
+
+    records, summary = validate_posts.run([str(posts)], manifest, workers=1)
+    assert summary == {"files": 2, "checked": 1, "cached": 1, "invalid": 0, "errors": 0}
+    assert records[1]["stats"]["word_count"] == records[0]["stats"]["word_count"]
+
+
+def test_rule_change_invalidates_manifest(tmp_path, monkeypatch):
+    posts = tmp_path / "posts"
+    posts.mkdir()
+    write_posts(posts)
+    manifest = str(tmp_path / "manifest.json")
+    validate_posts.run([str(posts)], manifest, workers=1)
+
+    monkeypatch.setattr(validate_posts.ContentValidator, "MIN_WORD_COUNT", 1)
+    records, summary = validate_posts.run([str(posts)], manifest, workers=1)
+    assert summary["checked"] == 2
+
+
+def test_cli_writes_jsonl_and_csv(tmp_path, capsys):
+    posts = tmp_path / "posts"
+    posts.mkdir()
+    write_posts(posts)
+    report = tmp_path / "report.csv"
+
+    code = validate_posts.main([str(posts), "--no-cache", "-j", "1", "--format", "csv", "-o", str(report), "--fail-on-invalid"])
+    assert code == 1
+    with open(report, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["is_valid"] for row in rows] == ["False", "True"]
+    assert rows[1]["word_count"] == "257"
+
+    assert validate_posts.main([str(posts / "good.qmd"), "--no-cache"]) == 0
+    line = json.loads(capsys.readouterr().out)
+    assert line["is_valid"] is True